@@ -19,13 +19,35 @@ resource "aws_api_gateway_resource" "content" {
   path_part   = "content"
 }
 
+# API Gateway resource for /content/preview
+resource "aws_api_gateway_resource" "content_preview" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_resource.content.id
+  path_part   = "preview"
+}
+
+# API Gateway resource for /content/jobs
+resource "aws_api_gateway_resource" "content_jobs" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_resource.content.id
+  path_part   = "jobs"
+}
+
+# API Gateway resource for /content/jobs/{id}
+resource "aws_api_gateway_resource" "content_job" {
+  rest_api_id = aws_api_gateway_rest_api.main.id
+  parent_id   = aws_api_gateway_resource.content_jobs.id
+  path_part   = "{id}"
+}
+
 # API Gateway Authorizer
+# REQUEST events carry the API Gateway request ID, the trace ID shared with the content service
 resource "aws_api_gateway_authorizer" "lambda_authorizer" {
   name                   = "${var.project_name}-${var.environment}-authorizer"
   rest_api_id            = aws_api_gateway_rest_api.main.id
   authorizer_uri         = aws_lambda_function.authorizer.invoke_arn
   authorizer_credentials = aws_iam_role.authorizer_invocation.arn
-  type                   = "TOKEN"
+  type                   = "REQUEST"
   identity_source        = "method.request.header.Authorization"
 }
 
@@ -92,6 +114,85 @@ resource "aws_lambda_permission" "api_gateway" {
   source_arn    = "${aws_api_gateway_rest_api.main.execution_arn}/*/*"
 }
 
+# API Gateway GET method for /content/preview
+resource "aws_api_gateway_method" "content_preview_get" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.content_preview.id
+  http_method   = "GET"
+  authorization = "CUSTOM"
+  authorizer_id = aws_api_gateway_authorizer.lambda_authorizer.id
+}
+
+# Lambda integration for GET /content/preview
+resource "aws_api_gateway_integration" "content_preview_lambda" {
+  rest_api_id             = aws_api_gateway_rest_api.main.id
+  resource_id             = aws_api_gateway_resource.content_preview.id
+  http_method             = aws_api_gateway_method.content_preview_get.http_method
+  integration_http_method = "POST"
+  type                    = "AWS_PROXY"
+  uri                     = aws_lambda_function.content_preview.invoke_arn
+}
+
+# Lambda permission for API Gateway to invoke the preview
+resource "aws_lambda_permission" "api_gateway_preview" {
+  statement_id  = "AllowAPIGatewayInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.content_preview.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_api_gateway_rest_api.main.execution_arn}/*/*"
+}
+# API Gateway POST method for /content/jobs
+resource "aws_api_gateway_method" "content_jobs_post" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.content_jobs.id
+  http_method   = "POST"
+  authorization = "CUSTOM"
+  authorizer_id = aws_api_gateway_authorizer.lambda_authorizer.id
+}
+
+# Lambda integration for POST /content/jobs
+resource "aws_api_gateway_integration" "content_jobs_lambda" {
+  rest_api_id             = aws_api_gateway_rest_api.main.id
+  resource_id             = aws_api_gateway_resource.content_jobs.id
+  http_method             = aws_api_gateway_method.content_jobs_post.http_method
+  integration_http_method = "POST"
+  type                    = "AWS_PROXY"
+  uri                     = aws_lambda_function.content_jobs.invoke_arn
+}
+
+# API Gateway GET method for /content/jobs/{id}
+resource "aws_api_gateway_method" "content_job_get" {
+  rest_api_id   = aws_api_gateway_rest_api.main.id
+  resource_id   = aws_api_gateway_resource.content_job.id
+  http_method   = "GET"
+  authorization = "CUSTOM"
+  authorizer_id = aws_api_gateway_authorizer.lambda_authorizer.id
+
+  request_parameters = {
+    "method.request.path.id" = true
+  }
+}
+
+# Lambda integration for GET /content/jobs/{id}
+resource "aws_api_gateway_integration" "content_job_lambda" {
+  rest_api_id             = aws_api_gateway_rest_api.main.id
+  resource_id             = aws_api_gateway_resource.content_job.id
+  http_method             = aws_api_gateway_method.content_job_get.http_method
+  integration_http_method = "POST"
+  type                    = "AWS_PROXY"
+  uri                     = aws_lambda_function.content_jobs.invoke_arn
+}
+
+# Lambda permission for API Gateway to invoke the archive jobs
+resource "aws_lambda_permission" "api_gateway_jobs" {
+  statement_id  = "AllowAPIGatewayInvoke"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.content_jobs.function_name
+  principal     = "apigateway.amazonaws.com"
+  source_arn    = "${aws_api_gateway_rest_api.main.execution_arn}/*/*"
+}
+
+
 resource "aws_api_gateway_deployment" "v1" {
   rest_api_id = aws_api_gateway_rest_api.main.id
 
@@ -103,6 +204,21 @@ resource "aws_api_gateway_deployment" "v1" {
       aws_api_gateway_authorizer.lambda_authorizer.id,
       aws_api_gateway_method.content_options.id,
       aws_api_gateway_integration.content_options.id,
+      aws_api_gateway_resource.content_preview.id,
+      aws_api_gateway_method.content_preview_get.id,
+      aws_api_gateway_integration.content_preview_lambda.id,
+      aws_api_gateway_method.content_preview_options.id,
+      aws_api_gateway_integration.content_preview_options.id,
+      aws_api_gateway_resource.content_jobs.id,
+      aws_api_gateway_method.content_jobs_post.id,
+      aws_api_gateway_integration.content_jobs_lambda.id,
+      aws_api_gateway_method.content_jobs_options.id,
+      aws_api_gateway_integration.content_jobs_options.id,
+      aws_api_gateway_resource.content_job.id,
+      aws_api_gateway_method.content_job_get.id,
+      aws_api_gateway_integration.content_job_lambda.id,
+      aws_api_gateway_method.content_job_options.id,
+      aws_api_gateway_integration.content_job_options.id,
     ]))
   }
 
@@ -111,7 +227,10 @@ resource "aws_api_gateway_deployment" "v1" {
   }
 
   depends_on = [
-    aws_api_gateway_integration.content_lambda
+    aws_api_gateway_integration.content_lambda,
+    aws_api_gateway_integration.content_preview_lambda,
+    aws_api_gateway_integration.content_jobs_lambda,
+    aws_api_gateway_integration.content_job_lambda
   ]
 }
 
@@ -22,6 +22,7 @@ resource "aws_lambda_function" "authorizer" {
     variables = {
       ENVIRONMENT      = var.environment
       USERS_TABLE_NAME = aws_dynamodb_table.users.name
+      TRACE_EXPORTERS  = var.trace_exporters
     }
   }
 
@@ -110,3 +111,29 @@ resource "aws_dynamodb_table" "users" {
     Name = "${var.project_name}-${var.environment}-users"
   }
 }
+
+# DynamoDB Table for the DNI inverted index ###################################
+# Written by the player data uploader, one item per DNI listed by a user, for family downloads
+resource "aws_dynamodb_table" "dni_index" {
+  #checkov:skip=CKV_AWS_28:No backup is acceptable for this table as the uploader recreates it from the users data
+  #checkov:skip=CKV_AWS_119:AWS-managed encryption is acceptable
+
+  name         = "dni_index"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "dni"
+  range_key    = "username"
+
+  attribute {
+    name = "dni"
+    type = "S"
+  }
+
+  attribute {
+    name = "username"
+    type = "S"
+  }
+
+  tags = {
+    Name = "${var.project_name}-${var.environment}-dni-index"
+  }
+}
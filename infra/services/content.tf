@@ -18,26 +18,186 @@ resource "aws_lambda_function" "content_service" {
   s3_key                  = "content_service/content_service.zip"
   code_signing_config_arn = aws_lambda_code_signing_config.dev.arn
 
+  environment {
+    variables = {
+      ENVIRONMENT          = var.environment
+      USERS_TABLE_NAME     = aws_dynamodb_table.users.name
+      DNI_INDEX_TABLE_NAME = aws_dynamodb_table.dni_index.name
+      CONTENT_BUCKET_NAME  = aws_s3_bucket.content.id
+      CBTC_APP_URL         = var.app_url
+      TRACE_EXPORTERS      = var.trace_exporters
+      S3_GET_THREADS       = var.s3_get_threads
+    }
+  }
+
+  depends_on = [
+    aws_cloudwatch_log_group.content_lambda,
+    aws_iam_role_policy_attachment.content_lambda_basic
+  ]
+
+  tags = {
+    Name = "${var.project_name}-${var.environment}-content"
+  }
+}
+
+
+# Content preview Lambda function #############################################
+resource "aws_lambda_function" "content_preview" {
+  #checkov:skip=CKV_AWS_50:No need to enable X-Ray
+  #checkov:skip=CKV_AWS_116:No need for DLQ
+  #checkov:skip=CKV_AWS_117:It is OK to be in VPC without NAT for this function
+  #checkov:skip=CKV_AWS_173:No need to encrypt environment variables
+
+  function_name = "${var.project_name}-${var.environment}-content-preview"
+  role          = aws_iam_role.content_lambda.arn
+  handler       = "handler.preview_handler"
+  runtime       = "python3.12"
+  timeout       = 10
+  memory_size   = 128
+
+  reserved_concurrent_executions = -1
+
+  s3_bucket               = local.lambda_sources_bucket_name
+  s3_key                  = "content_service/content_service.zip"
+  code_signing_config_arn = aws_lambda_code_signing_config.dev.arn
+
   environment {
     variables = {
       ENVIRONMENT         = var.environment
       USERS_TABLE_NAME    = aws_dynamodb_table.users.name
       CONTENT_BUCKET_NAME = aws_s3_bucket.content.id
       CBTC_APP_URL        = var.app_url
+      TRACE_EXPORTERS     = var.trace_exporters
     }
   }
 
   depends_on = [
-    aws_cloudwatch_log_group.content_lambda,
+    aws_cloudwatch_log_group.content_preview_lambda,
     aws_iam_role_policy_attachment.content_lambda_basic
   ]
 
   tags = {
-    Name = "${var.project_name}-${var.environment}-content"
+    Name = "${var.project_name}-${var.environment}-content-preview"
+  }
+}
+
+# Content archive jobs Lambda function ########################################
+# Starts the archive jobs of photo sets too large for a response and reports their progress
+resource "aws_lambda_function" "content_jobs" {
+  #checkov:skip=CKV_AWS_50:No need to enable X-Ray
+  #checkov:skip=CKV_AWS_116:No need for DLQ
+  #checkov:skip=CKV_AWS_117:It is OK to be in VPC without NAT for this function
+  #checkov:skip=CKV_AWS_173:No need to encrypt environment variables
+
+  function_name = "${var.project_name}-${var.environment}-content-jobs"
+  role          = aws_iam_role.content_lambda.arn
+  handler       = "handler.jobs_handler"
+  runtime       = "python3.12"
+  timeout       = 10
+  memory_size   = 128
+
+  reserved_concurrent_executions = -1
+
+  s3_bucket               = local.lambda_sources_bucket_name
+  s3_key                  = "content_service/content_service.zip"
+  code_signing_config_arn = aws_lambda_code_signing_config.dev.arn
+
+  environment {
+    variables = {
+      ENVIRONMENT            = var.environment
+      USERS_TABLE_NAME       = aws_dynamodb_table.users.name
+      CONTENT_BUCKET_NAME    = aws_s3_bucket.content.id
+      CBTC_APP_URL           = var.app_url
+      TRACE_EXPORTERS        = var.trace_exporters
+      ARCHIVE_JOBS_QUEUE_URL = aws_sqs_queue.archive_jobs.url
+    }
+  }
+
+  depends_on = [
+    aws_cloudwatch_log_group.content_jobs_lambda,
+    aws_iam_role_policy_attachment.content_lambda_basic
+  ]
+
+  tags = {
+    Name = "${var.project_name}-${var.environment}-content-jobs"
   }
 }
 
+# Archive jobs worker Lambda function #########################################
+# Streams the archives to S3 in parts, so memory does not grow with the photo set
+resource "aws_lambda_function" "archive_jobs" {
+  #checkov:skip=CKV_AWS_50:No need to enable X-Ray
+  #checkov:skip=CKV_AWS_116:Failed messages go to the dead-letter queue of the archive jobs queue
+  #checkov:skip=CKV_AWS_117:It is OK to be in VPC without NAT for this function
+  #checkov:skip=CKV_AWS_173:No need to encrypt environment variables
+
+  function_name = "${var.project_name}-${var.environment}-archive-jobs"
+  role          = aws_iam_role.content_lambda.arn
+  handler       = "handler.archive_jobs_handler"
+  runtime       = "python3.12"
+  timeout       = 900
+  memory_size   = 512
+
+  reserved_concurrent_executions = -1
+
+  s3_bucket               = local.lambda_sources_bucket_name
+  s3_key                  = "content_service/content_service.zip"
+  code_signing_config_arn = aws_lambda_code_signing_config.dev.arn
 
+  environment {
+    variables = {
+      ENVIRONMENT         = var.environment
+      USERS_TABLE_NAME    = aws_dynamodb_table.users.name
+      CONTENT_BUCKET_NAME = aws_s3_bucket.content.id
+      TRACE_EXPORTERS     = var.trace_exporters
+    }
+  }
+
+  depends_on = [
+    aws_cloudwatch_log_group.archive_jobs_lambda,
+    aws_iam_role_policy_attachment.content_lambda_basic
+  ]
+
+  tags = {
+    Name = "${var.project_name}-${var.environment}-archive-jobs"
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "archive_jobs" {
+  event_source_arn        = aws_sqs_queue.archive_jobs.arn
+  function_name           = aws_lambda_function.archive_jobs.arn
+  batch_size              = 1
+  function_response_types = ["ReportBatchItemFailures"]
+}
+
+# Archive jobs queue ##########################################################
+resource "aws_sqs_queue" "archive_jobs" {
+  name                    = "${var.project_name}-${var.environment}-archive-jobs"
+  sqs_managed_sse_enabled = true
+
+  # Six times the worker timeout, as Lambda recommends for SQS event sources
+  visibility_timeout_seconds = 5400
+  message_retention_seconds  = 86400
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.archive_jobs_dlq.arn
+    maxReceiveCount     = 3
+  })
+
+  tags = {
+    Name = "${var.project_name}-${var.environment}-archive-jobs"
+  }
+}
+
+resource "aws_sqs_queue" "archive_jobs_dlq" {
+  name                      = "${var.project_name}-${var.environment}-archive-jobs-dlq"
+  sqs_managed_sse_enabled   = true
+  message_retention_seconds = 1209600
+
+  tags = {
+    Name = "${var.project_name}-${var.environment}-archive-jobs-dlq"
+  }
+}
 
 # IAM permissions #############################################################
 resource "aws_iam_role" "content_lambda" {
@@ -83,6 +243,35 @@ resource "aws_iam_role_policy" "content_lambda_s3" {
           aws_s3_bucket.content.arn,
           "${aws_s3_bucket.content.arn}/*"
         ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "s3:PutObject",
+          "s3:AbortMultipartUpload",
+        ]
+        Resource = "${aws_s3_bucket.content.arn}/jobs/*"
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy" "content_lambda_sqs" {
+  name = "${var.project_name}-${var.environment}-content-sqs"
+  role = aws_iam_role.content_lambda.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "sqs:SendMessage",
+          "sqs:ReceiveMessage",
+          "sqs:DeleteMessage",
+          "sqs:GetQueueAttributes",
+        ]
+        Resource = aws_sqs_queue.archive_jobs.arn
       }
     ]
   })
@@ -99,10 +288,16 @@ resource "aws_iam_role_policy" "content_lambda_dynamodb" {
         Effect = "Allow"
         Action = [
           "dynamodb:GetItem",
+          "dynamodb:BatchGetItem",
           "dynamodb:Scan",
           "dynamodb:PutItem"
         ]
         Resource = aws_dynamodb_table.users.arn
+      },
+      {
+        Effect   = "Allow"
+        Action   = "dynamodb:Query"
+        Resource = aws_dynamodb_table.dni_index.arn
       }
     ]
   })
@@ -121,6 +316,45 @@ resource "aws_cloudwatch_log_group" "content_lambda" {
   }
 }
 
+# CloudWatch Log Group for content preview Lambda #############################
+resource "aws_cloudwatch_log_group" "content_preview_lambda" {
+  #checkov:skip=CKV_AWS_158:AWS-manged key is acceptable for content_preview_lambda logs
+  #checkov:skip=CKV_AWS_338:30 days retention is acceptable for content_preview_lambda logs
+
+  name              = "/aws/lambda/${var.project_name}-${var.environment}-content-preview"
+  retention_in_days = 30
+
+  tags = {
+    Name = "${var.project_name}-${var.environment}-content-preview-logs"
+  }
+}
+
+# CloudWatch Log Group for content jobs Lambda ################################
+resource "aws_cloudwatch_log_group" "content_jobs_lambda" {
+  #checkov:skip=CKV_AWS_158:AWS-manged key is acceptable for content_jobs_lambda logs
+  #checkov:skip=CKV_AWS_338:30 days retention is acceptable for content_jobs_lambda logs
+
+  name              = "/aws/lambda/${var.project_name}-${var.environment}-content-jobs"
+  retention_in_days = 30
+
+  tags = {
+    Name = "${var.project_name}-${var.environment}-content-jobs-logs"
+  }
+}
+
+# CloudWatch Log Group for archive jobs worker Lambda #########################
+resource "aws_cloudwatch_log_group" "archive_jobs_lambda" {
+  #checkov:skip=CKV_AWS_158:AWS-manged key is acceptable for archive_jobs_lambda logs
+  #checkov:skip=CKV_AWS_338:30 days retention is acceptable for archive_jobs_lambda logs
+
+  name              = "/aws/lambda/${var.project_name}-${var.environment}-archive-jobs"
+  retention_in_days = 30
+
+  tags = {
+    Name = "${var.project_name}-${var.environment}-archive-jobs-logs"
+  }
+}
+
 # Content Bucket ##############################################################
 resource "aws_s3_bucket" "content" {
   bucket = "${var.project_name}-${var.environment}-content-${data.aws_caller_identity.current.account_id}"
@@ -160,3 +394,32 @@ resource "aws_s3_bucket_server_side_encryption_configuration" "content" {
     }
   }
 }
+
+# Archives of jobs are downloaded within hours, their presigned URLs last one
+resource "aws_s3_bucket_lifecycle_configuration" "content" {
+  bucket = aws_s3_bucket.content.id
+
+  rule {
+    id     = "expire-archive-jobs"
+    status = "Enabled"
+
+    filter {
+      prefix = "jobs/"
+    }
+
+    expiration {
+      days = 2
+    }
+  }
+
+  rule {
+    id     = "abort-incomplete-multipart-uploads"
+    status = "Enabled"
+
+    filter {}
+
+    abort_incomplete_multipart_upload {
+      days_after_initiation = 1
+    }
+  }
+}
@@ -8,6 +8,16 @@ output "content_lambda_arn" {
   value       = aws_lambda_function.content_service.arn
 }
 
+output "content_preview_lambda_arn" {
+  description = "ARN of the content preview Lambda function"
+  value       = aws_lambda_function.content_preview.arn
+}
+
+output "archive_jobs_queue_url" {
+  description = "URL of the archive jobs SQS queue"
+  value       = aws_sqs_queue.archive_jobs.url
+}
+
 output "api_gateway_id" {
   description = "ID of the API Gateway REST API"
   value       = aws_api_gateway_rest_api.main.id
@@ -17,3 +27,8 @@ output "users_table_name" {
   description = "Name of the users DynamoDB table"
   value       = aws_dynamodb_table.users.name
 }
+
+output "dni_index_table_name" {
+  description = "Name of the DNI inverted index DynamoDB table"
+  value       = aws_dynamodb_table.dni_index.name
+}
@@ -27,3 +27,21 @@ variable "app_url" {
   type        = string
   default     = "https://default.cbtc.app"
 }
+
+variable "warmup_schedule_expression" {
+  description = "EventBridge schedule of the warm-up invocations of the Lambda functions"
+  type        = string
+  default     = "rate(5 minutes)"
+}
+
+variable "trace_exporters" {
+  description = "Comma separated exporters of the request traces (stdout, file), none to disable tracing"
+  type        = string
+  default     = ""
+}
+
+variable "s3_get_threads" {
+  description = "Threads of the content Lambda running the S3 GETs of the photos, shared by concurrent requests"
+  type        = number
+  default     = 8
+}
@@ -0,0 +1,39 @@
+# Warm-up schedule #############################################################
+# Keeps containers warm with their clients connected and the team photos cached
+resource "aws_cloudwatch_event_rule" "warmup" {
+  name                = "${var.project_name}-${var.environment}-warmup"
+  description         = "Warm-up invocations of the ${var.project_name} Lambda functions"
+  schedule_expression = var.warmup_schedule_expression
+
+  tags = {
+    Name = "${var.project_name}-${var.environment}-warmup"
+  }
+}
+
+locals {
+  warmup_functions = {
+    authorizer      = aws_lambda_function.authorizer
+    content         = aws_lambda_function.content_service
+    content_preview = aws_lambda_function.content_preview
+    content_jobs    = aws_lambda_function.content_jobs
+  }
+}
+
+resource "aws_cloudwatch_event_target" "warmup" {
+  for_each = local.warmup_functions
+
+  rule      = aws_cloudwatch_event_rule.warmup.name
+  target_id = "${each.key}-warmup"
+  arn       = each.value.arn
+  input     = jsonencode({ warmup = true })
+}
+
+resource "aws_lambda_permission" "warmup" {
+  for_each = local.warmup_functions
+
+  statement_id  = "AllowEventBridgeWarmup"
+  action        = "lambda:InvokeFunction"
+  function_name = each.value.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.warmup.arn
+}
@@ -0,0 +1,5 @@
+"""Observability helpers shared by the Lambda services."""
+
+from .metrics import Metrics, current_metrics, metered
+from .structured_logging import bind, get_logger, redact, start_invocation
+from .tracing import JsonLinesFileExporter, StdoutExporter, Tracer, current_span, current_trace_id, traced
@@ -0,0 +1,153 @@
+"""
+Per-invocation metrics in CloudWatch Embedded Metric Format (EMF).
+
+A handler decorated with `metered` records its metrics on the invocation's
+Metrics, reachable from any helper through `current_metrics()`, and prints
+them as a single EMF JSON line when it returns. CloudWatch extracts the
+metrics from the log line, so no API call is made from the Lambda.
+"""
+
+import contextvars
+import functools
+import json
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+NAMESPACE = "CBTCMediaDay"
+
+# Every metric is split by service and by whether the invocation started the container
+DIMENSIONS = ("Service", "ColdStart")
+
+# Whether the next invocation of this container is its first one
+_cold_start = True
+
+# Metrics of the invocation in progress, per context so invocations running on concurrent threads, as in the
+# self-hosted server, keep theirs apart. Threads started with copy_context() record on their invocation's.
+_current: contextvars.ContextVar["Metrics | None"] = contextvars.ContextVar("metrics", default=None)
+
+
+class Metrics:
+    """
+    Metrics of one invocation, emitted as a single EMF record.
+
+    Values recorded under the same name are summed, so a phase run several
+    times adds up to its total time. Safe to use from worker threads.
+    """
+
+    def __init__(self, service: str, cold_start: bool = False, namespace: str = NAMESPACE):
+        self.service = service
+        self.cold_start = cold_start
+        self.namespace = namespace
+        self._values: dict[str, float] = {}
+        self._units: dict[str, str] = {}
+        self._properties: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, value: float = 1, unit: str = "Count") -> None:
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + value
+            self._units[name] = unit
+
+    def put(self, name: str, value: float, unit: str = "Count") -> None:
+        with self._lock:
+            self._values[name] = value
+            self._units[name] = unit
+
+    def set_property(self, name: str, value: Any) -> None:
+        """Attach a value to the record that is searchable in the logs but not a metric."""
+        with self._lock:
+            self._properties[name] = value
+
+    @contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        """Add the time spent in the block to the "<phase>Time" metric, in milliseconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(f"{phase}Time", round((time.perf_counter() - started) * 1000, 3), "Milliseconds")
+
+    def get(self, name: str) -> float | None:
+        with self._lock:
+            return self._values.get(name)
+
+    def to_emf(self) -> dict[str, Any]:
+        with self._lock:
+            values = dict(self._values)
+            units = dict(self._units)
+            properties = dict(self._properties)
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": [list(DIMENSIONS)],
+                        "Metrics": [{"Name": name, "Unit": units[name]} for name in values],
+                    }
+                ],
+            },
+            "Service": self.service,
+            "ColdStart": "cold" if self.cold_start else "warm",
+            **properties,
+            **values,
+        }
+
+    def emit(self) -> None:
+        sys.stdout.write(json.dumps(self.to_emf(), default=str) + "\n")
+        sys.stdout.flush()
+
+
+def current_metrics() -> Metrics:
+    """
+    Metrics of the invocation in progress.
+
+    Outside a metered invocation a detached Metrics is returned, so helpers
+    can always record and nothing is emitted.
+    """
+    metrics = _current.get()
+    return metrics if metrics is not None else Metrics("detached")
+
+
+def metered(service: str, counters: tuple[tuple[str, str], ...] = ()) -> Callable:
+    """
+    Decorate a Lambda handler to emit the metrics of every invocation.
+
+    Args:
+        service: Value of the Service dimension
+        counters: (name, unit) of the metrics reported as 0 when nothing is recorded
+
+    Returns:
+        Decorator of handlers taking (event, context)
+    """
+
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event: dict[str, Any], context: Any) -> Any:
+            global _cold_start
+            metrics = Metrics(service, cold_start=_cold_start)
+            _cold_start = False
+            for name, unit in counters:
+                metrics.put(name, 0, unit)
+            request_id = getattr(context, "aws_request_id", None)
+            if request_id:
+                metrics.set_property("RequestId", request_id)
+
+            token = _current.set(metrics)
+            try:
+                with metrics.timer("Total"):
+                    response = handler(event, context)
+                if isinstance(response, dict) and "statusCode" in response:
+                    metrics.set_property("StatusCode", response["statusCode"])
+                return response
+            finally:
+                _current.reset(token)
+                metrics.emit()
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,166 @@
+"""
+Structured JSON logging for the Lambda handlers.
+
+Every record is written to stdout as one JSON line carrying the fields of the
+invocation in progress, like its request ID. Messages are formatted lazily,
+only for the records that are written, and credentials are redacted from the
+messages and fields.
+
+Levels given a sample rate are only logged by a sample of the invocations,
+drawn when the invocation starts, so per-photo and per-phase debug lines come
+complete for the sampled requests and cost nothing for the others.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import sys
+from typing import Any
+
+# Fields whose value is never logged, compared lowercase
+REDACTED_FIELDS = frozenset({"authorization", "authorizationtoken", "credentials", "decoded_auth", "dni", "dnis"})
+REDACTED = "***"
+
+# Credentials that may end up in a message: Basic tokens and DNI/NIE numbers
+_CREDENTIAL_PATTERNS = (
+    re.compile(r"(Basic\s+)[A-Za-z0-9+/=]+"),
+    re.compile(r"\b[XYZ]?\d{7,8}[A-Z]\b"),
+)
+
+# LogRecord attributes that are not extra fields of the record
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+# Fields of the invocation in progress, added to every record. Kept per context so concurrent invocations, as in
+# the self-hosted server, log their own, and replaced rather than updated so no context changes another's fields.
+_context: contextvars.ContextVar[dict[str, Any] | None] = contextvars.ContextVar("log_context", default=None)
+
+
+def redact(value: Any) -> Any:
+    """Redact the credentials of a message, or of the fields of a structure."""
+    if isinstance(value, str):
+        for pattern in _CREDENTIAL_PATTERNS:
+            value = pattern.sub(lambda match: f"{match.group(1) if match.groups() else ''}{REDACTED}", value)
+        return value
+    if isinstance(value, dict):
+        return {key: REDACTED if str(key).lower() in REDACTED_FIELDS else redact(item) for key, item in value.items()}
+    if isinstance(value, list | tuple):
+        return [redact(item) for item in value]
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def __init__(self, service: str):
+        super().__init__()
+        self.service = service
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": int(record.created * 1000),
+            "level": record.levelname,
+            "service": self.service,
+            "message": record.getMessage(),
+            **(_context.get() or {}),
+            **{key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES},
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(redact(entry), default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Let records of a sampled level through only in the invocations drawn for it.
+
+    Records of other levels pass when they reach the configured level.
+    """
+
+    def __init__(self, level: int, sample_rates: dict[int, float], rng: random.Random | None = None):
+        super().__init__()
+        self.level = level
+        self.sample_rates = sample_rates
+        self._rng = rng or random.Random()
+        # Drawn per invocation, so per context like the fields of the records
+        self._sampled: contextvars.ContextVar[dict[int, bool] | None] = contextvars.ContextVar(
+            f"sampled_{id(self)}", default=None
+        )
+
+    def resample(self) -> None:
+        self._sampled.set({level: self._rng.random() < rate for level, rate in self.sample_rates.items()})
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.level:
+            return True
+        return (self._sampled.get() or {}).get(record.levelno, False)
+
+
+class StdoutHandler(logging.StreamHandler):
+    """Write to the current sys.stdout, which the Lambda runtime and test runners replace."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.stream = sys.stdout
+        super().emit(record)
+
+
+def _level(name: str) -> int:
+    level = logging.getLevelName(name.upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level: {name}")
+    return level
+
+
+def get_logger(service: str) -> logging.Logger:
+    """
+    Logger writing JSON lines to stdout, configured once per container.
+
+    The level comes from LOG_LEVEL (INFO by default) and the sample rate of
+    DEBUG lines from LOG_DEBUG_SAMPLE_RATE (0.01 by default). Records do not
+    propagate to the root logger, whose Lambda runtime handler would write
+    them a second time.
+
+    Args:
+        service: Name of the logger, written as the service of every record
+
+    Returns:
+        Configured logger
+    """
+    logger = logging.getLogger(service)
+    if any(isinstance(handler, StdoutHandler) for handler in logger.handlers):
+        return logger
+
+    level = _level(os.environ.get("LOG_LEVEL", "INFO"))
+    sample_rates = {logging.DEBUG: float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0.01"))}
+
+    handler = StdoutHandler()
+    handler.setFormatter(JsonFormatter(service))
+    handler.addFilter(SamplingFilter(level, sample_rates))
+    logger.addHandler(handler)
+    logger.setLevel(min(level, *(sampled for sampled, rate in sample_rates.items() if rate > 0)))
+    logger.propagate = False
+    return logger
+
+
+def start_invocation(logger: logging.Logger, context: Any, **fields: Any) -> None:
+    """
+    Reset the fields added to every record and draw the sampled levels of a new invocation.
+
+    Args:
+        logger: Logger returned by get_logger
+        context: Lambda context object, giving the request ID
+        **fields: Other fields to add to every record of the invocation
+    """
+    request_id = getattr(context, "aws_request_id", None)
+    _context.set({"requestId": request_id, **fields} if request_id else dict(fields))
+    for handler in logger.handlers:
+        for log_filter in handler.filters:
+            if isinstance(log_filter, SamplingFilter):
+                log_filter.resample()
+
+
+def bind(**fields: Any) -> None:
+    """Add fields to every remaining record of the invocation in progress."""
+    _context.set({**(_context.get() or {}), **fields})
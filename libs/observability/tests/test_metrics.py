@@ -0,0 +1,102 @@
+"""
+Unit tests for the EMF metrics.
+"""
+
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from observability import metrics
+from observability.metrics import Metrics, current_metrics, metered
+
+
+def emitted_records(capsys) -> list[dict]:
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines() if '"_aws"' in line]
+
+
+class TestMetrics:
+    def test_sums_values_and_declares_every_metric(self):
+        recorded = Metrics("content", cold_start=True)
+        recorded.add("S3Gets")
+        recorded.add("S3Gets")
+        recorded.put("ArchiveBytes", 10, "Bytes")
+        with recorded.timer("Zip"):
+            pass
+        with recorded.timer("Zip"):
+            pass
+
+        record = recorded.to_emf()
+
+        assert record["S3Gets"] == 2
+        assert record["ArchiveBytes"] == 10
+        assert record["ZipTime"] >= 0
+        assert record["Service"] == "content"
+        assert record["ColdStart"] == "cold"
+        directive = record["_aws"]["CloudWatchMetrics"][0]
+        assert directive["Dimensions"] == [["Service", "ColdStart"]]
+        assert {"Name": "ArchiveBytes", "Unit": "Bytes"} in directive["Metrics"]
+        assert {"Name": "ZipTime", "Unit": "Milliseconds"} in directive["Metrics"]
+
+    def test_current_metrics_is_detached_outside_invocations(self):
+        current_metrics().add("S3Gets")
+
+        assert current_metrics().get("S3Gets") is None
+
+
+class TestMetered:
+    @pytest.fixture(autouse=True)
+    def cold_container(self, monkeypatch):
+        monkeypatch.setattr(metrics, "_cold_start", True)
+
+    def test_emits_one_record_per_invocation(self, capsys):
+        @metered("content", (("S3Gets", "Count"),))
+        def handler(event, context):
+            current_metrics().add("DynamoDBCalls")
+            return {"statusCode": 200}
+
+        handler({}, SimpleNamespace(aws_request_id="request-1"))
+        handler({}, None)
+
+        first, second = emitted_records(capsys)
+        assert first["ColdStart"] == "cold" and second["ColdStart"] == "warm"
+        assert first["S3Gets"] == 0 and first["DynamoDBCalls"] == 1
+        assert first["StatusCode"] == 200
+        assert first["RequestId"] == "request-1"
+        assert first["TotalTime"] >= 0
+
+    def test_emits_when_the_handler_raises(self, capsys):
+        @metered("content")
+        def handler(event, context):
+            current_metrics().add("S3Gets")
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            handler({}, None)
+
+        (record,) = emitted_records(capsys)
+        assert record["S3Gets"] == 1
+
+    def test_concurrent_invocations_keep_their_metrics_apart(self, capsys):
+        both_started = threading.Barrier(2)
+
+        @metered("content")
+        def handler(event, context):
+            both_started.wait(5)
+            for _ in range(event["count"]):
+                current_metrics().add("Mine")
+            both_started.wait(5)
+            return {"statusCode": 200}
+
+        threads = [
+            threading.Thread(target=handler, args=({"count": count}, SimpleNamespace(aws_request_id=str(count))))
+            for count in (2, 200)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        records = {record["RequestId"]: record["Mine"] for record in emitted_records(capsys)}
+        assert records == {"2": 2, "200": 200}
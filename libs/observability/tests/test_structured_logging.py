@@ -0,0 +1,155 @@
+"""
+Unit tests for the structured JSON logging.
+"""
+
+import json
+import logging
+import random
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from observability.structured_logging import (
+    JsonFormatter,
+    SamplingFilter,
+    StdoutHandler,
+    bind,
+    get_logger,
+    redact,
+    start_invocation,
+)
+
+
+@pytest.fixture
+def logger():
+    logger = get_logger("observability-test")
+    yield logger
+    for handler in [handler for handler in logger.handlers if isinstance(handler, StdoutHandler)]:
+        logger.removeHandler(handler)
+
+
+def logged_lines(capsys) -> list[dict]:
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+class TestRedact:
+    def test_redacts_credentials_in_messages(self):
+        assert redact("header Basic MTIzNDU2NzhBOkp1YW4= sent") == "header Basic *** sent"
+        assert redact("DNI 12345678A and NIE X1234567L") == "DNI *** and NIE ***"
+
+    def test_redacts_credential_fields(self):
+        fields = {"headers": {"Authorization": "Basic abc"}, "dnis": ["12345678A"], "username": "Juan"}
+
+        assert redact(fields) == {"headers": {"Authorization": "***"}, "dnis": "***", "username": "Juan"}
+
+
+class TestJsonLogger:
+    def test_writes_one_json_line_with_invocation_fields(self, logger, capsys):
+        start_invocation(logger, SimpleNamespace(aws_request_id="request-1"))
+        bind(username="Juan")
+
+        logger.warning("Photo not found: %s", "Juan/001.png", extra={"bucket": "content"})
+
+        (line,) = logged_lines(capsys)
+        assert line["level"] == "WARNING"
+        assert line["service"] == "observability-test"
+        assert line["message"] == "Photo not found: Juan/001.png"
+        assert line["requestId"] == "request-1"
+        assert line["username"] == "Juan"
+        assert line["bucket"] == "content"
+
+    def test_new_invocation_resets_fields(self, logger, capsys):
+        start_invocation(logger, SimpleNamespace(aws_request_id="request-1"))
+        bind(username="Juan")
+        start_invocation(logger, None)
+
+        logger.info("Warmed up")
+
+        (line,) = logged_lines(capsys)
+        assert "requestId" not in line and "username" not in line
+
+    def test_concurrent_invocations_log_their_own_fields(self, logger, capsys):
+        both_started = threading.Barrier(2)
+
+        def invocation(request_id):
+            start_invocation(logger, SimpleNamespace(aws_request_id=request_id))
+            bind(username=f"user-{request_id}")
+            both_started.wait(5)
+            logger.info("Serving")
+
+        threads = [threading.Thread(target=invocation, args=(request_id,)) for request_id in ("a", "b")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        lines = logged_lines(capsys)
+        assert sorted((line["requestId"], line["username"]) for line in lines) == [("a", "user-a"), ("b", "user-b")]
+
+    def test_is_configured_once(self, logger):
+        assert get_logger("observability-test") is logger
+        assert len([handler for handler in logger.handlers if isinstance(handler, StdoutHandler)]) == 1
+        assert logger.propagate is False
+
+
+class TestSampling:
+    def _logger(self, rate: float) -> logging.Logger:
+        logger = logging.getLogger(f"sampling-test-{rate}")
+        logger.handlers.clear()
+        handler = StdoutHandler()
+        handler.setFormatter(JsonFormatter("test"))
+        handler.addFilter(SamplingFilter(logging.INFO, {logging.DEBUG: rate}, rng=random.Random(0)))
+        logger.addHandler(handler)
+        logger.setLevel(logging.DEBUG)
+        logger.propagate = False
+        return logger
+
+    def test_debug_lines_of_unsampled_invocations_are_dropped_unformatted(self, capsys):
+        logger = self._logger(0.0)
+        formatted = []
+
+        class Photo:
+            def __str__(self):
+                formatted.append(self)
+                return "photo"
+
+        start_invocation(logger, None)
+        logger.debug("Retrieving photo: %s", Photo())
+        logger.info("Retrieved %d out of %d photos", 1, 1)
+
+        assert [line["level"] for line in logged_lines(capsys)] == ["INFO"]
+        assert formatted == []
+
+    def test_sampled_invocations_log_every_debug_line(self, capsys):
+        logger = self._logger(1.0)
+
+        start_invocation(logger, None)
+        for index in range(3):
+            logger.debug("Retrieving photo: %d", index)
+
+        assert len(logged_lines(capsys)) == 3
+
+    def test_concurrent_invocations_keep_their_sampling_decision(self, capsys):
+        logger = self._logger(0.5)
+        (sampling,) = logger.handlers[0].filters
+        # The first invocation drawn is sampled, the second is not
+        sampling._rng = SimpleNamespace(random=iter([0.1, 0.9]).__next__)
+        drawn = threading.Lock()
+        both_started = threading.Barrier(2)
+
+        def invocation(request_id):
+            with drawn:
+                start_invocation(logger, SimpleNamespace(aws_request_id=request_id))
+                order.append(request_id)
+            both_started.wait(5)
+            logger.debug("Retrieving photo")
+
+        order = []
+        threads = [threading.Thread(target=invocation, args=(request_id,)) for request_id in ("a", "b")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert [line["requestId"] for line in logged_lines(capsys)] == [order[0]]
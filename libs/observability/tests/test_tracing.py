@@ -0,0 +1,121 @@
+"""
+Unit tests for the request tracing.
+"""
+
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from observability.tracing import (
+    JsonLinesFileExporter,
+    StdoutExporter,
+    Tracer,
+    current_trace_id,
+    exporters_from_env,
+    traced,
+)
+
+
+class CollectingExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+@pytest.fixture
+def exporter():
+    return CollectingExporter()
+
+
+@pytest.fixture
+def tracer(exporter):
+    return Tracer("test", exporters=[exporter])
+
+
+class TestTracer:
+    def test_nests_spans_of_a_trace(self, tracer, exporter):
+        @traced(tracer, "request")
+        def handler(event, context):
+            with tracer.span("dynamodb.GetItem", table="users"):
+                pass
+            with tracer.span("s3.GetObject", key="a.png"):
+                pass
+            return {"statusCode": 200, "traceId": current_trace_id()}
+
+        response = handler({"requestContext": {"requestId": "request-1", "authorizer": {"traceId": "request-0"}}}, None)
+
+        get_item, get_object, root = exporter.spans
+        assert response["traceId"] == "request-1"
+        assert {span.trace_id for span in exporter.spans} == {"request-1"}
+        assert get_item.parent_id == get_object.parent_id == root.span_id
+        assert root.parent_id is None
+        assert root.attributes == {"authorizerTraceId": "request-0", "statusCode": 200}
+        assert get_item.attributes == {"table": "users"}
+        assert current_trace_id() is None
+
+    def test_marks_failed_spans(self, tracer, exporter):
+        with pytest.raises(KeyError), tracer.span("s3.GetObject"):
+            raise KeyError("missing")
+
+        (span,) = exporter.spans
+        assert span.status == "error"
+        assert span.attributes["error"] == "KeyError"
+        assert span.duration_ms >= 0
+
+    def test_threads_started_with_the_context_join_the_trace(self, tracer, exporter):
+        def fetch():
+            with tracer.span("s3.GetObject"):
+                pass
+
+        @traced(tracer, "request")
+        def handler(event, context):
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(contextvars.copy_context().run, fetch).result()
+
+        handler({"requestContext": {"requestId": "request-1"}}, None)
+
+        fetched, root = exporter.spans
+        assert fetched.trace_id == "request-1"
+        assert fetched.parent_id == root.span_id
+
+
+class TestExporters:
+    def test_file_exporter_appends_json_lines(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        tracer = Tracer("test", exporters=[JsonLinesFileExporter(str(path))])
+
+        with tracer.span("first"), tracer.span("second"):
+            pass
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [line["name"] for line in lines] == ["second", "first"]
+        assert lines[0]["parentId"] == lines[1]["spanId"]
+        assert lines[0]["type"] == "span"
+
+    def test_stdout_exporter(self, capsys):
+        tracer = Tracer("test", exporters=[StdoutExporter()])
+
+        with tracer.span("s3.HeadBucket"):
+            pass
+
+        assert json.loads(capsys.readouterr().out)["name"] == "s3.HeadBucket"
+
+    def test_exporters_from_env(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("TRACE_EXPORTERS", "stdout, file")
+        monkeypatch.setenv("TRACE_FILE", str(tmp_path / "traces.jsonl"))
+
+        stdout, file = exporters_from_env()
+
+        assert isinstance(stdout, StdoutExporter)
+        assert file.path == str(tmp_path / "traces.jsonl")
+
+        monkeypatch.setenv("TRACE_EXPORTERS", "")
+        assert exporters_from_env() == []
+
+        monkeypatch.setenv("TRACE_EXPORTERS", "xray")
+        with pytest.raises(ValueError):
+            exporters_from_env()
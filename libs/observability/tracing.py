@@ -0,0 +1,185 @@
+"""
+In-process request tracing without X-Ray.
+
+A trace is the tree of spans of one API request, identified by the API
+Gateway request ID, so the authorizer decision and the content invocation of
+the same request share their trace ID. Finished spans are written by the
+exporters named in TRACE_EXPORTERS, a comma separated list of "stdout" and
+"file" (JSON lines appended to TRACE_FILE, /tmp/traces.jsonl by default).
+Tracing costs nothing beyond the span bookkeeping when no exporter is set.
+"""
+
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+DEFAULT_TRACE_FILE = "/tmp/traces.jsonl"
+
+# Trace ID and span of the code running, inherited by the threads started with copy_context()
+_trace_id: contextvars.ContextVar[str | None] = contextvars.ContextVar("trace_id", default=None)
+_current_span: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    """A timed operation of a trace."""
+
+    name: str
+    service: str
+    trace_id: str
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    parent_id: str | None = None
+    start: float = field(default_factory=time.time)
+    duration_ms: float | None = None
+    status: str = "ok"
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    def set_attribute(self, name: str, value: Any) -> None:
+        self.attributes[name] = value
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "type": "span",
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentId": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "start": int(self.start * 1000),
+            "durationMs": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class StdoutExporter:
+    """Write finished spans to stdout as JSON lines, collected with the Lambda logs."""
+
+    def export(self, span: Span) -> None:
+        sys.stdout.write(json.dumps(span.to_dict(), default=str) + "\n")
+        sys.stdout.flush()
+
+
+class JsonLinesFileExporter:
+    """Append finished spans to a JSON lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+def exporters_from_env() -> list:
+    """Exporters named in TRACE_EXPORTERS."""
+    exporters = []
+    for name in (name.strip() for name in os.environ.get("TRACE_EXPORTERS", "").split(",")):
+        if name == "stdout":
+            exporters.append(StdoutExporter())
+        elif name == "file":
+            exporters.append(JsonLinesFileExporter(os.environ.get("TRACE_FILE", DEFAULT_TRACE_FILE)))
+        elif name:
+            raise ValueError(f"Unknown trace exporter: {name}")
+    return exporters
+
+
+class Tracer:
+    """
+    Creates the spans of a service and hands the finished ones to the exporters.
+    """
+
+    def __init__(self, service: str, exporters: list | None = None):
+        self.service = service
+        self.exporters = exporters_from_env() if exporters is None else exporters
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Time the block as a child of the current span.
+
+        The span is marked as an error, with the exception type, when the
+        block raises. Outside a trace the span gets a trace of its own.
+        """
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            service=self.service,
+            trace_id=_trace_id.get() or uuid.uuid4().hex,
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes,
+        )
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.set_attribute("error", type(e).__name__)
+            raise
+        finally:
+            span.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            _current_span.reset(token)
+            for exporter in self.exporters:
+                exporter.export(span)
+
+
+def current_trace_id() -> str | None:
+    return _trace_id.get()
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def trace_id_from_event(event: dict[str, Any], context: Any = None) -> str:
+    """
+    Trace ID of a request: its API Gateway request ID, else the Lambda request ID, else a new ID.
+    """
+    request_context = event.get("requestContext") or {}
+    return request_context.get("requestId") or getattr(context, "aws_request_id", None) or uuid.uuid4().hex
+
+
+def traced(tracer: Tracer, name: str) -> Callable:
+    """
+    Decorate a Lambda handler to run every invocation in the root span of its request's trace.
+
+    Args:
+        tracer: Tracer of the service
+        name: Name of the root span
+
+    Returns:
+        Decorator of handlers taking (event, context)
+    """
+
+    def decorator(handler: Callable) -> Callable:
+        @functools.wraps(handler)
+        def wrapper(event: dict[str, Any], context: Any) -> Any:
+            trace_token = _trace_id.set(trace_id_from_event(event, context))
+            try:
+                with tracer.span(name) as span:
+                    # Links the request to the authorizer decision it was let in by, possibly cached
+                    authorizer = (event.get("requestContext") or {}).get("authorizer") or {}
+                    if authorizer.get("traceId"):
+                        span.set_attribute("authorizerTraceId", authorizer["traceId"])
+                    response = handler(event, context)
+                    if isinstance(response, dict) and "statusCode" in response:
+                        span.set_attribute("statusCode", response["statusCode"])
+                    return response
+            finally:
+                _trace_id.reset(trace_token)
+
+        return wrapper
+
+    return decorator
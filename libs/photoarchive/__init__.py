@@ -0,0 +1,3 @@
+"""Layout of the players' photo archives, shared by the content service and the archive builder pipeline."""
+
+from .layout import ARCHIVE_VERSION, ARCHIVES_PREFIX, ZIP_DATE_TIME, archive_key, photos_fingerprint, zip_info
@@ -0,0 +1,50 @@
+"""
+Layout of the players' photo archives.
+
+The archive builder pipeline prebuilds each player's archive under a key derived
+from the photo set, and the content service serves it when the key of the
+player's current photos exists, building the same archive live otherwise. Both
+name and zip archives from this module, so they cannot drift apart.
+"""
+
+import hashlib
+import zipfile
+
+ARCHIVES_PREFIX = "archives/"
+
+# Bumped when the archive layout changes, so prebuilt archives of another layout are not served
+ARCHIVE_VERSION = 2
+
+# Photos are already compressed, so archives store them as is with fixed metadata. Archives
+# are then byte for byte reproducible, whether prebuilt or built live, and can be resumed.
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+def photos_fingerprint(photos: list[str], photo_objects: dict | None) -> str | None:
+    """
+    Fingerprint a photo set from its keys and ETags, in archive order.
+
+    Returns None when the ETag of any photo is unknown.
+    """
+    if not photos or not photo_objects or any(key not in photo_objects for key in photos):
+        return None
+    digest = hashlib.sha256()
+    for key in photos:
+        digest.update(f"{key}:{photo_objects[key]['etag']}\n".encode())
+    return digest.hexdigest()
+
+
+def archive_key(username: str, fingerprint: str) -> str:
+    """S3 key of the archive prebuilt for a photo set of the player."""
+    return f"{ARCHIVES_PREFIX}{username}/{fingerprint}.v{ARCHIVE_VERSION}.zip"
+
+
+def zip_info(filename: str) -> zipfile.ZipInfo:
+    """
+    Entry of a reproducible archive: stored, with fixed timestamp and permissions.
+    """
+    info = zipfile.ZipInfo(filename, date_time=ZIP_DATE_TIME)
+    info.compress_type = zipfile.ZIP_STORED
+    info.create_system = 3
+    info.external_attr = 0o644 << 16
+    return info
@@ -0,0 +1 @@
+"""Photoarchive tests package."""
@@ -0,0 +1,48 @@
+"""
+Unit tests for the photo archive layout.
+"""
+
+import io
+import zipfile
+
+from photoarchive import archive_key, photos_fingerprint, zip_info
+
+PHOTOS = ["Ana/001.png", "Teams/Infantil A.png"]
+PHOTO_OBJECTS = {key: {"size": 6, "etag": f"etag-{key}"} for key in PHOTOS}
+
+
+class TestPhotosFingerprint:
+    def test_depends_on_keys_etags_and_order(self):
+        fingerprint = photos_fingerprint(PHOTOS, PHOTO_OBJECTS)
+
+        assert fingerprint == photos_fingerprint(list(PHOTOS), dict(PHOTO_OBJECTS))
+        assert fingerprint != photos_fingerprint(list(reversed(PHOTOS)), PHOTO_OBJECTS)
+        changed = {**PHOTO_OBJECTS, "Ana/001.png": {"size": 6, "etag": "etag-v2"}}
+        assert fingerprint != photos_fingerprint(PHOTOS, changed)
+
+    def test_unknown_etags(self):
+        assert photos_fingerprint(["a.png"], None) is None
+        assert photos_fingerprint(["a.png", "b.png"], {"a.png": {"etag": "x"}}) is None
+        assert photos_fingerprint([], {}) is None
+
+
+class TestArchiveKey:
+    def test_is_versioned_per_player(self):
+        assert archive_key("Ana", "abc") == "archives/Ana/abc.v2.zip"
+
+
+class TestZipInfo:
+    def test_archives_are_reproducible(self):
+        def archive() -> bytes:
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w") as zip_file:
+                zip_file.writestr(zip_info("001.png"), b"one")
+            return buffer.getvalue()
+
+        content = archive()
+
+        assert content == archive()
+        info = zipfile.ZipFile(io.BytesIO(content)).getinfo("001.png")
+        assert info.compress_type == zipfile.ZIP_STORED
+        assert info.date_time == (1980, 1, 1, 0, 0, 0)
+        assert info.external_attr >> 16 == 0o644
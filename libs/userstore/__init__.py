@@ -0,0 +1,3 @@
+"""Users table access on the low-level DynamoDB client, shared by the Lambda services."""
+
+from .store import BATCH_GET_MAX_KEYS, DniIndex, UserRecord, UserStore, decode_user, decode_value
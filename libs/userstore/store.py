@@ -0,0 +1,228 @@
+"""
+Users table access on the low-level DynamoDB client.
+
+Every request reads a user item, so the per-call cost of the resource layer
+shows: its parameter transformation, the TypeSerializer and TypeDeserializer
+walks over the whole item and Decimal numbers. UserStore calls GetItem and
+BatchGetItem on the low-level client instead, projecting only the attributes
+its caller reads, and decodes the wire format by hand into a UserRecord.
+"""
+
+import functools
+from typing import Any
+
+PARTITION_KEY = "username"
+
+# BatchGetItem reads at most 100 items per call
+BATCH_GET_MAX_KEYS = 100
+
+
+class UserRecord:
+    """
+    A user item, holding only the attributes read.
+
+    It answers get(), [] and in as the item dicts of the resource layer did,
+    with the attributes that were not projected or not stored being missing.
+    """
+
+    __slots__ = ("username", "dnis", "photos", "photo_objects", "derivatives")
+
+    def __init__(
+        self,
+        username: str,
+        dnis: list[str] | None = None,
+        photos: list[str] | None = None,
+        photo_objects: dict[str, dict] | None = None,
+        derivatives: dict[str, dict] | None = None,
+    ):
+        self.username = username
+        self.dnis = dnis
+        self.photos = photos
+        self.photo_objects = photo_objects
+        self.derivatives = derivatives
+
+    def get(self, name: str, default: Any = None) -> Any:
+        value = getattr(self, name, None) if name in self.__slots__ else None
+        return default if value is None else value
+
+    def __getitem__(self, name: str) -> Any:
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, UserRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        attributes = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__ if name in self)
+        return f"UserRecord({attributes})"
+
+
+def decode_value(value: dict[str, Any]) -> Any:
+    """
+    Decode an attribute value of the low-level wire format, e.g. {"L": [{"S": "a"}]} into ["a"].
+
+    Numbers are decoded as int, or float when they have a fraction, rather
+    than Decimal. Binary values are not used by the users table.
+    """
+    ((tag, raw),) = value.items()
+    if tag == "S":
+        return raw
+    if tag == "L":
+        return [decode_value(element) for element in raw]
+    if tag == "M":
+        return {name: decode_value(element) for name, element in raw.items()}
+    if tag == "N":
+        return float(raw) if "." in raw or "e" in raw or "E" in raw else int(raw)
+    if tag == "BOOL":
+        return raw
+    if tag == "NULL":
+        return None
+    if tag == "SS":
+        return set(raw)
+    if tag == "NS":
+        return {decode_value({"N": number}) for number in raw}
+    raise ValueError(f"Unsupported DynamoDB attribute type: {tag}")
+
+
+def _decode_strings(value: dict[str, Any]) -> Any:
+    """
+    Decode a list of strings, such as photos, without a decode_value call per element.
+    """
+    elements = value.get("L")
+    if elements is None:
+        return decode_value(value)
+    return [element["S"] if "S" in element else decode_value(element) for element in elements]
+
+
+def _decode_entries(value: dict[str, Any]) -> Any:
+    """
+    Decode a map of photo keys to maps, such as photo_objects, inlining their string and integer fields.
+
+    These maps hold an entry per photo, so decoding them dominates the read of
+    a user with many photos. Fields of any other type go through decode_value.
+    """
+    entries = value.get("M")
+    if entries is None:
+        return decode_value(value)
+    decoded = {}
+    for key, entry in entries.items():
+        fields = entry.get("M")
+        if fields is None:
+            decoded[key] = decode_value(entry)
+            continue
+        decoded[key] = record = {}
+        for name, field in fields.items():
+            raw = field.get("S")
+            if raw is None:
+                raw = field.get("N")
+                record[name] = int(raw) if raw is not None and raw.isdigit() else decode_value(field)
+            else:
+                record[name] = raw
+    return decoded
+
+
+# Decoders specialised for the shape of each attribute of a UserRecord
+_DECODERS = {
+    "dnis": _decode_strings,
+    "photos": _decode_strings,
+    "photo_objects": _decode_entries,
+    "derivatives": _decode_entries,
+}
+
+
+def decode_user(item: dict[str, Any], username: str | None = None) -> UserRecord:
+    """
+    Decode a user item of the wire format, ignoring attributes a UserRecord does not hold.
+    """
+    record = UserRecord(item[PARTITION_KEY]["S"] if PARTITION_KEY in item else username)
+    for name in UserRecord.__slots__[1:]:
+        value = item.get(name)
+        if value is not None:
+            setattr(record, name, _DECODERS[name](value))
+    return record
+
+
+@functools.lru_cache(maxsize=32)
+def _projection(attributes: tuple[str, ...]) -> tuple[str, dict[str, str]]:
+    """
+    ProjectionExpression of the attributes and the partition key, with placeholders for reserved words.
+    """
+    names = dict.fromkeys((PARTITION_KEY, *attributes))
+    placeholders = {f"#a{index}": name for index, name in enumerate(names)}
+    return ", ".join(placeholders), placeholders
+
+
+class UserStore:
+    """
+    Reads user records from the users table on a low-level DynamoDB client.
+
+    Callers pass the attributes they read, so only those are transferred,
+    decoded and, for items over 4 KB, paid for in read capacity. Every call
+    is a single request, leaving metrics, tracing and retries to the caller.
+    """
+
+    def __init__(self, client, table_name: str):
+        self.client = client
+        self.name = table_name
+
+    def get(self, username: str, attributes: tuple[str, ...] = ()) -> UserRecord | None:
+        """The user, or None when there is no such user. Every attribute is read when none is given."""
+        request: dict[str, Any] = {"TableName": self.name, "Key": {PARTITION_KEY: {"S": username}}}
+        if attributes:
+            expression, names = _projection(attributes)
+            request["ProjectionExpression"] = expression
+            request["ExpressionAttributeNames"] = names
+        item = self.client.get_item(**request).get("Item")
+        return decode_user(item, username) if item else None
+
+    def batch_get(self, usernames: list[str], attributes: tuple[str, ...] = ()) -> tuple[list[UserRecord], list[str]]:
+        """
+        The users found among up to BATCH_GET_MAX_KEYS usernames, in no particular order,
+        and the usernames left unprocessed, to be requested again.
+        """
+        if len(usernames) > BATCH_GET_MAX_KEYS:
+            raise ValueError(f"BatchGetItem reads at most {BATCH_GET_MAX_KEYS} keys, got {len(usernames)}")
+        request: dict[str, Any] = {"Keys": [{PARTITION_KEY: {"S": username}} for username in usernames]}
+        if attributes:
+            expression, names = _projection(attributes)
+            request["ProjectionExpression"] = expression
+            request["ExpressionAttributeNames"] = names
+        response = self.client.batch_get_item(RequestItems={self.name: request})
+        records = [decode_user(item) for item in response.get("Responses", {}).get(self.name, [])]
+        unprocessed = response.get("UnprocessedKeys", {}).get(self.name, {}).get("Keys", [])
+        return records, [key[PARTITION_KEY]["S"] for key in unprocessed]
+
+
+class DniIndex:
+    """
+    Reads the DNI inverted index written by the player data uploader, keyed by dni and username.
+    """
+
+    def __init__(self, client, table_name: str):
+        self.client = client
+        self.name = table_name
+
+    def usernames(self, dni: str, start_key: dict | None = None) -> tuple[list[str], dict | None]:
+        """
+        One page of the usernames listing the DNI, and the key to read the next page from,
+        None after the last one.
+        """
+        request: dict[str, Any] = {
+            "TableName": self.name,
+            "KeyConditionExpression": "#dni = :dni",
+            "ProjectionExpression": "#username",
+            "ExpressionAttributeNames": {"#dni": "dni", "#username": PARTITION_KEY},
+            "ExpressionAttributeValues": {":dni": {"S": dni}},
+        }
+        if start_key:
+            request["ExclusiveStartKey"] = start_key
+        response = self.client.query(**request)
+        usernames = [item[PARTITION_KEY]["S"] for item in response.get("Items", [])]
+        return usernames, response.get("LastEvaluatedKey")
@@ -0,0 +1 @@
+"""Userstore tests package."""
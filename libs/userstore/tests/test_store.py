@@ -0,0 +1,158 @@
+"""
+Unit tests for the users table access.
+"""
+
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+
+from userstore import DniIndex, UserRecord, UserStore, decode_user, decode_value
+
+ITEM = {
+    "username": "Ana",
+    "dnis": ["12345678A", "87654321B"],
+    "photos": ["Ana/001.png", "Teams/Infantil A.png"],
+    "photo_objects": {"Ana/001.png": {"size": 1024, "etag": "e1"}},
+    "derivatives": {"Ana/001.png": {"thumbnail": {"key": "thumbnails/Ana/001.webp", "width": 320}}},
+    "updated_by": "uploader",
+}
+
+
+def wire(item: dict) -> dict:
+    return {name: TypeSerializer().serialize(value) for name, value in item.items()}
+
+
+class TestDecode:
+    @pytest.mark.parametrize(
+        "value, expected",
+        [
+            ({"S": "a"}, "a"),
+            ({"N": "42"}, 42),
+            ({"N": "-7"}, -7),
+            ({"N": "1.5"}, 1.5),
+            ({"N": "1E+3"}, 1000.0),
+            ({"BOOL": False}, False),
+            ({"NULL": True}, None),
+            ({"L": [{"S": "a"}, {"N": "1"}]}, ["a", 1]),
+            ({"M": {"a": {"L": []}}}, {"a": []}),
+            ({"SS": ["a", "b"]}, {"a", "b"}),
+            ({"NS": ["1", "2.5"]}, {1, 2.5}),
+        ],
+    )
+    def test_values(self, value, expected):
+        assert decode_value(value) == expected
+
+    def test_rejects_unsupported_types(self):
+        with pytest.raises(ValueError, match="B"):
+            decode_value({"B": b"bytes"})
+
+    def test_user_keeps_the_attributes_of_a_record(self):
+        record = decode_user(wire(ITEM))
+
+        assert record == UserRecord(
+            "Ana",
+            dnis=ITEM["dnis"],
+            photos=ITEM["photos"],
+            photo_objects=ITEM["photo_objects"],
+            derivatives=ITEM["derivatives"],
+        )
+        assert not hasattr(record, "updated_by")
+
+    def test_user_attributes_of_any_shape(self):
+        item = {
+            "username": "Ana",
+            "dnis": ["12345678A", 7],
+            "photos": [],
+            "photo_objects": {
+                "a.png": {"size": -1, "ratio": Decimal("1.5"), "etag": "e", "tags": ["x"]},
+                "b.png": None,
+            },
+            "derivatives": {"a.png": {"source_etag": "e", "thumbnail": {"key": "t.webp", "width": 320}}},
+        }
+
+        record = decode_user(wire(item))
+
+        assert record == UserRecord("Ana", **{name: value for name, value in item.items() if name != "username"})
+        assert decode_user({"username": {"S": "Ana"}, "photos": {"NULL": True}}).photos is None
+
+
+class TestUserRecord:
+    def test_reads_like_an_item(self):
+        record = UserRecord("Ana", photos=["Ana/001.png"])
+
+        assert record["photos"] == ["Ana/001.png"]
+        assert record.get("dnis", []) == [] and record.get("updated_by") is None
+        assert "photos" in record and "dnis" not in record and "updated_by" not in record
+        with pytest.raises(KeyError):
+            record["photo_objects"]
+
+    def test_has_no_instance_dict(self):
+        with pytest.raises(AttributeError):
+            UserRecord("Ana").extra = 1
+
+
+class TestUserStore:
+    def test_projects_the_attributes_read(self):
+        client = MagicMock()
+        client.get_item.return_value = {"Item": wire({"username": "Ana", "dnis": ITEM["dnis"]})}
+
+        record = UserStore(client, "users").get("Ana", ("dnis",))
+
+        assert record == UserRecord("Ana", dnis=ITEM["dnis"])
+        client.get_item.assert_called_once_with(
+            TableName="users",
+            Key={"username": {"S": "Ana"}},
+            ProjectionExpression="#a0, #a1",
+            ExpressionAttributeNames={"#a0": "username", "#a1": "dnis"},
+        )
+
+    def test_reads_whole_items_without_attributes(self):
+        client = MagicMock()
+        client.get_item.return_value = {"Item": wire(ITEM)}
+
+        assert UserStore(client, "users").get("Ana").photo_objects == ITEM["photo_objects"]
+        assert client.get_item.call_args.kwargs == {"TableName": "users", "Key": {"username": {"S": "Ana"}}}
+
+    def test_missing_users(self):
+        client = MagicMock()
+        client.get_item.return_value = {}
+
+        assert UserStore(client, "users").get("Nobody", ("dnis",)) is None
+
+    def test_batch_get_returns_unprocessed_usernames(self):
+        client = MagicMock()
+        client.batch_get_item.return_value = {
+            "Responses": {"users": [wire({"username": "Ana", "photos": ["Ana/001.png"]})]},
+            "UnprocessedKeys": {"users": {"Keys": [{"username": {"S": "Luis"}}]}},
+        }
+
+        records, unprocessed = UserStore(client, "users").batch_get(["Ana", "Luis"], ("photos",))
+
+        assert records == [UserRecord("Ana", photos=["Ana/001.png"])]
+        assert unprocessed == ["Luis"]
+        request = client.batch_get_item.call_args.kwargs["RequestItems"]["users"]
+        assert request["Keys"] == [{"username": {"S": "Ana"}}, {"username": {"S": "Luis"}}]
+        assert request["ProjectionExpression"] == "#a0, #a1"
+
+    def test_batch_get_reads_at_most_100_keys(self):
+        with pytest.raises(ValueError):
+            UserStore(MagicMock(), "users").batch_get([str(index) for index in range(101)])
+
+
+class TestDniIndex:
+    def test_pages_through_the_usernames(self):
+        client = MagicMock()
+        client.query.side_effect = [
+            {"Items": [{"username": {"S": "Ana"}}], "LastEvaluatedKey": {"dni": {"S": "1A"}}},
+            {"Items": [{"username": {"S": "Luis"}}]},
+        ]
+        index = DniIndex(client, "dni_index")
+
+        first, start_key = index.usernames("1A")
+        second, last_key = index.usernames("1A", start_key)
+
+        assert (first, second, last_key) == (["Ana"], ["Luis"], None)
+        assert client.query.call_args.kwargs["ExclusiveStartKey"] == {"dni": {"S": "1A"}}
+        assert client.query.call_args.kwargs["ExpressionAttributeValues"] == {":dni": {"S": "1A"}}
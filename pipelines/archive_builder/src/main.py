@@ -0,0 +1,167 @@
+import io
+import json
+import logging
+import os
+import zipfile
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+from photoarchive import ARCHIVES_PREFIX, archive_key, photos_fingerprint, zip_info
+
+from .logger import get_logger
+
+log_levels = {
+    "FATAL": logging.FATAL,
+    "ERROR": logging.ERROR,
+    "WARNING": logging.WARNING,
+    "INFO": logging.INFO,
+    "DEBUG": logging.DEBUG,
+}
+
+logger = get_logger(__name__, level=log_levels[os.environ.get("ARCHIVE_BUILDER_LOG_LEVEL", "INFO").upper()])
+
+MANIFEST_KEY = f"{ARCHIVES_PREFIX}manifest.json"
+
+# Number of players whose archives are built at the same time
+DEFAULT_THREADS = 8
+
+
+def build_archive(files: list[tuple[str, bytes]]) -> bytes:
+    """Zip the photos exactly like the content service does, byte for byte."""
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_STORED) as zip_file:
+        for filename, content in files:
+            zip_file.writestr(zip_info(filename), content)
+    return zip_buffer.getvalue()
+
+
+def scan_users(table_name: str, dynamodb_client=None) -> Iterator[dict]:
+    """Yield every item of the users table."""
+    if dynamodb_client is None:
+        dynamodb_client = boto3.client("dynamodb")
+
+    deserializer = TypeDeserializer()
+    for page in dynamodb_client.get_paginator("scan").paginate(TableName=table_name):
+        for raw_item in page.get("Items", []):
+            yield {k: deserializer.deserialize(v) for k, v in raw_item.items()}
+
+
+def load_manifest(s3_client, bucket: str) -> dict[str, dict]:
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=MANIFEST_KEY)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return {}
+        raise
+    return json.loads(response["Body"].read())
+
+
+def save_manifest(s3_client, bucket: str, manifest: dict[str, dict]) -> None:
+    s3_client.put_object(
+        Bucket=bucket,
+        Key=MANIFEST_KEY,
+        Body=json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"),
+        ContentType="application/json",
+    )
+
+
+def fetch_photos(s3_client, bucket: str, keys: list[str]) -> list[tuple[str, bytes]]:
+    """Download the photos, named in the archive by the last part of their key."""
+    return [(key.split("/")[-1], s3_client.get_object(Bucket=bucket, Key=key)["Body"].read()) for key in keys]
+
+
+def build_player_archive(user: dict, bucket: str, s3_client, previous: dict | None) -> dict | None:
+    """Build and upload one player's archive, returning its manifest entry.
+
+    Returns the previous entry untouched when the photo set has not changed,
+    and None when the archive cannot be built.
+    """
+    username = user["username"]
+    photos = user.get("photos") or []
+    photo_objects = user.get("photo_objects")
+
+    fingerprint = photos_fingerprint(photos, photo_objects)
+    if fingerprint is None:
+        logger.warning(f"Skipping {username}: photo ETags unknown, upload players data with a photo bucket first")
+        return None
+
+    key = archive_key(username, fingerprint)
+    if previous and previous.get("key") == key:
+        logger.debug(f"Archive of {username} is up to date")
+        return previous
+
+    try:
+        files = fetch_photos(s3_client, bucket, photos)
+    except ClientError as e:
+        logger.warning(f"Skipping {username}: could not fetch photos: {e}")
+        return None
+
+    content = build_archive(files)
+    s3_client.put_object(Bucket=bucket, Key=key, Body=content, ContentType="application/zip")
+
+    if previous and previous.get("key") != key:
+        s3_client.delete_object(Bucket=bucket, Key=previous["key"])
+
+    logger.info(f"Built archive {key} ({len(content)} bytes, {len(files)} photos)")
+    return {
+        "key": key,
+        "fingerprint": fingerprint,
+        "size": len(content),
+        "photos": {photo: photo_objects[photo]["etag"] for photo in photos},
+    }
+
+
+def build_archives(
+    users: Iterable[dict],
+    bucket: str,
+    s3_client=None,
+    threads: int = DEFAULT_THREADS,
+) -> dict[str, dict]:
+    """Build the archives of every user and save the updated manifest.
+
+    Archives store the photos uncompressed, so building one is mostly waiting
+    on S3: each player's archive is fetched, zipped and uploaded on a thread pool.
+    """
+    if s3_client is None:
+        s3_client = boto3.client("s3")
+
+    previous_manifest = load_manifest(s3_client, bucket)
+    manifest = {}
+
+    with ThreadPoolExecutor(max_workers=threads) as builders:
+        futures = {
+            user["username"]: builders.submit(
+                build_player_archive, user, bucket, s3_client, previous_manifest.get(user["username"])
+            )
+            for user in users
+        }
+        for username, future in futures.items():
+            entry = future.result()
+            if entry is not None:
+                manifest[username] = entry
+
+    save_manifest(s3_client, bucket, manifest)
+    return manifest
+
+
+def main():
+    logger.info("Starting player archives builder pipeline")
+
+    table_name = os.environ.get("CBTC_PLAYERS_TABLE_NAME", "players")
+    bucket = os.environ.get("CBTC_CONTENT_BUCKET_NAME")
+    if not bucket:
+        raise ValueError("Missing environment variable: CBTC_CONTENT_BUCKET_NAME")
+
+    logger.info(f"Reading users from DynamoDB table '{table_name}'")
+    users = scan_users(table_name)
+
+    logger.info(f"Building archives into s3://{bucket}/{ARCHIVES_PREFIX}")
+    manifest = build_archives(users, bucket)
+    logger.info(f"Manifest {MANIFEST_KEY} lists {len(manifest)} archives")
+
+
+if __name__ == "__main__":
+    main()
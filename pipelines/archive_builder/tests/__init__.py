@@ -0,0 +1 @@
+# Player archives builder tests
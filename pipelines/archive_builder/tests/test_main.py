@@ -0,0 +1,160 @@
+import io
+import json
+import zipfile
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+from photoarchive import archive_key, photos_fingerprint, zip_info
+from src.main import (
+    MANIFEST_KEY,
+    build_archive,
+    build_archives,
+    scan_users,
+)
+
+
+class StubS3Client:
+    """In-memory bucket with the S3 calls used by the pipeline."""
+
+    def __init__(self, objects: dict[str, bytes]):
+        self.objects = dict(objects)
+        self.get_calls = []
+
+    def get_object(self, Bucket, Key):
+        self.get_calls.append(Key)
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "Not found"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[Key] = Body
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+
+PHOTOS = {
+    "juan/001.png": b"juan-1",
+    "juan/002.png": b"juan-2",
+    "Teams/Infantil A.png": b"team-a",
+}
+
+
+def user(username: str = "juan", etag_suffix: str = "") -> dict:
+    photos = [key for key in PHOTOS if key.startswith(f"{username}/")] + ["Teams/Infantil A.png"]
+    return {
+        "username": username,
+        "dnis": ["12345678Z"],
+        "photos": photos,
+        "photo_objects": {key: {"size": 6, "etag": f"etag-{key}{etag_suffix}"} for key in photos},
+    }
+
+
+class TestBuildArchive:
+    def test_zips_files_by_name(self):
+        content = build_archive([("001.png", b"one"), ("Infantil A.png", b"team")])
+
+        with zipfile.ZipFile(io.BytesIO(content)) as zip_file:
+            assert zip_file.namelist() == ["001.png", "Infantil A.png"]
+            assert zip_file.read("001.png") == b"one"
+
+    def test_is_reproducible(self):
+        files = [("001.png", b"one"), ("002.png", b"two")]
+
+        content = build_archive(files)
+
+        assert content == build_archive(files)
+        with zipfile.ZipFile(io.BytesIO(content)) as zip_file:
+            info = zip_file.getinfo("001.png")
+            assert info.compress_type == zipfile.ZIP_STORED
+            assert info.date_time == (1980, 1, 1, 0, 0, 0)
+
+    def test_matches_the_archives_the_content_service_builds(self):
+        files = [("001.png", b"one"), ("Infantil A.png", b"team")]
+        live = io.BytesIO()
+        with zipfile.ZipFile(live, "w", zipfile.ZIP_STORED) as zip_file:
+            for filename, content in files:
+                zip_file.writestr(zip_info(filename), content)
+
+        assert build_archive(files) == live.getvalue()
+
+
+class TestBuildArchives:
+    def test_builds_archive_and_manifest(self):
+        s3 = StubS3Client(PHOTOS)
+        item = user()
+
+        manifest = build_archives([item], "bucket", s3_client=s3)
+
+        fingerprint = photos_fingerprint(item["photos"], item["photo_objects"])
+        key = archive_key("juan", fingerprint)
+        assert manifest["juan"]["key"] == key
+        assert manifest["juan"]["photos"]["juan/001.png"] == "etag-juan/001.png"
+
+        with zipfile.ZipFile(io.BytesIO(s3.objects[key])) as zip_file:
+            assert sorted(zip_file.namelist()) == ["001.png", "002.png", "Infantil A.png"]
+            assert zip_file.read("002.png") == b"juan-2"
+
+        assert json.loads(s3.objects[MANIFEST_KEY]) == manifest
+
+    def test_skips_unchanged_players(self):
+        s3 = StubS3Client(PHOTOS)
+        build_archives([user()], "bucket", s3_client=s3)
+        s3.get_calls.clear()
+
+        build_archives([user()], "bucket", s3_client=s3)
+
+        assert s3.get_calls == [MANIFEST_KEY]
+
+    def test_rebuilds_and_replaces_changed_archives(self):
+        s3 = StubS3Client(PHOTOS)
+        first = build_archives([user()], "bucket", s3_client=s3)
+        second = build_archives([user(etag_suffix="-v2")], "bucket", s3_client=s3)
+
+        assert first["juan"]["key"] != second["juan"]["key"]
+        assert first["juan"]["key"] not in s3.objects
+        assert second["juan"]["key"] in s3.objects
+
+    def test_rebuilds_archives_of_previous_versions(self):
+        s3 = StubS3Client(PHOTOS)
+        item = user()
+        fingerprint = photos_fingerprint(item["photos"], item["photo_objects"])
+        old_key = f"archives/juan/{fingerprint}.zip"
+        s3.objects[old_key] = b"deflated"
+        s3.objects[MANIFEST_KEY] = json.dumps({"juan": {"key": old_key, "fingerprint": fingerprint}}).encode()
+
+        manifest = build_archives([item], "bucket", s3_client=s3)
+
+        assert manifest["juan"]["key"] == archive_key("juan", fingerprint)
+        assert old_key not in s3.objects
+
+    def test_skips_players_without_etags_or_missing_photos(self):
+        s3 = StubS3Client({"Teams/Infantil A.png": b"team-a"})
+        legacy = {"username": "legacy", "photos": ["legacy/001.png"]}
+
+        manifest = build_archives([legacy, user()], "bucket", s3_client=s3)
+
+        assert manifest == {}
+        assert list(s3.objects) == ["Teams/Infantil A.png", MANIFEST_KEY]
+
+    def test_raises_unexpected_manifest_errors(self):
+        s3 = MagicMock()
+        s3.get_object.side_effect = ClientError({"Error": {"Code": "AccessDenied", "Message": "No"}}, "GetObject")
+
+        with pytest.raises(ClientError):
+            build_archives([], "bucket", s3_client=s3)
+
+
+class TestScanUsers:
+    def test_deserializes_all_pages(self):
+        client = MagicMock()
+        client.get_paginator.return_value.paginate.return_value = [
+            {"Items": [{"username": {"S": "juan"}, "photos": {"L": [{"S": "juan/001.png"}]}}]},
+            {"Items": [{"username": {"S": "ana"}}]},
+        ]
+
+        users = list(scan_users("users", dynamodb_client=client))
+
+        assert users == [{"username": "juan", "photos": ["juan/001.png"]}, {"username": "ana"}]
+        client.get_paginator.return_value.paginate.assert_called_once_with(TableName="users")
@@ -0,0 +1 @@
+# Image derivatives pipeline
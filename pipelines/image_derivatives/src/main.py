@@ -0,0 +1,269 @@
+import io
+import logging
+import os
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+from PIL import Image, ImageOps
+
+from .logger import get_logger
+
+log_levels = {
+    "FATAL": logging.FATAL,
+    "ERROR": logging.ERROR,
+    "WARNING": logging.WARNING,
+    "INFO": logging.INFO,
+    "DEBUG": logging.DEBUG,
+}
+
+logger = get_logger(__name__, level=log_levels[os.environ.get("IMAGE_DERIVATIVES_LOG_LEVEL", "INFO").upper()])
+
+# Derivatives are stored under sibling prefixes, mirroring the key of their source photo. The content service
+# serves the thumbnails in its previews; downloads still serve the original photos, as the prebuilt archives do.
+DERIVATIVES = {
+    "download": {"prefix": "downloads/", "format": "JPEG", "max_size": 2560, "quality": 85},
+    "thumbnail": {"prefix": "thumbnails/", "format": "WEBP", "max_size": 320, "quality": 75},
+}
+
+CONTENT_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp"}
+EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp"}
+
+# S3 user metadata holding the ETag of the photo a derivative was generated from
+SOURCE_ETAG_METADATA = "source-etag"
+
+# S3 user metadata holding the dimensions of a derivative, so records of existing objects carry them too
+WIDTH_METADATA = "width"
+HEIGHT_METADATA = "height"
+
+# Number of photos fetched from and uploaded to S3 at the same time
+DEFAULT_FETCH_THREADS = 8
+
+
+def derivative_key(source_key: str, name: str) -> str:
+    spec = DERIVATIVES[name]
+    stem, _, _ = source_key.rpartition(".")
+    return f"{spec['prefix']}{stem or source_key}.{EXTENSIONS[spec['format']]}"
+
+
+def render_derivatives(content: bytes) -> dict[str, tuple[bytes, tuple[int, int]]]:
+    """Encode every derivative of a photo with its dimensions. Runs in a worker process."""
+    with Image.open(io.BytesIO(content)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+    rendered = {}
+    for name, spec in DERIVATIVES.items():
+        derivative = image.copy()
+        derivative.thumbnail((spec["max_size"], spec["max_size"]), Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        if spec["format"] == "JPEG":
+            derivative.save(buffer, "JPEG", quality=spec["quality"], optimize=True, progressive=True)
+        else:
+            derivative.save(buffer, spec["format"], quality=spec["quality"], method=6)
+        rendered[name] = (buffer.getvalue(), derivative.size)
+
+    return rendered
+
+
+def scan_users(table_name: str, dynamodb_client=None) -> Iterator[dict]:
+    """Yield every item of the users table."""
+    if dynamodb_client is None:
+        dynamodb_client = boto3.client("dynamodb")
+
+    deserializer = TypeDeserializer()
+    for page in dynamodb_client.get_paginator("scan").paginate(TableName=table_name):
+        for raw_item in page.get("Items", []):
+            yield {k: deserializer.deserialize(v) for k, v in raw_item.items()}
+
+
+def existing_derivatives(s3_client, bucket: str, source_key: str, source_etag: str) -> dict | None:
+    """Record of derivatives already generated from this version of the photo, if all of them exist.
+
+    Objects generated before their dimensions were stored in their metadata count as missing.
+    """
+    record = {"source_etag": source_etag}
+    for name in DERIVATIVES:
+        key = derivative_key(source_key, name)
+        try:
+            response = s3_client.head_object(Bucket=bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404", "NotFound"):
+                return None
+            raise
+        metadata = response.get("Metadata", {})
+        if metadata.get(SOURCE_ETAG_METADATA) != source_etag:
+            return None
+        try:
+            width, height = int(metadata[WIDTH_METADATA]), int(metadata[HEIGHT_METADATA])
+        except (KeyError, ValueError):
+            return None
+        record[name] = {"key": key, "size": response["ContentLength"], "width": width, "height": height}
+    return record
+
+
+def generate_derivatives(s3_client, bucket: str, source_key: str, source_etag: str, executor: Executor) -> dict:
+    """Render and upload the derivatives of one photo, returning their record."""
+    content = s3_client.get_object(Bucket=bucket, Key=source_key)["Body"].read()
+    rendered = executor.submit(render_derivatives, content).result()
+
+    record = {"source_etag": source_etag}
+    for name, (body, (width, height)) in rendered.items():
+        key = derivative_key(source_key, name)
+        s3_client.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=body,
+            ContentType=CONTENT_TYPES[DERIVATIVES[name]["format"]],
+            Metadata={SOURCE_ETAG_METADATA: source_etag, WIDTH_METADATA: str(width), HEIGHT_METADATA: str(height)},
+        )
+        record[name] = {"key": key, "size": len(body), "width": width, "height": height}
+
+    logger.debug(f"Generated derivatives of {source_key} ({len(content)} bytes)")
+    return record
+
+
+def derivative_record(s3_client, bucket: str, source_key: str, source_etag: str, executor: Executor) -> dict | None:
+    """Reuse the derivatives of this photo version when present in S3, generate them otherwise.
+
+    Returns None when the photo cannot be fetched or decoded.
+    """
+    try:
+        record = existing_derivatives(s3_client, bucket, source_key, source_etag)
+        if record is not None:
+            return record
+        return generate_derivatives(s3_client, bucket, source_key, source_etag, executor)
+    except (ClientError, OSError) as e:
+        logger.warning(f"Skipping {source_key}: {e}")
+        return None
+
+
+def update_user_derivatives(dynamodb_client, table_name: str, username: str, derivatives: dict) -> bool:
+    """Record the derivatives on the user item, returning False when the user was deleted meanwhile.
+
+    The update is conditional on the item existing, so it never recreates a
+    removed user as an item holding only its derivatives.
+    """
+    serializer = TypeSerializer()
+    try:
+        dynamodb_client.update_item(
+            TableName=table_name,
+            Key={"username": {"S": username}},
+            UpdateExpression="SET derivatives = :derivatives",
+            ConditionExpression="attribute_exists(username)",
+            ExpressionAttributeValues={":derivatives": serializer.serialize(derivatives)},
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+            raise
+        logger.warning(f"Skipping {username}: user deleted while its derivatives were generated")
+        return False
+    return True
+
+
+def process_derivatives(
+    users: Iterable[dict],
+    table_name: str,
+    bucket: str,
+    s3_client=None,
+    dynamodb_client=None,
+    executor: Executor | None = None,
+    fetch_threads: int = DEFAULT_FETCH_THREADS,
+) -> dict[str, int]:
+    """Generate the missing derivatives of every user's photos and record them on the user items.
+
+    Derivatives are idempotent by source ETag: a photo is only rendered when
+    neither the user items nor the derivative objects record its current
+    ETag. Photos shared between players, like team photos, are rendered once.
+    Rendering runs on the executor, a process pool by default.
+    """
+    if s3_client is None:
+        s3_client = boto3.client("s3")
+    if dynamodb_client is None:
+        dynamodb_client = boto3.client("dynamodb")
+
+    users = list(users)
+    records: dict[str, dict] = {}
+    pending: dict[str, str] = {}
+
+    for user in users:
+        photo_objects = user.get("photo_objects")
+        if not photo_objects:
+            logger.warning(
+                f"Skipping {user['username']}: photo ETags unknown, upload players data with a photo bucket first"
+            )
+            continue
+        recorded = user.get("derivatives") or {}
+        for key in user.get("photos") or []:
+            etag = photo_objects.get(key, {}).get("etag")
+            if etag is None or key in records:
+                continue
+            if recorded.get(key, {}).get("source_etag") == etag:
+                records[key] = recorded[key]
+            else:
+                pending[key] = etag
+
+    # A photo recorded up to date on one item no longer needs to be checked in S3
+    pending = {key: etag for key, etag in pending.items() if key not in records}
+
+    owns_executor = executor is None
+    if owns_executor:
+        executor = ProcessPoolExecutor()
+
+    try:
+        with ThreadPoolExecutor(max_workers=fetch_threads) as fetchers:
+            futures = {
+                key: fetchers.submit(derivative_record, s3_client, bucket, key, etag, executor)
+                for key, etag in pending.items()
+            }
+            for key, future in futures.items():
+                record = future.result()
+                if record is not None:
+                    records[key] = record
+    finally:
+        if owns_executor:
+            executor.shutdown()
+
+    updated_users = 0
+    for user in users:
+        if not user.get("photo_objects"):
+            continue
+        derivatives = {key: records[key] for key in user.get("photos") or [] if key in records}
+        if derivatives != (user.get("derivatives") or {}):
+            if update_user_derivatives(dynamodb_client, table_name, user["username"], derivatives):
+                updated_users += 1
+
+    return {"photos": len(records), "checked": len(pending), "updated_users": updated_users}
+
+
+def main():
+    logger.info("Starting image derivatives pipeline")
+
+    table_name = os.environ.get("CBTC_PLAYERS_TABLE_NAME", "players")
+    bucket = os.environ.get("CBTC_CONTENT_BUCKET_NAME")
+    if not bucket:
+        raise ValueError("Missing environment variable: CBTC_CONTENT_BUCKET_NAME")
+
+    logger.info(f"Reading users from DynamoDB table '{table_name}'")
+    users = scan_users(table_name)
+
+    prefixes = ", ".join(spec["prefix"] for spec in DERIVATIVES.values())
+    logger.info(f"Generating derivatives into s3://{bucket}/ ({prefixes})")
+    stats = process_derivatives(users, table_name, bucket)
+    logger.info(
+        f"{stats['photos']} photos with derivatives, {stats['checked']} checked or generated, "
+        f"{stats['updated_users']} users updated"
+    )
+
+
+if __name__ == "__main__":
+    main()
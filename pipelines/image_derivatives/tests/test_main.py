@@ -0,0 +1,220 @@
+import io
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+from PIL import Image
+from src.main import (
+    SOURCE_ETAG_METADATA,
+    derivative_key,
+    process_derivatives,
+    render_derivatives,
+)
+
+
+def png(size: tuple[int, int], mode: str = "RGB") -> bytes:
+    buffer = io.BytesIO()
+    Image.new(mode, size, "red").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class StubS3Client:
+    """In-memory bucket with the S3 calls used by the pipeline."""
+
+    def __init__(self, objects: dict[str, bytes]):
+        self.objects = {key: {"Body": body, "Metadata": {}} for key, body in objects.items()}
+        self.get_calls = []
+        self.put_calls = []
+
+    def get_object(self, Bucket, Key):
+        self.get_calls.append(Key)
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": "Not found"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key]["Body"])}
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+        obj = self.objects[Key]
+        return {"ContentLength": len(obj["Body"]), "Metadata": obj["Metadata"]}
+
+    def put_object(self, Bucket, Key, Body, ContentType, Metadata):
+        self.put_calls.append(Key)
+        self.objects[Key] = {"Body": Body, "ContentType": ContentType, "Metadata": Metadata}
+
+
+PHOTOS = {
+    "juan/001.png": png((4000, 3000)),
+    "ana/001.png": png((3000, 4000), mode="RGBA"),
+    "Teams/Infantil A.png": png((1200, 800)),
+}
+
+
+def user(username: str, etag_suffix: str = "", derivatives: dict | None = None) -> dict:
+    photos = [f"{username}/001.png", "Teams/Infantil A.png"]
+    item = {
+        "username": username,
+        "photos": photos,
+        "photo_objects": {key: {"size": len(PHOTOS[key]), "etag": f"etag-{key}{etag_suffix}"} for key in photos},
+    }
+    if derivatives is not None:
+        item["derivatives"] = derivatives
+    return item
+
+
+def run(users, s3, dynamodb=None):
+    dynamodb = dynamodb or MagicMock()
+    with ThreadPoolExecutor() as executor:
+        stats = process_derivatives(users, "users", "bucket", s3_client=s3, dynamodb_client=dynamodb, executor=executor)
+    return stats, dynamodb
+
+
+def recorded_derivatives(dynamodb) -> dict[str, dict]:
+    return {
+        call.kwargs["Key"]["username"]["S"]: call.kwargs["ExpressionAttributeValues"][":derivatives"]["M"]
+        for call in dynamodb.update_item.call_args_list
+    }
+
+
+class TestDerivativeKey:
+    def test_sibling_prefixes(self):
+        assert derivative_key("juan/001.png", "download") == "downloads/juan/001.jpg"
+        assert derivative_key("Teams/Infantil A.png", "thumbnail") == "thumbnails/Teams/Infantil A.webp"
+
+
+class TestRenderDerivatives:
+    def test_downscales_and_encodes(self):
+        rendered = render_derivatives(png((4000, 3000), mode="RGBA"))
+
+        download, download_size = rendered["download"]
+        thumbnail, thumbnail_size = rendered["thumbnail"]
+        assert download_size == (2560, 1920)
+        assert thumbnail_size == (320, 240)
+        assert Image.open(io.BytesIO(download)).format == "JPEG"
+        assert Image.open(io.BytesIO(thumbnail)).format == "WEBP"
+
+    def test_keeps_small_photos_size(self):
+        rendered = render_derivatives(png((200, 100)))
+
+        assert rendered["download"][1] == (200, 100)
+        assert rendered["thumbnail"][1] == (200, 100)
+
+    def test_runs_in_process_pool(self):
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            rendered = executor.submit(render_derivatives, png((640, 480))).result()
+
+        assert rendered["thumbnail"][1] == (320, 240)
+
+
+class TestProcessDerivatives:
+    def test_generates_and_records_derivatives(self):
+        s3 = StubS3Client(PHOTOS)
+
+        stats, dynamodb = run([user("juan"), user("ana")], s3)
+
+        assert stats == {"photos": 3, "checked": 3, "updated_users": 2}
+        # The shared team photo is rendered once
+        assert s3.get_calls.count("Teams/Infantil A.png") == 1
+
+        thumbnail = s3.objects["thumbnails/juan/001.webp"]
+        assert thumbnail["ContentType"] == "image/webp"
+        assert thumbnail["Metadata"][SOURCE_ETAG_METADATA] == "etag-juan/001.png"
+
+        juan = recorded_derivatives(dynamodb)["juan"]
+        assert set(juan) == {"juan/001.png", "Teams/Infantil A.png"}
+        record = juan["juan/001.png"]["M"]
+        assert record["source_etag"] == {"S": "etag-juan/001.png"}
+        assert record["download"]["M"]["key"] == {"S": "downloads/juan/001.jpg"}
+        assert record["download"]["M"]["size"] == {"N": str(len(s3.objects["downloads/juan/001.jpg"]["Body"]))}
+
+    def test_skips_photos_recorded_with_current_etag(self):
+        s3 = StubS3Client(PHOTOS)
+        _, dynamodb = run([user("juan")], s3)
+        current = {
+            key: {
+                "source_etag": f"etag-{key}",
+                **{name: {"key": f"{name}s/{key}", "size": 1} for name in ("download", "thumbnail")},
+            }
+            for key in ("juan/001.png", "Teams/Infantil A.png")
+        }
+        s3.get_calls.clear()
+        s3.put_calls.clear()
+
+        stats, dynamodb = run([user("juan", derivatives=current)], s3)
+
+        assert stats["checked"] == 0
+        assert s3.get_calls == [] and s3.put_calls == []
+        dynamodb.update_item.assert_not_called()
+
+    def test_reuses_existing_objects_when_items_were_rewritten(self):
+        s3 = StubS3Client(PHOTOS)
+        _, first = run([user("juan")], s3)
+        s3.get_calls.clear()
+        s3.put_calls.clear()
+
+        _, dynamodb = run([user("juan")], s3)
+
+        assert s3.get_calls == [] and s3.put_calls == []
+        # Records of the existing objects are those of the generated ones, dimensions included
+        assert recorded_derivatives(dynamodb)["juan"] == recorded_derivatives(first)["juan"]
+
+    def test_regenerates_existing_objects_without_dimensions(self):
+        s3 = StubS3Client(PHOTOS)
+        run([user("juan")], s3)
+        for obj in s3.objects.values():
+            obj["Metadata"] = {key: value for key, value in obj["Metadata"].items() if key == SOURCE_ETAG_METADATA}
+        s3.put_calls.clear()
+
+        _, dynamodb = run([user("juan")], s3)
+
+        assert "thumbnails/juan/001.webp" in s3.put_calls
+        assert "width" in recorded_derivatives(dynamodb)["juan"]["juan/001.png"]["M"]["thumbnail"]["M"]
+
+    def test_regenerates_changed_photos(self):
+        s3 = StubS3Client(PHOTOS)
+        run([user("juan")], s3)
+        s3.put_calls.clear()
+
+        run([user("juan", etag_suffix="-v2")], s3)
+
+        assert "downloads/juan/001.jpg" in s3.put_calls
+        assert s3.objects["downloads/juan/001.jpg"]["Metadata"][SOURCE_ETAG_METADATA] == "etag-juan/001.png-v2"
+
+    def test_skips_users_deleted_meanwhile(self):
+        s3 = StubS3Client(PHOTOS)
+        dynamodb = MagicMock()
+
+        def update_item(**kwargs):
+            if kwargs["Key"]["username"]["S"] == "ana":
+                raise ClientError(
+                    {"Error": {"Code": "ConditionalCheckFailedException", "Message": "Failed"}}, "UpdateItem"
+                )
+
+        dynamodb.update_item.side_effect = update_item
+
+        stats, _ = run([user("juan"), user("ana")], s3, dynamodb)
+
+        assert stats["updated_users"] == 1
+        assert {call.kwargs["ConditionExpression"] for call in dynamodb.update_item.call_args_list} == {
+            "attribute_exists(username)"
+        }
+
+    def test_raises_other_update_errors(self):
+        dynamodb = MagicMock()
+        dynamodb.update_item.side_effect = ClientError(
+            {"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "Slow down"}}, "UpdateItem"
+        )
+
+        with pytest.raises(ClientError):
+            run([user("juan")], StubS3Client(PHOTOS), dynamodb)
+
+    def test_skips_users_without_etags_and_unreadable_photos(self):
+        s3 = StubS3Client({"Teams/Infantil A.png": b"not an image"})
+        legacy = {"username": "legacy", "photos": ["legacy/001.png"]}
+
+        stats, dynamodb = run([legacy, user("juan")], s3)
+
+        assert stats["photos"] == 0
+        assert s3.put_calls == []
+        dynamodb.update_item.assert_not_called()
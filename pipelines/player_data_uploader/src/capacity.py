@@ -0,0 +1,109 @@
+"""Offline capacity planning for uploads to DynamoDB.
+
+Item sizes follow the DynamoDB item size rules, so the report gives the exact
+write capacity an upload consumes without calling AWS.
+"""
+
+import math
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from .writer import MAX_BATCH_SIZE
+
+DYNAMODB_MAX_ITEM_SIZE = 400 * 1024
+
+# A standard write consumes one WCU per started KB of item size
+WCU_SIZE = 1024
+
+# Items above this share of the maximum item size are reported
+SIZE_WARNING_RATIO = 0.8
+
+
+def _number_size(value: int | Decimal) -> int:
+    # One byte per two significant digits plus one, leading and trailing zeroes trimmed
+    significant_digits = len(Decimal(value).normalize().as_tuple().digits)
+    return math.ceil(significant_digits / 2) + 1
+
+
+def attribute_value_size(value) -> int:
+    """Size in bytes of an attribute value as DynamoDB accounts it."""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, int | Decimal):
+        return _number_size(value)
+    if isinstance(value, bytes | bytearray):
+        return len(value)
+    if isinstance(value, set):
+        return sum(attribute_value_size(element) for element in value)
+    if isinstance(value, list | tuple):
+        return 3 + len(value) + sum(attribute_value_size(element) for element in value)
+    if isinstance(value, dict):
+        return 3 + len(value) + sum(item_size({k: v}) for k, v in value.items())
+    raise TypeError(f"Unsupported DynamoDB attribute value type: {type(value).__name__}")
+
+
+def item_size(item: dict) -> int:
+    """Size in bytes of an item: attribute names plus attribute values."""
+    return sum(len(name.encode("utf-8")) + attribute_value_size(value) for name, value in item.items())
+
+
+def write_capacity(size: int) -> int:
+    """WCUs consumed by a standard write of an item of the given size."""
+    return max(1, math.ceil(size / WCU_SIZE))
+
+
+@dataclass
+class CapacityPlan:
+    """Write cost of uploading a set of items."""
+
+    items: int = 0
+    total_bytes: int = 0
+    total_wcu: int = 0
+    largest_item: tuple[str, int] | None = None
+    large_items: list[tuple[str, int]] = field(default_factory=list)
+
+    @property
+    def batch_calls(self) -> int:
+        return math.ceil(self.items / MAX_BATCH_SIZE)
+
+    def estimated_seconds(self, write_rate: float) -> float:
+        """Upload duration when sustaining write_rate WCU per second."""
+        return self.total_wcu / write_rate
+
+    def report(self, write_rate: float) -> list[str]:
+        lines = [
+            f"Items: {self.items} ({self.total_bytes} bytes)",
+            f"Write capacity: {self.total_wcu} WCU",
+            f"BatchWriteItem calls: {self.batch_calls}",
+            f"Estimated duration at {write_rate:g} WCU/s: {self.estimated_seconds(write_rate):.1f}s",
+        ]
+        if self.largest_item:
+            lines.append(f"Largest item: {self.largest_item[0]} ({self.largest_item[1]} bytes)")
+        for key, size in self.large_items:
+            lines.append(f"Item {key} is {size} bytes, {size / DYNAMODB_MAX_ITEM_SIZE:.0%} of the DynamoDB item limit")
+        return lines
+
+
+def plan_capacity(
+    players_data: Iterable[dict], partition_key: str = "username", warning_ratio: float = SIZE_WARNING_RATIO
+) -> CapacityPlan:
+    """Compute the size and write capacity of every item without touching AWS."""
+    plan = CapacityPlan()
+
+    for player in players_data:
+        size = item_size(player)
+        key = player[partition_key]
+
+        plan.items += 1
+        plan.total_bytes += size
+        plan.total_wcu += write_capacity(size)
+
+        if plan.largest_item is None or size > plan.largest_item[1]:
+            plan.largest_item = (key, size)
+        if size >= DYNAMODB_MAX_ITEM_SIZE * warning_ratio:
+            plan.large_items.append((key, size))
+
+    return plan
@@ -0,0 +1,73 @@
+"""Local checkpoints of acknowledged upload batches.
+
+Batches are numbered in the order they are generated from the input, which is
+deterministic for a given CSV, so the checkpoint of an interrupted upload can
+be used to skip the batches DynamoDB already acknowledged. Checkpoints are
+keyed by a hash of the input file and the target table.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+
+def input_hash(input_path: str, table_name: str) -> str:
+    """Hash the input file contents together with the target table name."""
+    digest = hashlib.sha256(table_name.encode("utf-8"))
+    with open(input_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class UploadCheckpoint:
+    """Thread-safe record of acknowledged batch indexes, persisted to a JSON file.
+
+    The file stores the committed position (every batch below it has been
+    acknowledged) and the acknowledged batches above it, as parallel workers
+    may finish batches out of order.
+    """
+
+    def __init__(self, path: str, input_hash: str, committed: int = 0, acknowledged: set[int] | None = None):
+        self.path = path
+        self.input_hash = input_hash
+        self.committed = committed
+        self.acknowledged = acknowledged or set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, input_hash: str) -> "UploadCheckpoint":
+        """Load the checkpoint at path, or start a new one if it is missing or belongs to another input."""
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("input_hash") == input_hash:
+                return cls(path, input_hash, data["committed"], set(data["acknowledged"]))
+        return cls(path, input_hash)
+
+    def is_done(self, index: int) -> bool:
+        with self._lock:
+            return index < self.committed or index in self.acknowledged
+
+    def mark_done(self, index: int) -> None:
+        with self._lock:
+            self.acknowledged.add(index)
+            while self.committed in self.acknowledged:
+                self.acknowledged.remove(self.committed)
+                self.committed += 1
+            self._save()
+
+    def clear(self) -> None:
+        """Remove the checkpoint file once the upload has completed."""
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = {"input_hash": self.input_hash, "committed": self.committed, "acknowledged": sorted(self.acknowledged)}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
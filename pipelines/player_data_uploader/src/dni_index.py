@@ -0,0 +1,69 @@
+"""DNI inverted index of the users table.
+
+Every DNI in the `dnis` of a user gets an item {dni, username} in the index
+table, keyed by both, so the content service finds every child of a tutor
+with a single Query instead of one login per child. A GSI cannot do it, as
+DynamoDB does not index the elements of list attributes.
+
+Entries left behind when a DNI is removed from a user are harmless, the
+content service checks the user items it reads, but syncs delete them.
+"""
+
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+
+PARTITION_KEY = "dni"
+SORT_KEY = "username"
+
+
+def index_items(player: dict) -> list[dict]:
+    """Index items of a player, one per distinct DNI."""
+    return [{PARTITION_KEY: dni, SORT_KEY: player["username"]} for dni in dict.fromkeys(player.get("dnis") or [])]
+
+
+class DniIndexTracker:
+    """Collects the index items of the players flowing through an upload, without holding the players."""
+
+    def __init__(self):
+        self.items: list[dict] = []
+        self.usernames: set[str] = set()
+
+    def track(self, players_data: Iterable[dict]) -> Iterator[dict]:
+        for player in players_data:
+            self.items.extend(index_items(player))
+            self.usernames.add(player["username"])
+            yield player
+
+
+@dataclass
+class IndexPlan:
+    """Index entries to write and (dni, username) keys to delete."""
+
+    to_put: list[dict] = field(default_factory=list)
+    to_delete: list[tuple[str, str]] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return f"{len(self.to_put)} new, {len(self.to_delete)} removed"
+
+
+def compute_index_plan(
+    tracker: DniIndexTracker, current_entries: Iterable[tuple[str, str]], removed_usernames: Iterable[str] = ()
+) -> IndexPlan:
+    """Compare the index of the tracked players with the current index entries.
+
+    Entries of users in the input that no longer list the DNI are deleted, as
+    are the entries of removed users. Entries of users neither in the input
+    nor removed are kept, as their user items are.
+    """
+    desired = {(item[PARTITION_KEY], item[SORT_KEY]): item for item in tracker.items}
+    current = set(current_entries)
+    removed = set(removed_usernames)
+
+    return IndexPlan(
+        to_put=[item for key, item in desired.items() if key not in current],
+        to_delete=sorted(
+            (dni, username)
+            for dni, username in current - desired.keys()
+            if username in tracker.usernames or username in removed
+        ),
+    )
@@ -0,0 +1,107 @@
+"""Photo inventory of the content bucket.
+
+The bucket is listed with paginated ListObjectsV2 calls, one top-level prefix
+per thread, so player items only reference photos that actually exist and
+carry their size and ETag.
+"""
+
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+DEFAULT_LIST_WORKERS = 8
+
+
+class MissingPhotosError(Exception):
+    """Raised when a player has no photos in the content bucket."""
+
+
+def default_s3_client_factory():
+    return boto3.session.Session().client("s3")
+
+
+def list_objects(client, bucket: str, prefix: str = "", delimiter: str | None = None) -> tuple[dict[str, dict], list]:
+    """List every object under prefix, following continuation tokens.
+
+    Returns the objects keyed by S3 key with their size and ETag, and the
+    common prefixes when a delimiter is given.
+    """
+    objects = {}
+    common_prefixes = []
+    kwargs = {"Bucket": bucket, "Prefix": prefix}
+    if delimiter:
+        kwargs["Delimiter"] = delimiter
+
+    while True:
+        response = client.list_objects_v2(**kwargs)
+        for obj in response.get("Contents", []):
+            if obj["Key"].endswith("/"):
+                continue
+            objects[obj["Key"]] = {"size": obj["Size"], "etag": obj["ETag"].strip('"')}
+        common_prefixes.extend(p["Prefix"] for p in response.get("CommonPrefixes", []))
+
+        if not response.get("IsTruncated"):
+            return objects, common_prefixes
+        kwargs["ContinuationToken"] = response["NextContinuationToken"]
+
+
+class PhotoInventory:
+    """Objects of the content bucket, indexed by top-level prefix."""
+
+    def __init__(self, objects: dict[str, dict]):
+        self.objects = objects
+        self.players_without_photos: list[str] = []
+
+        self._keys_by_prefix: dict[str, list[str]] = defaultdict(list)
+        for key in sorted(objects):
+            prefix, _, _ = key.partition("/")
+            self._keys_by_prefix[prefix].append(key)
+
+    @classmethod
+    def from_bucket(
+        cls,
+        bucket: str,
+        workers: int = DEFAULT_LIST_WORKERS,
+        client_factory: Callable[[], object] | None = None,
+    ) -> "PhotoInventory":
+        """List the whole bucket, fetching each top-level prefix in parallel."""
+        client_factory = client_factory or default_s3_client_factory
+
+        objects, prefixes = list_objects(client_factory(), bucket, delimiter="/")
+
+        def list_prefix(prefix: str) -> dict[str, dict]:
+            return list_objects(client_factory(), bucket, prefix=prefix)[0]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for prefix_objects in executor.map(list_prefix, prefixes):
+                objects.update(prefix_objects)
+
+        return cls(objects)
+
+    def photos_for(self, player: dict) -> list[str]:
+        """Photos under the player's own prefix plus the shared photos of the generated list that exist."""
+        own_prefix = f"{player['username']}/"
+        own_photos = self._keys_by_prefix.get(player["username"], [])
+        shared_photos = [key for key in player["photos"] if not key.startswith(own_prefix) and key in self.objects]
+        return own_photos + shared_photos
+
+    def attach(self, players_data: Iterable[dict], strict: bool = False) -> Iterator[dict]:
+        """Replace each player's photos with the existing objects and add their size and ETag.
+
+        Players without any photo of their own are recorded in
+        players_without_photos, or raise MissingPhotosError when strict.
+        """
+        for player in players_data:
+            photos = self.photos_for(player)
+            if not any(key.startswith(f"{player['username']}/") for key in photos):
+                if strict:
+                    raise MissingPhotosError(f"No photos found for player {player['username']}")
+                self.players_without_photos.append(player["username"])
+
+            yield {
+                **player,
+                "photos": photos,
+                "photo_objects": {key: self.objects[key] for key in photos},
+            }
@@ -1,10 +1,17 @@
+import argparse
 import logging
 import os
+from collections.abc import Iterable, Iterator
 
-import boto3
 import pandas as pd
 
+from .capacity import CapacityPlan, plan_capacity
+from .checkpoint import UploadCheckpoint, input_hash
+from .dni_index import PARTITION_KEY, SORT_KEY, DniIndexTracker, IndexPlan, compute_index_plan
+from .inventory import PhotoInventory
 from .logger import get_logger
+from .sync import SyncPlan, compute_sync_plan, scan_table
+from .writer import ParallelBatchWriter, WriteStats
 
 log_levels = {
     "FATAL": logging.FATAL,
@@ -28,6 +35,21 @@ DNI_COLUMNS = [
     "Player_Tutor2Passport",
 ]
 
+# Number of CSV rows turned into player items per vectorised step
+PLAYERS_CHUNK_SIZE = 1000
+
+# Number of threads writing to DynamoDB in parallel
+DEFAULT_UPLOAD_WORKERS = 4
+
+# Sustained write rate, in WCU per second, used to estimate dry-run durations
+DEFAULT_WRITE_RATE = 1000.0
+
+DEFAULT_DNI_INDEX_TABLE_NAME = "dni_index"
+
+# Attributes other pipelines write on user items, such as the image derivatives, kept when a full upload
+# overwrites the items
+PRESERVED_ATTRIBUTES = ("derivatives",)
+
 
 def row_to_player_data(row: pd.Series) -> dict:
     """Convert a DataFrame row to player data dictionary.
@@ -57,44 +79,314 @@ def row_to_player_data(row: pd.Series) -> dict:
     }
 
 
-def generate_players_data(df: pd.DataFrame) -> list[dict]:
-    """Generate list of player data dictionaries from DataFrame."""
-    players_data = []
-    for _, row in df.iterrows():
-        player_data = row_to_player_data(row)
-        players_data.append(player_data)
-    return players_data
+def _chunk_dnis(chunk: pd.DataFrame) -> dict[int, list[str]]:
+    """Build the dnis list of every row in the chunk, keyed by row position.
+
+    DNI columns are stripped and emptied column-wise and then stacked, so each
+    list keeps the DNI_COLUMNS order. Rows without any DNI are not in the result.
+    """
+    dnis = chunk.reindex(columns=DNI_COLUMNS).reset_index(drop=True).astype("string")
+    dnis = dnis.apply(lambda column: column.str.strip())
+    dnis = dnis.mask(dnis == "")
+    stacked = dnis.melt(ignore_index=False, value_name="dni")["dni"].dropna()
+    return stacked.groupby(level=0, sort=False).agg(list).to_dict()
+
+
+def _chunk_to_players_data(chunk: pd.DataFrame) -> Iterator[dict]:
+    """Vectorised equivalent of row_to_player_data for a whole chunk of rows."""
+    dnis_by_row = _chunk_dnis(chunk)
+
+    # Converted value by value, as the f-strings of row_to_player_data do: astype(str) keeps missing values
+    # missing on pandas 3, which would put NaN floats in the photos
+    canonical_names = chunk["CanonicalName"].map(str)
+    first_photos = (canonical_names + "/001.png").tolist()
+    second_photos = (canonical_names + "/002.png").tolist()
+    team_photos = ("Teams/" + chunk["Equipo"].map(str) + ".png").tolist()
+
+    for position, username in enumerate(chunk["CanonicalName"].tolist()):
+        yield {
+            "username": username,
+            "dnis": dnis_by_row.get(position, []),
+            "photos": [first_photos[position], second_photos[position], team_photos[position]],
+        }
+
+
+def generate_players_data(df: pd.DataFrame, chunk_size: int = PLAYERS_CHUNK_SIZE) -> Iterator[dict]:
+    """Lazily generate player data dictionaries from DataFrame.
+
+    Rows are converted chunk by chunk with column-wise operations and yielded
+    one by one, so uploading can start before the whole DataFrame is processed.
+    """
+    for start in range(0, len(df), chunk_size):
+        yield from _chunk_to_players_data(df.iloc[start : start + chunk_size])
+
+
+def upload_players_data(
+    players_data: Iterable[dict],
+    table_name: str,
+    workers: int = DEFAULT_UPLOAD_WORKERS,
+    client_factory=None,
+    checkpoint: UploadCheckpoint | None = None,
+) -> WriteStats:
+    """Upload player data items to DynamoDB users table using parallel batch writes.
+
+    With a checkpoint, batches acknowledged by a previous run are skipped and
+    the checkpoint file is removed once every batch has been written.
+    """
+    writer = ParallelBatchWriter(table_name, workers=workers, client_factory=client_factory)
+    stats = writer.write(players_data, checkpoint=checkpoint)
+
+    if checkpoint is not None:
+        if stats.skipped_batches:
+            logger.info(f"Resumed upload skipping {stats.skipped_batches} already acknowledged batches")
+        checkpoint.clear()
+
+    logger.info(
+        f"Uploaded {stats.items} items to {table_name} in {stats.elapsed:.2f}s "
+        f"({stats.items_per_second:.1f} items/s, {stats.retries} retries, {stats.consumed_wcu:.1f} WCU consumed)"
+    )
+    return stats
 
 
-def upload_players_data(players_data: list[dict], table_name: str, dynamodb_resource=None) -> None:
-    """Upload player data items to DynamoDB users table."""
-    if dynamodb_resource is None:
-        dynamodb_resource = boto3.resource("dynamodb")
+def with_preserved_attributes(
+    players_data: Iterable[dict],
+    table_name: str,
+    workers: int = DEFAULT_UPLOAD_WORKERS,
+    client_factory=None,
+) -> Iterator[dict]:
+    """Add the PRESERVED_ATTRIBUTES of the current items to the players, read with a projected Scan.
 
-    table = dynamodb_resource.Table(table_name)
+    A full upload writes whole items, which would otherwise drop them.
+    """
+    current_items = scan_table(
+        table_name, segments=workers, client_factory=client_factory, attributes=PRESERVED_ATTRIBUTES
+    )
+    logger.info(f"Keeping {', '.join(PRESERVED_ATTRIBUTES)} of {len(current_items)} items of {table_name}")
+    for player in players_data:
+        current = current_items.get(player["username"], {})
+        yield {**{name: current[name] for name in PRESERVED_ATTRIBUTES if name in current}, **player}
+
+
+def upload_dni_index(
+    index_items: Iterable[dict],
+    table_name: str,
+    workers: int = DEFAULT_UPLOAD_WORKERS,
+    client_factory=None,
+) -> WriteStats:
+    """Write DNI inverted index entries. Entries already in the table are overwritten, none are deleted."""
+    writer = ParallelBatchWriter(
+        table_name, workers=workers, client_factory=client_factory, partition_key=PARTITION_KEY, sort_key=SORT_KEY
+    )
+    stats = writer.write(index_items)
+    logger.info(f"Wrote {stats.items} DNI index entries to {table_name} in {stats.elapsed:.2f}s")
+    return stats
+
+
+def sync_dni_index(
+    tracker: DniIndexTracker,
+    table_name: str,
+    removed_usernames: Iterable[str] = (),
+    workers: int = DEFAULT_UPLOAD_WORKERS,
+    dry_run: bool = False,
+    client_factory=None,
+) -> IndexPlan:
+    """Bring the DNI inverted index in line with the tracked players, writing and deleting only the differences."""
+    current = scan_table(
+        table_name, segments=workers, client_factory=client_factory, partition_key=PARTITION_KEY, sort_key=SORT_KEY
+    )
+    plan = compute_index_plan(tracker, current, removed_usernames)
+    logger.info(f"DNI index sync plan for {table_name}: {plan.summary()}")
+    if dry_run:
+        return plan
+
+    if plan.to_put:
+        upload_dni_index(plan.to_put, table_name, workers=workers, client_factory=client_factory)
+    if plan.to_delete:
+        writer = ParallelBatchWriter(
+            table_name, workers=workers, client_factory=client_factory, partition_key=PARTITION_KEY, sort_key=SORT_KEY
+        )
+        stats = writer.delete(plan.to_delete)
+        logger.info(f"Deleted {stats.items} DNI index entries from {table_name}")
+    return plan
 
-    with table.batch_writer() as batch:
-        for player in players_data:
-            batch.put_item(Item=player)
 
-    logger.info(f"Uploaded {len(players_data)} items to {table_name}")
+def report_capacity(players_data: Iterable[dict], write_rate: float = DEFAULT_WRITE_RATE) -> CapacityPlan:
+    """Log the size, write capacity and estimated duration of uploading the items, without touching AWS."""
+    plan = plan_capacity(players_data)
+    for line in plan.report(write_rate):
+        logger.info(line)
+    if plan.large_items:
+        logger.warning(f"{len(plan.large_items)} items are approaching the DynamoDB item size limit")
+    return plan
+
+
+def sync_players_data(
+    players_data: Iterable[dict],
+    table_name: str,
+    workers: int = DEFAULT_UPLOAD_WORKERS,
+    delete_removed: bool = False,
+    dry_run: bool = False,
+    client_factory=None,
+    write_rate: float = DEFAULT_WRITE_RATE,
+    dni_index_table: str | None = None,
+) -> SyncPlan:
+    """Write only new or changed player items, optionally deleting users no longer in the input.
+
+    With a DNI index table, its entries are synchronised with the players as well.
+    """
+    current_items = scan_table(table_name, segments=workers, client_factory=client_factory)
+    logger.info(f"Read {len(current_items)} items from {table_name}")
+
+    tracker = DniIndexTracker()
+    plan = compute_sync_plan(tracker.track(players_data), current_items, delete_removed=delete_removed)
+    logger.info(f"Sync plan for {table_name}: {plan.summary()}")
 
+    if dni_index_table:
+        sync_dni_index(
+            tracker,
+            dni_index_table,
+            removed_usernames=plan.removed,
+            workers=workers,
+            dry_run=dry_run,
+            client_factory=client_factory,
+        )
 
-def main():
+    if dry_run:
+        for player in plan.new:
+            logger.info(f"Would add {player['username']}")
+        for player in plan.changed:
+            logger.info(f"Would update {player['username']}")
+        for username in plan.removed:
+            logger.info(f"Would delete {username}")
+        report_capacity(plan.to_put, write_rate)
+        return plan
+
+    if plan.to_put:
+        upload_players_data(plan.to_put, table_name, workers=workers, client_factory=client_factory)
+
+    if plan.removed:
+        writer = ParallelBatchWriter(table_name, workers=workers, client_factory=client_factory)
+        stats = writer.delete(plan.removed)
+        logger.info(f"Deleted {stats.items} items from {table_name}")
+
+    return plan
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Upload media day players data to DynamoDB")
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Only write players that are new or changed compared to the current table contents",
+    )
+    parser.add_argument(
+        "--delete-removed",
+        action="store_true",
+        help="With --sync, also delete users that are no longer in the input CSV",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report the write capacity (and with --sync the changes) of the upload without writing anything",
+    )
+    parser.add_argument(
+        "--write-rate",
+        type=float,
+        default=DEFAULT_WRITE_RATE,
+        help="Sustained write rate in WCU per second used to estimate the dry-run duration",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted upload of the same input from its last checkpoint",
+    )
+    parser.add_argument(
+        "--photo-bucket",
+        default=os.environ.get("CBTC_CONTENT_BUCKET_NAME"),
+        help="Content bucket listed so player items only reference existing photos (env: CBTC_CONTENT_BUCKET_NAME)",
+    )
+    parser.add_argument(
+        "--dni-index-table",
+        default=os.environ.get("CBTC_DNI_INDEX_TABLE_NAME", DEFAULT_DNI_INDEX_TABLE_NAME),
+        help="Table of the DNI inverted index used by family downloads (env: CBTC_DNI_INDEX_TABLE_NAME)",
+    )
+    parser.add_argument(
+        "--no-dni-index",
+        action="store_true",
+        help="Do not write the DNI inverted index",
+    )
+    parser.add_argument(
+        "--require-photos",
+        action="store_true",
+        help="With a photo bucket, fail before writing anything if a player has no photos",
+    )
+    args = parser.parse_args(argv)
+    if args.resume and args.sync:
+        parser.error("--resume cannot be combined with --sync, which only writes pending changes anyway")
+    return args
+
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
     logger.info("Starting players data uploader pipeline")
 
     input_path = os.environ.get("CBTC_MEDIA_DAY_OUTPUT_PATH", "output/cbtc_media_day_players.csv")
     table_name = os.environ.get("CBTC_PLAYERS_TABLE_NAME", "players")
+    workers = int(os.environ.get("CBTC_UPLOADER_WORKERS", DEFAULT_UPLOAD_WORKERS))
+    checkpoint_dir = os.environ.get("CBTC_UPLOADER_CHECKPOINT_DIR", "output/checkpoints")
 
     logger.info(f"Reading CSV from {input_path}")
-    df = pd.read_csv(input_path, encoding="utf-8")
-    logger.info(f"Loaded {len(df)} rows from CSV")
+    chunks = pd.read_csv(input_path, encoding="utf-8", chunksize=PLAYERS_CHUNK_SIZE)
+    players_data = (player for chunk in chunks for player in generate_players_data(chunk))
+
+    inventory = None
+    if args.photo_bucket:
+        logger.info(f"Listing photos in s3://{args.photo_bucket}")
+        inventory = PhotoInventory.from_bucket(args.photo_bucket)
+        logger.info(f"Found {len(inventory.objects)} objects in s3://{args.photo_bucket}")
+        players_data = inventory.attach(players_data, strict=args.require_photos)
+        if args.require_photos:
+            # Check every player before the first write
+            players_data = list(players_data)
+
+    dni_index_table = None if args.no_dni_index else args.dni_index_table
+
+    if args.sync:
+        logger.info(f"Synchronising player data with DynamoDB table '{table_name}'")
+        sync_players_data(
+            players_data,
+            table_name,
+            workers=workers,
+            delete_removed=args.delete_removed,
+            dry_run=args.dry_run,
+            write_rate=args.write_rate,
+            dni_index_table=dni_index_table,
+        )
+    elif args.dry_run:
+        logger.info(f"Planning upload capacity for DynamoDB table '{table_name}'")
+        report_capacity(players_data, args.write_rate)
+    else:
+        input_key = input_hash(input_path, table_name)
+        checkpoint_path = os.path.join(checkpoint_dir, f"{input_key}.json")
+        if args.resume:
+            checkpoint = UploadCheckpoint.load(checkpoint_path, input_key)
+            logger.info(f"Resuming upload from checkpoint {checkpoint_path} at batch {checkpoint.committed}")
+        else:
+            checkpoint = UploadCheckpoint(checkpoint_path, input_key)
 
-    logger.info("Generating player data")
-    players_data = generate_players_data(df)
+        logger.info(f"Generating and uploading player data to DynamoDB table '{table_name}'")
+        tracker = DniIndexTracker()
+        players_data = with_preserved_attributes(tracker.track(players_data), table_name, workers=workers)
+        upload_players_data(players_data, table_name, workers=workers, checkpoint=checkpoint)
+        if dni_index_table:
+            logger.info(f"Uploading the DNI inverted index to DynamoDB table '{dni_index_table}'")
+            upload_dni_index(tracker.items, dni_index_table, workers=workers)
 
-    logger.info(f"Uploading {len(players_data)} players to DynamoDB table '{table_name}'")
-    upload_players_data(players_data, table_name)
+    if inventory is not None and inventory.players_without_photos:
+        logger.warning(
+            f"{len(inventory.players_without_photos)} players have no photos: "
+            f"{', '.join(inventory.players_without_photos)}"
+        )
 
 
 if __name__ == "__main__":
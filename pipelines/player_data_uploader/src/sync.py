@@ -0,0 +1,127 @@
+"""Incremental synchronisation of the users table.
+
+The current table contents are read with a parallel segmented Scan and compared
+against the generated player items, so only new or changed users are written
+and, optionally, users no longer present in the CSV are deleted.
+"""
+
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from boto3.dynamodb.types import TypeDeserializer
+
+from .writer import default_client_factory
+
+DEFAULT_SCAN_SEGMENTS = 4
+
+
+@dataclass
+class SyncPlan:
+    """Changes needed to make the users table match the generated items."""
+
+    new: list[dict] = field(default_factory=list)
+    changed: list[dict] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def to_put(self) -> list[dict]:
+        return self.new + self.changed
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.new)} new, {len(self.changed)} changed, "
+            f"{len(self.removed)} removed, {self.unchanged} unchanged"
+        )
+
+
+def _scan_segment(
+    table_name: str,
+    segment: int,
+    total_segments: int,
+    client_factory: Callable[[], object],
+    partition_key: str,
+    sort_key: str | None,
+    attributes: tuple[str, ...] | None = None,
+) -> dict[str | tuple[str, str], dict]:
+    client = client_factory()
+    deserializer = TypeDeserializer()
+    items = {}
+
+    scan_kwargs = {"TableName": table_name, "Segment": segment, "TotalSegments": total_segments}
+    if attributes:
+        key_names = (partition_key,) if sort_key is None else (partition_key, sort_key)
+        names = {f"#a{index}": name for index, name in enumerate(dict.fromkeys((*key_names, *attributes)))}
+        scan_kwargs["ProjectionExpression"] = ", ".join(names)
+        scan_kwargs["ExpressionAttributeNames"] = names
+    while True:
+        response = client.scan(**scan_kwargs)
+        for raw_item in response.get("Items", []):
+            item = {k: deserializer.deserialize(v) for k, v in raw_item.items()}
+            key = item[partition_key] if sort_key is None else (item[partition_key], item[sort_key])
+            items[key] = item
+
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return items
+        scan_kwargs["ExclusiveStartKey"] = last_key
+
+
+def scan_table(
+    table_name: str,
+    segments: int = DEFAULT_SCAN_SEGMENTS,
+    client_factory: Callable[[], object] | None = None,
+    partition_key: str = "username",
+    sort_key: str | None = None,
+    attributes: tuple[str, ...] | None = None,
+) -> dict[str | tuple[str, str], dict]:
+    """Read the whole table with a parallel segmented Scan, keyed by partition key, or (partition, sort) pairs.
+
+    With attributes, only those and the key attributes, partition and sort key, are read.
+    """
+    client_factory = client_factory or default_client_factory
+
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        futures = [
+            executor.submit(
+                _scan_segment, table_name, segment, segments, client_factory, partition_key, sort_key, attributes
+            )
+            for segment in range(segments)
+        ]
+        items = {}
+        for future in futures:
+            items.update(future.result())
+
+    return items
+
+
+def compute_sync_plan(
+    players_data: Iterable[dict],
+    current_items: dict[str, dict],
+    delete_removed: bool = False,
+    partition_key: str = "username",
+) -> SyncPlan:
+    """Compare generated items with the current table contents.
+
+    Only the attributes produced by the uploader are compared, so attributes
+    added to user items by other processes do not make an item look changed,
+    and changed items keep them when rewritten. Removed users are only listed
+    when delete_removed is set.
+    """
+    plan = SyncPlan()
+    remaining = dict(current_items)
+
+    for player in players_data:
+        current = remaining.pop(player[partition_key], None)
+        if current is None:
+            plan.new.append(player)
+        elif any(current.get(attribute) != value for attribute, value in player.items()):
+            plan.changed.append({**current, **player})
+        else:
+            plan.unchanged += 1
+
+    if delete_removed:
+        plan.removed = sorted(remaining)
+
+    return plan
@@ -0,0 +1,287 @@
+"""Parallel DynamoDB writer for the players data uploader.
+
+Items are grouped into BatchWriteItem requests and shared across worker threads,
+each one owning its own low-level DynamoDB client. Unprocessed items and
+throttling errors are retried with jittered exponential backoff, and the number
+of workers allowed to write at the same time shrinks on throttling and grows
+back once batches go through again.
+"""
+
+import queue
+import random
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import boto3
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+from .checkpoint import UploadCheckpoint
+
+# BatchWriteItem accepts at most 25 put/delete requests per call
+MAX_BATCH_SIZE = 25
+
+THROTTLING_ERROR_CODES = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+}
+
+
+class BatchWriteError(Exception):
+    """Raised when a batch could not be written after all retries."""
+
+
+@dataclass
+class WriteStats:
+    """Summary of a parallel write."""
+
+    items: int = 0
+    batches: int = 0
+    skipped_batches: int = 0
+    retries: int = 0
+    consumed_wcu: float = 0.0
+    elapsed: float = 0.0
+
+    @property
+    def items_per_second(self) -> float:
+        return self.items / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class AdaptiveConcurrency:
+    """Additive-increase / multiplicative-decrease gate on concurrent writes.
+
+    Every throttle halves the number of writers allowed at the same time and
+    every `increase_after` consecutive successful batches lets one more in,
+    up to `maximum`.
+    """
+
+    def __init__(self, maximum: int, increase_after: int = 10):
+        self.maximum = maximum
+        self.limit = maximum
+        self.increase_after = increase_after
+        self._active = 0
+        self._successes = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        with self._condition:
+            while self._active >= self.limit:
+                self._condition.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._condition:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+
+    def on_success(self) -> None:
+        with self._condition:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify_all()
+
+
+def default_client_factory():
+    """Create a DynamoDB client on its own session, as sessions are not thread safe."""
+    return boto3.session.Session().client("dynamodb")
+
+
+class ParallelBatchWriter:
+    """Write items to a DynamoDB table using several threads in parallel."""
+
+    def __init__(
+        self,
+        table_name: str,
+        workers: int = 4,
+        client_factory: Callable[[], object] | None = None,
+        partition_key: str = "username",
+        sort_key: str | None = None,
+        max_retries: int = 8,
+        base_delay: float = 0.05,
+        max_delay: float = 5.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+
+        self.table_name = table_name
+        self.workers = workers
+        self.client_factory = client_factory or default_client_factory
+        self.partition_key = partition_key
+        self.sort_key = sort_key
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.concurrency = AdaptiveConcurrency(workers)
+
+        self._serializer = TypeSerializer()
+        self._stats = WriteStats()
+        self._stats_lock = threading.Lock()
+
+    def write(self, items: Iterable[dict], checkpoint: UploadCheckpoint | None = None) -> WriteStats:
+        """Write all items and return the write statistics.
+
+        Raises BatchWriteError (or the underlying ClientError) as soon as one
+        batch fails; batches already sent are not rolled back. With a checkpoint,
+        batches it already acknowledges are skipped and every written batch is
+        recorded in it.
+        """
+        return self._run(self._put_requests(items), checkpoint)
+
+    def delete(self, keys: Iterable[str | tuple[str, str]]) -> WriteStats:
+        """Delete the items with the given keys and return the write statistics.
+
+        Keys are partition key values, or (partition, sort) pairs on tables with a sort key.
+        """
+        return self._run(self._delete_requests(keys))
+
+    def _key_attributes(self) -> tuple[str, ...]:
+        return (self.partition_key,) if self.sort_key is None else (self.partition_key, self.sort_key)
+
+    def _put_requests(self, items: Iterable[dict]) -> Iterator[tuple[str | tuple[str, str], dict]]:
+        for item in items:
+            serialized = {k: self._serializer.serialize(v) for k, v in item.items()}
+            key = tuple(item[attribute] for attribute in self._key_attributes())
+            yield key if self.sort_key else key[0], {"PutRequest": {"Item": serialized}}
+
+    def _delete_requests(self, keys: Iterable[str | tuple[str, str]]) -> Iterator[tuple[str | tuple[str, str], dict]]:
+        for key in keys:
+            values = key if self.sort_key else (key,)
+            serialized = {
+                attribute: self._serializer.serialize(value)
+                for attribute, value in zip(self._key_attributes(), values, strict=True)
+            }
+            yield key, {"DeleteRequest": {"Key": serialized}}
+
+    def _run(
+        self, requests: Iterable[tuple[str | tuple[str, str], dict]], checkpoint: UploadCheckpoint | None = None
+    ) -> WriteStats:
+        self._stats = WriteStats()
+        batches: queue.Queue = queue.Queue(maxsize=self.workers * 2)
+        failed = threading.Event()
+        errors: list[Exception] = []
+
+        threads = [
+            threading.Thread(target=self._worker, args=(batches, failed, errors, checkpoint), daemon=True)
+            for _ in range(self.workers)
+        ]
+
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+
+        try:
+            for index, batch in enumerate(self._batches(requests)):
+                if failed.is_set():
+                    break
+                if checkpoint is not None and checkpoint.is_done(index):
+                    with self._stats_lock:
+                        self._stats.skipped_batches += 1
+                    continue
+                batches.put((index, batch))
+        finally:
+            for _ in threads:
+                batches.put(None)
+            for thread in threads:
+                thread.join()
+            self._stats.elapsed = time.monotonic() - started
+
+        if errors:
+            raise errors[0]
+
+        return self._stats
+
+    def _batches(self, requests: Iterable[tuple[str | tuple[str, str], dict]]) -> Iterator[list[dict]]:
+        """Group write requests in BatchWriteItem batches, deduplicating keys within a batch."""
+        pending: dict = {}
+        for key, request in requests:
+            pending[key] = request
+            if len(pending) == MAX_BATCH_SIZE:
+                yield list(pending.values())
+                pending = {}
+
+        if pending:
+            yield list(pending.values())
+
+    def _worker(
+        self,
+        batches: queue.Queue,
+        failed: threading.Event,
+        errors: list[Exception],
+        checkpoint: UploadCheckpoint | None,
+    ) -> None:
+        client = self.client_factory()
+        while True:
+            task = batches.get()
+            if task is None:
+                return
+            # Keep draining after a failure so the producer never blocks on a full queue
+            if failed.is_set():
+                continue
+            index, batch = task
+            try:
+                self._write_batch(client, batch)
+                if checkpoint is not None:
+                    checkpoint.mark_done(index)
+            except Exception as e:
+                errors.append(e)
+                failed.set()
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay for the given retry attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def _write_batch(self, client, requests: list[dict]) -> None:
+        attempt = 0
+        batch_size = len(requests)
+
+        while True:
+            response = None
+            with self.concurrency.slot():
+                try:
+                    response = client.batch_write_item(
+                        RequestItems={self.table_name: requests},
+                        ReturnConsumedCapacity="TOTAL",
+                    )
+                except ClientError as e:
+                    if e.response.get("Error", {}).get("Code") not in THROTTLING_ERROR_CODES:
+                        raise
+
+            if response is not None:
+                consumed = sum(c.get("CapacityUnits", 0) for c in response.get("ConsumedCapacity", []))
+                requests = response.get("UnprocessedItems", {}).get(self.table_name, [])
+                with self._stats_lock:
+                    self._stats.consumed_wcu += consumed
+
+            if response is not None and not requests:
+                self.concurrency.on_success()
+                with self._stats_lock:
+                    self._stats.items += batch_size
+                    self._stats.batches += 1
+                return
+
+            self.concurrency.on_throttle()
+            attempt += 1
+            with self._stats_lock:
+                self._stats.retries += 1
+
+            if attempt > self.max_retries:
+                raise BatchWriteError(
+                    f"Could not write {len(requests)} items to {self.table_name} after {self.max_retries} retries"
+                )
+
+            self.sleep(self._backoff(attempt))
@@ -0,0 +1,89 @@
+from decimal import Decimal
+
+import pytest
+from src.capacity import (
+    DYNAMODB_MAX_ITEM_SIZE,
+    CapacityPlan,
+    attribute_value_size,
+    item_size,
+    plan_capacity,
+    write_capacity,
+)
+
+
+class TestAttributeValueSize:
+    def test_strings_use_utf8_length(self):
+        assert attribute_value_size("abc") == 3
+        assert attribute_value_size("ñ") == 2
+
+    def test_numbers_use_significant_digits(self):
+        assert attribute_value_size(12345) == 4
+        assert attribute_value_size(Decimal("1000")) == 2
+        assert attribute_value_size(Decimal("0.0012")) == 2
+
+    def test_lists_add_overhead_per_element(self):
+        assert attribute_value_size(["ab", "cde"]) == 3 + 2 + 5
+        assert attribute_value_size([]) == 3
+
+    def test_maps_include_nested_names(self):
+        assert attribute_value_size({"key": "value"}) == 3 + 1 + 8
+
+    def test_null_and_bool(self):
+        assert attribute_value_size(None) == 1
+        assert attribute_value_size(True) == 1
+
+    def test_unsupported_type(self):
+        with pytest.raises(TypeError):
+            attribute_value_size(1.5)
+
+
+class TestItemSize:
+    def test_player_item(self):
+        item = {"username": "juan", "dnis": ["12345678Z"], "photos": ["juan/001.png", "Teams/A.png"]}
+
+        expected = (8 + 4) + (4 + 3 + 1 + 9) + (6 + 3 + 2 + 12 + 11)
+        assert item_size(item) == expected
+
+    def test_write_capacity_rounds_up_per_kb(self):
+        assert write_capacity(10) == 1
+        assert write_capacity(1024) == 1
+        assert write_capacity(1025) == 2
+
+
+class TestPlanCapacity:
+    def test_totals(self):
+        players = [{"username": f"player{i}", "dnis": ["12345678Z"], "photos": []} for i in range(30)]
+
+        plan = plan_capacity(players)
+
+        assert plan.items == 30
+        assert plan.total_wcu == 30
+        assert plan.batch_calls == 2
+        assert plan.total_bytes == sum(item_size(p) for p in players)
+
+    def test_flags_items_approaching_size_limit(self):
+        players = [
+            {"username": "small", "photos": []},
+            {"username": "huge", "photos": ["x" * int(DYNAMODB_MAX_ITEM_SIZE * 0.9)]},
+        ]
+
+        plan = plan_capacity(players)
+
+        assert [key for key, _ in plan.large_items] == ["huge"]
+        assert plan.largest_item[0] == "huge"
+        assert plan.total_wcu == 1 + write_capacity(item_size(players[1]))
+
+    def test_estimated_duration_and_report(self):
+        plan = CapacityPlan(items=50, total_bytes=5000, total_wcu=50, largest_item=("player1", 120))
+
+        assert plan.estimated_seconds(25) == 2.0
+        report = plan.report(25)
+        assert "BatchWriteItem calls: 2" in report
+        assert "Estimated duration at 25 WCU/s: 2.0s" in report
+
+    def test_empty_input(self):
+        plan = plan_capacity([])
+
+        assert plan.items == 0
+        assert plan.batch_calls == 0
+        assert plan.largest_item is None
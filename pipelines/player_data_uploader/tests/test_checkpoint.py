@@ -0,0 +1,68 @@
+import json
+
+from src.checkpoint import UploadCheckpoint, input_hash
+
+
+class TestInputHash:
+    def test_depends_on_contents_and_table(self, tmp_path):
+        csv_path = tmp_path / "players.csv"
+        csv_path.write_text("CanonicalName,Equipo\nplayer1,Team A\n")
+
+        first = input_hash(str(csv_path), "users")
+
+        assert input_hash(str(csv_path), "users") == first
+        assert input_hash(str(csv_path), "other_table") != first
+
+        csv_path.write_text("CanonicalName,Equipo\nplayer2,Team A\n")
+        assert input_hash(str(csv_path), "users") != first
+
+
+class TestUploadCheckpoint:
+    def test_committed_position_advances_over_contiguous_batches(self, tmp_path):
+        checkpoint = UploadCheckpoint(str(tmp_path / "cp.json"), "hash")
+
+        checkpoint.mark_done(1)
+        assert checkpoint.committed == 0
+        assert checkpoint.is_done(1)
+        assert not checkpoint.is_done(0)
+
+        checkpoint.mark_done(0)
+        assert checkpoint.committed == 2
+        assert checkpoint.acknowledged == set()
+
+    def test_persists_progress(self, tmp_path):
+        path = tmp_path / "checkpoints" / "cp.json"
+        checkpoint = UploadCheckpoint(str(path), "hash")
+
+        checkpoint.mark_done(0)
+        checkpoint.mark_done(2)
+
+        assert json.loads(path.read_text()) == {"input_hash": "hash", "committed": 1, "acknowledged": [2]}
+
+        loaded = UploadCheckpoint.load(str(path), "hash")
+        assert loaded.committed == 1
+        assert loaded.is_done(2)
+        assert not loaded.is_done(1)
+
+    def test_load_ignores_checkpoint_of_other_input(self, tmp_path):
+        path = tmp_path / "cp.json"
+        UploadCheckpoint(str(path), "old").mark_done(0)
+
+        loaded = UploadCheckpoint.load(str(path), "new")
+
+        assert loaded.committed == 0
+        assert not loaded.is_done(0)
+
+    def test_load_missing_file_starts_fresh(self, tmp_path):
+        loaded = UploadCheckpoint.load(str(tmp_path / "missing.json"), "hash")
+
+        assert loaded.committed == 0
+
+    def test_clear_removes_file(self, tmp_path):
+        path = tmp_path / "cp.json"
+        checkpoint = UploadCheckpoint(str(path), "hash")
+        checkpoint.mark_done(0)
+
+        checkpoint.clear()
+
+        assert not path.exists()
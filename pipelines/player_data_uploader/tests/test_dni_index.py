@@ -0,0 +1,33 @@
+from src.dni_index import DniIndexTracker, compute_index_plan, index_items
+
+
+class TestIndexItems:
+    def test_one_item_per_distinct_dni(self):
+        player = {"username": "child1", "dnis": ["1A", "9T", "1A"], "photos": []}
+
+        assert index_items(player) == [{"dni": "1A", "username": "child1"}, {"dni": "9T", "username": "child1"}]
+
+    def test_players_without_dnis(self):
+        assert index_items({"username": "child1", "dnis": []}) == []
+
+
+class TestDniIndexTracker:
+    def test_passes_players_through(self):
+        tracker = DniIndexTracker()
+        players = [{"username": "child1", "dnis": ["9T"]}, {"username": "child2", "dnis": ["9T"]}]
+
+        assert list(tracker.track(iter(players))) == players
+        assert tracker.items == [{"dni": "9T", "username": "child1"}, {"dni": "9T", "username": "child2"}]
+        assert tracker.usernames == {"child1", "child2"}
+
+
+class TestComputeIndexPlan:
+    def test_keeps_entries_of_users_outside_the_input(self):
+        tracker = DniIndexTracker()
+        list(tracker.track([{"username": "child1", "dnis": ["1A"]}]))
+
+        plan = compute_index_plan(tracker, [("1A", "child1"), ("7B", "child1"), ("5A", "other")])
+
+        assert plan.to_put == []
+        assert plan.to_delete == [("7B", "child1")]
+        assert plan.summary() == "0 new, 1 removed"
@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+from src.inventory import MissingPhotosError, PhotoInventory, list_objects
+
+
+class StubS3Client:
+    """Serves ListObjectsV2 from an in-memory key list, `page_size` keys per page."""
+
+    def __init__(self, keys: dict[str, int], page_size: int = 2):
+        self.keys = keys
+        self.page_size = page_size
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def list_objects_v2(self, Bucket, Prefix="", Delimiter=None, ContinuationToken=None):
+        with self._lock:
+            self.calls.append((Prefix, Delimiter, ContinuationToken))
+
+        contents = []
+        prefixes = []
+        for key in sorted(k for k in self.keys if k.startswith(Prefix)):
+            rest = key[len(Prefix) :]
+            if Delimiter and Delimiter in rest:
+                prefix = Prefix + rest.split(Delimiter)[0] + Delimiter
+                if prefix not in prefixes:
+                    prefixes.append(prefix)
+            else:
+                contents.append(key)
+
+        start = int(ContinuationToken or 0)
+        page = contents[start : start + self.page_size]
+        response = {
+            "Contents": [{"Key": key, "Size": self.keys[key], "ETag": f'"etag-{key}"'} for key in page],
+            "CommonPrefixes": [{"Prefix": p} for p in prefixes] if start == 0 else [],
+            "IsTruncated": start + self.page_size < len(contents),
+        }
+        if response["IsTruncated"]:
+            response["NextContinuationToken"] = str(start + self.page_size)
+        return response
+
+
+BUCKET_KEYS = {
+    "juan/001.png": 100,
+    "juan/002.png": 200,
+    "juan/003.png": 300,
+    "ana/001.png": 150,
+    "Teams/Infantil A.png": 500,
+    "readme.txt": 10,
+}
+
+
+def player(username: str, team: str = "Infantil A") -> dict:
+    return {
+        "username": username,
+        "dnis": ["12345678Z"],
+        "photos": [f"{username}/001.png", f"{username}/002.png", f"Teams/{team}.png"],
+    }
+
+
+class TestListObjects:
+    def test_follows_continuation_tokens(self):
+        client = StubS3Client(BUCKET_KEYS, page_size=1)
+
+        objects, _ = list_objects(client, "bucket", prefix="juan/")
+
+        assert sorted(objects) == ["juan/001.png", "juan/002.png", "juan/003.png"]
+        assert objects["juan/002.png"] == {"size": 200, "etag": "etag-juan/002.png"}
+        assert len(client.calls) == 3
+
+    def test_returns_common_prefixes_with_delimiter(self):
+        objects, prefixes = list_objects(StubS3Client(BUCKET_KEYS), "bucket", delimiter="/")
+
+        assert sorted(prefixes) == ["Teams/", "ana/", "juan/"]
+        assert list(objects) == ["readme.txt"]
+
+
+class TestPhotoInventory:
+    def test_from_bucket_lists_every_prefix(self):
+        client = StubS3Client(BUCKET_KEYS)
+
+        inventory = PhotoInventory.from_bucket("bucket", workers=3, client_factory=lambda: client)
+
+        assert sorted(inventory.objects) == sorted(BUCKET_KEYS)
+        assert {prefix for prefix, delimiter, _ in client.calls if delimiter is None} == {"Teams/", "ana/", "juan/"}
+
+    def test_photos_for_uses_existing_objects(self):
+        inventory = PhotoInventory.from_bucket("bucket", client_factory=lambda: StubS3Client(BUCKET_KEYS))
+
+        assert inventory.photos_for(player("juan")) == [
+            "juan/001.png",
+            "juan/002.png",
+            "juan/003.png",
+            "Teams/Infantil A.png",
+        ]
+        assert inventory.photos_for(player("ana", team="Cadete")) == ["ana/001.png"]
+
+    def test_attach_adds_sizes_and_etags(self):
+        inventory = PhotoInventory.from_bucket("bucket", client_factory=lambda: StubS3Client(BUCKET_KEYS))
+
+        (result,) = inventory.attach([player("ana")])
+
+        assert result["photos"] == ["ana/001.png", "Teams/Infantil A.png"]
+        assert result["photo_objects"] == {
+            "ana/001.png": {"size": 150, "etag": "etag-ana/001.png"},
+            "Teams/Infantil A.png": {"size": 500, "etag": "etag-Teams/Infantil A.png"},
+        }
+        assert result["dnis"] == ["12345678Z"]
+
+    def test_reports_players_without_own_photos(self):
+        inventory = PhotoInventory.from_bucket("bucket", client_factory=lambda: StubS3Client(BUCKET_KEYS))
+
+        results = list(inventory.attach([player("juan"), player("pedro")]))
+
+        assert inventory.players_without_photos == ["pedro"]
+        assert results[1]["photos"] == ["Teams/Infantil A.png"]
+
+    def test_strict_mode_fails_fast(self):
+        inventory = PhotoInventory.from_bucket("bucket", client_factory=lambda: StubS3Client(BUCKET_KEYS))
+
+        with pytest.raises(MissingPhotosError):
+            list(inventory.attach([player("pedro"), player("juan")], strict=True))
@@ -1,11 +1,20 @@
-from unittest.mock import MagicMock
+import types
 
 import pandas as pd
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+from src.checkpoint import UploadCheckpoint
+from src.dni_index import DniIndexTracker
 from src.main import (
     DNI_COLUMNS,
     generate_players_data,
+    parse_args,
+    report_capacity,
     row_to_player_data,
+    sync_players_data,
+    upload_dni_index,
     upload_players_data,
+    with_preserved_attributes,
 )
 
 
@@ -160,7 +169,7 @@ class TestGeneratePlayersData:
                 "Player_Tutor2Passport": [None, None],
             }
         )
-        result = generate_players_data(df)
+        result = list(generate_players_data(df))
 
         assert len(result) == 2
         assert result[0]["username"] == "player1"
@@ -172,19 +181,92 @@ class TestGeneratePlayersData:
 
     def test_empty_dataframe(self):
         df = pd.DataFrame(columns=["CanonicalName", "Equipo"] + DNI_COLUMNS)
-        result = generate_players_data(df)
+        result = list(generate_players_data(df))
 
         assert result == []
 
+    def test_returns_generator(self):
+        df = pd.DataFrame({"CanonicalName": ["player1"], "Equipo": ["Team A"], "Player_DNI": ["11111111H"]})
+
+        assert isinstance(generate_players_data(df), types.GeneratorType)
+
+    def test_matches_row_to_player_data(self):
+        df = pd.DataFrame(
+            {
+                "CanonicalName": ["player1", "player2", "player3", "player4"],
+                # player4 has no team, as read from a spreadsheet with an empty cell
+                "Equipo": ["Team A", "Team B", "Team C", float("nan")],
+                "Player_DNI": ["  11111111H ", None, "   ", "33333333P"],
+                "Player_NIE": [None, "X1234567A", None, None],
+                "Player_Pasaporte": ["", None, None, None],
+                "Player_Tutor1DNI": ["22222222J", None, None, None],
+                "Player_Tutor1NIE": [None, None, None, None],
+                "Player_Tutor1Passport": [None, "AAA123456", None, None],
+                "Player_Tutor2DNI": [None, None, None, None],
+                "Player_Tutor2NIE": ["Y1111111B", None, None, None],
+                "Player_Tutor2Passport": [None, None, None, None],
+            },
+            index=[10, 10, 3, 4],
+        )
+        expected = [row_to_player_data(row) for _, row in df.iterrows()]
+
+        players = list(generate_players_data(df, chunk_size=2))
+
+        assert players == expected
+        assert players[3]["photos"][2] == "Teams/nan.png"
+
+    def test_missing_dni_columns_are_ignored(self):
+        df = pd.DataFrame({"CanonicalName": ["player1"], "Equipo": ["Team A"], "Player_Tutor1DNI": ["11111111H"]})
+
+        result = list(generate_players_data(df))
+
+        assert result[0]["dnis"] == ["11111111H"]
+
+
+class FakeDynamoDBClient:
+    def __init__(self, existing_items=None):
+        self.calls = []
+        self.scans = []
+        self.existing_items = existing_items or []
+
+    def scan(self, TableName, Segment, TotalSegments, ExclusiveStartKey=None, **projection):
+        self.scans.append(projection)
+        return self._page(self.existing_items if Segment == 0 else [], projection)
+
+    @staticmethod
+    def _page(items, projection):
+        serializer = TypeSerializer()
+        names = set(projection.get("ExpressionAttributeNames", {}).values())
+        return {
+            "Items": [
+                {k: serializer.serialize(v) for k, v in item.items() if not names or k in names} for item in items
+            ]
+        }
+
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity):
+        self.calls.append(RequestItems)
+        return {"UnprocessedItems": {}, "ConsumedCapacity": []}
+
+    def written_usernames(self, table_name):
+        return [
+            request["PutRequest"]["Item"]["username"]["S"]
+            for call in self.calls
+            for request in call[table_name]
+            if "PutRequest" in request
+        ]
+
+    def deleted_usernames(self, table_name):
+        return [
+            request["DeleteRequest"]["Key"]["username"]["S"]
+            for call in self.calls
+            for request in call[table_name]
+            if "DeleteRequest" in request
+        ]
+
 
 class TestUploadPlayersData:
     def test_uploads_all_players(self):
-        mock_dynamodb = MagicMock()
-        mock_table = MagicMock()
-        mock_batch_writer = MagicMock()
-        mock_dynamodb.Table.return_value = mock_table
-        mock_table.batch_writer.return_value.__enter__ = MagicMock(return_value=mock_batch_writer)
-        mock_table.batch_writer.return_value.__exit__ = MagicMock(return_value=False)
+        client = FakeDynamoDBClient()
 
         players_data = [
             {
@@ -199,36 +281,254 @@ class TestUploadPlayersData:
             },
         ]
 
-        upload_players_data(players_data, "users", dynamodb_resource=mock_dynamodb)
+        stats = upload_players_data(players_data, "users", workers=1, client_factory=lambda: client)
 
-        mock_dynamodb.Table.assert_called_once_with("users")
-        assert mock_batch_writer.put_item.call_count == 2
-        mock_batch_writer.put_item.assert_any_call(Item=players_data[0])
-        mock_batch_writer.put_item.assert_any_call(Item=players_data[1])
+        assert stats.items == 2
+        assert sorted(client.written_usernames("users")) == ["player1", "player2"]
+        item = client.calls[0]["users"][1]["PutRequest"]["Item"]
+        assert item["dnis"] == {"L": [{"S": "22222222J"}, {"S": "X1234567A"}]}
 
     def test_uploads_empty_list(self):
-        mock_dynamodb = MagicMock()
-        mock_table = MagicMock()
-        mock_batch_writer = MagicMock()
-        mock_dynamodb.Table.return_value = mock_table
-        mock_table.batch_writer.return_value.__enter__ = MagicMock(return_value=mock_batch_writer)
-        mock_table.batch_writer.return_value.__exit__ = MagicMock(return_value=False)
+        client = FakeDynamoDBClient()
 
-        upload_players_data([], "users", dynamodb_resource=mock_dynamodb)
+        stats = upload_players_data([], "users", client_factory=lambda: client)
 
-        mock_batch_writer.put_item.assert_not_called()
+        assert stats.items == 0
+        assert client.calls == []
 
     def test_uses_correct_table_name(self):
-        mock_dynamodb = MagicMock()
-        mock_table = MagicMock()
-        mock_batch_writer = MagicMock()
-        mock_dynamodb.Table.return_value = mock_table
-        mock_table.batch_writer.return_value.__enter__ = MagicMock(return_value=mock_batch_writer)
-        mock_table.batch_writer.return_value.__exit__ = MagicMock(return_value=False)
+        client = FakeDynamoDBClient()
+
+        upload_players_data(
+            [{"username": "player1", "dnis": [], "photos": []}], "my_custom_table", client_factory=lambda: client
+        )
+
+        assert list(client.calls[0]) == ["my_custom_table"]
+
+    def test_uploads_from_generator(self):
+        client = FakeDynamoDBClient()
+
+        players_data = ({"username": f"player{i}", "dnis": [], "photos": []} for i in range(60))
+
+        stats = upload_players_data(players_data, "users", workers=3, client_factory=lambda: client)
+
+        assert stats.items == 60
+        assert sorted(client.written_usernames("users")) == sorted(f"player{i}" for i in range(60))
+
+    def test_checkpoint_is_cleared_after_upload(self, tmp_path):
+        client = FakeDynamoDBClient()
+        path = tmp_path / "cp.json"
+        checkpoint = UploadCheckpoint(str(path), "hash")
+        players_data = [{"username": f"player{i}", "dnis": [], "photos": []} for i in range(30)]
+
+        upload_players_data(players_data, "users", client_factory=lambda: client, checkpoint=checkpoint)
+
+        assert not path.exists()
+
+
+class TestPreservedAttributes:
+    def test_full_upload_keeps_the_derivatives_of_current_items(self):
+        derivatives = {"p1/001.png": {"source_etag": "e", "thumbnail": {"key": "thumbnails/p1/001.webp"}}}
+        client = FakeDynamoDBClient(
+            existing_items=[{"username": "p1", "dnis": ["1A"], "photos": ["p1/001.png"], "derivatives": derivatives}]
+        )
+        players_data = [
+            {"username": "p1", "dnis": ["1B"], "photos": ["p1/001.png"]},
+            {"username": "p2", "dnis": ["2A"], "photos": ["p2/001.png"]},
+        ]
+
+        upload_players_data(
+            with_preserved_attributes(players_data, "users", workers=1, client_factory=lambda: client),
+            "users",
+            workers=1,
+            client_factory=lambda: client,
+        )
+
+        written = {
+            request["PutRequest"]["Item"]["username"]["S"]: request["PutRequest"]["Item"]
+            for call in client.calls
+            for request in call["users"]
+        }
+        assert written["p1"]["derivatives"] == TypeSerializer().serialize(derivatives)
+        assert written["p1"]["dnis"] == {"L": [{"S": "1B"}]}
+        assert "derivatives" not in written["p2"]
+        # Only the preserved attributes are read
+        assert client.scans[0]["ExpressionAttributeNames"] == {"#a0": "username", "#a1": "derivatives"}
+
+
+class TestSyncPlayersData:
+    existing_items = [
+        {"username": "same", "dnis": ["1A"], "photos": ["same/001.png"]},
+        {"username": "changed", "dnis": ["2A"], "photos": ["changed/001.png"]},
+        {"username": "gone", "dnis": ["3A"], "photos": ["gone/001.png"]},
+    ]
+    players_data = [
+        {"username": "same", "dnis": ["1A"], "photos": ["same/001.png"]},
+        {"username": "changed", "dnis": ["2B"], "photos": ["changed/001.png"]},
+        {"username": "new", "dnis": ["4A"], "photos": ["new/001.png"]},
+    ]
+
+    def test_writes_only_new_and_changed(self):
+        client = FakeDynamoDBClient(existing_items=self.existing_items)
+
+        plan = sync_players_data(self.players_data, "users", workers=2, client_factory=lambda: client)
+
+        assert plan.unchanged == 1
+        assert sorted(client.written_usernames("users")) == ["changed", "new"]
+        assert client.deleted_usernames("users") == []
+
+    def test_deletes_removed_when_requested(self):
+        client = FakeDynamoDBClient(existing_items=self.existing_items)
+
+        sync_players_data(self.players_data, "users", delete_removed=True, client_factory=lambda: client)
+
+        assert client.deleted_usernames("users") == ["gone"]
+
+    def test_dry_run_does_not_write(self):
+        client = FakeDynamoDBClient(existing_items=self.existing_items)
+
+        plan = sync_players_data(
+            self.players_data, "users", delete_removed=True, dry_run=True, client_factory=lambda: client
+        )
+
+        assert client.calls == []
+        assert plan.summary() == "1 new, 1 changed, 1 removed, 1 unchanged"
+
+
+class FakeTablesClient(FakeDynamoDBClient):
+    """Serves the items of each table by name."""
+
+    def __init__(self, tables):
+        super().__init__()
+        self.tables = tables
+
+    def scan(self, TableName, Segment, TotalSegments, ExclusiveStartKey=None, **projection):
+        self.scans.append(projection)
+        return self._page(self.tables.get(TableName, []) if Segment == 0 else [], projection)
+
+    def index_requests(self, kind):
+        return sorted(
+            (request[kind][attribute]["dni"]["S"], request[kind][attribute]["username"]["S"])
+            for call in self.calls
+            for request in call.get("dni_index", [])
+            for attribute in (("Item",) if kind == "PutRequest" else ("Key",))
+            if kind in request
+        )
+
+
+class TestDniIndex:
+    def test_uploads_an_entry_per_distinct_dni(self):
+        client = FakeTablesClient({})
+        players_data = [
+            {"username": "child1", "dnis": ["1A", "9T", "1A"]},
+            {"username": "child2", "dnis": ["2A", "9T"]},
+        ]
+        tracker = DniIndexTracker()
+        upload_players_data(tracker.track(players_data), "users", client_factory=lambda: client)
+        stats = upload_dni_index(tracker.items, "dni_index", client_factory=lambda: client)
+
+        assert stats.items == 4
+        assert client.index_requests("PutRequest") == [
+            ("1A", "child1"),
+            ("2A", "child2"),
+            ("9T", "child1"),
+            ("9T", "child2"),
+        ]
+
+    def test_sync_writes_and_deletes_only_the_differences(self):
+        client = FakeTablesClient(
+            {
+                "users": [
+                    {"username": "child1", "dnis": ["1A", "9T"]},
+                    {"username": "child2", "dnis": ["2A", "8T"]},
+                    {"username": "gone", "dnis": ["3A"]},
+                    {"username": "kept", "dnis": ["4A"]},
+                ],
+                "dni_index": [
+                    {"dni": "1A", "username": "child1"},
+                    {"dni": "9T", "username": "child1"},
+                    {"dni": "2A", "username": "child2"},
+                    {"dni": "8T", "username": "child2"},
+                    {"dni": "3A", "username": "gone"},
+                    {"dni": "4A", "username": "kept"},
+                ],
+            }
+        )
+        players_data = [
+            {"username": "child1", "dnis": ["1A", "9T"]},
+            {"username": "child2", "dnis": ["2A", "9T"]},
+        ]
+
+        sync_players_data(
+            players_data, "users", delete_removed=True, client_factory=lambda: client, dni_index_table="dni_index"
+        )
+
+        assert client.index_requests("PutRequest") == [("9T", "child2")]
+        # kept is removed from the users table as well, gone is not in the input either
+        assert client.index_requests("DeleteRequest") == [("3A", "gone"), ("4A", "kept"), ("8T", "child2")]
+
+    def test_sync_dry_run_does_not_write_the_index(self):
+        client = FakeTablesClient({"users": [], "dni_index": []})
+
+        sync_players_data(
+            [{"username": "child1", "dnis": ["1A"]}],
+            "users",
+            dry_run=True,
+            client_factory=lambda: client,
+            dni_index_table="dni_index",
+        )
+
+        assert client.calls == []
+
+
+class TestReportCapacity:
+    def test_reports_without_aws(self, monkeypatch):
+        monkeypatch.setattr("boto3.session.Session", None)
+        players_data = ({"username": f"player{i}", "dnis": ["1A"], "photos": ["a.png"]} for i in range(26))
+
+        plan = report_capacity(players_data, write_rate=13)
+
+        assert plan.items == 26
+        assert plan.batch_calls == 2
+        assert plan.estimated_seconds(13) == 2.0
+
+
+class TestParseArgs:
+    def test_defaults(self):
+        args = parse_args([])
+
+        assert args.sync is False
+        assert args.delete_removed is False
+        assert args.dry_run is False
+
+    def test_sync_flags(self):
+        args = parse_args(["--sync", "--delete-removed", "--dry-run"])
+
+        assert args.sync and args.delete_removed and args.dry_run
+
+    def test_photo_bucket_defaults_to_environment(self, monkeypatch):
+        monkeypatch.setenv("CBTC_CONTENT_BUCKET_NAME", "content-bucket")
+
+        args = parse_args(["--require-photos"])
+
+        assert args.photo_bucket == "content-bucket"
+        assert args.require_photos is True
+
+    def test_write_rate(self):
+        assert parse_args(["--dry-run", "--write-rate", "250"]).write_rate == 250.0
+
+    def test_dni_index_table(self, monkeypatch):
+        assert parse_args([]).dni_index_table == "dni_index"
+        assert parse_args(["--no-dni-index"]).no_dni_index is True
+        monkeypatch.setenv("CBTC_DNI_INDEX_TABLE_NAME", "family")
+        assert parse_args([]).dni_index_table == "family"
 
-        upload_players_data([], "my_custom_table", dynamodb_resource=mock_dynamodb)
+    def test_resume_flag(self):
+        assert parse_args(["--resume"]).resume is True
 
-        mock_dynamodb.Table.assert_called_once_with("my_custom_table")
+    def test_resume_cannot_be_combined_with_sync(self):
+        with pytest.raises(SystemExit):
+            parse_args(["--resume", "--sync"])
 
 
 class TestDniColumns:
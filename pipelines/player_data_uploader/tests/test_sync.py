@@ -0,0 +1,120 @@
+import threading
+
+from boto3.dynamodb.types import TypeSerializer
+from src.sync import SyncPlan, compute_sync_plan, scan_table
+
+serializer = TypeSerializer()
+
+
+def serialize(item: dict) -> dict:
+    return {k: serializer.serialize(v) for k, v in item.items()}
+
+
+class StubScanClient:
+    """Serves each scan segment in pages of `page_size` items."""
+
+    def __init__(self, items: list[dict], page_size: int = 2):
+        self.items = items
+        self.page_size = page_size
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def scan(self, TableName, Segment, TotalSegments, ExclusiveStartKey=None, **projection):
+        with self._lock:
+            self.calls.append((Segment, ExclusiveStartKey))
+            self.projection = projection
+
+        segment_items = [item for i, item in enumerate(self.items) if i % TotalSegments == Segment]
+        start = int(ExclusiveStartKey["offset"]["N"]) if ExclusiveStartKey else 0
+        page = segment_items[start : start + self.page_size]
+        if projection:
+            projected = [
+                projection["ExpressionAttributeNames"][name] for name in projection["ProjectionExpression"].split(", ")
+            ]
+            page = [{name: item[name] for name in projected if name in item} for item in page]
+
+        response = {"Items": [serialize(item) for item in page]}
+        if start + self.page_size < len(segment_items):
+            response["LastEvaluatedKey"] = {"offset": {"N": str(start + self.page_size)}}
+        return response
+
+
+class TestScanTable:
+    def test_reads_all_segments_and_pages(self):
+        items = [{"username": f"player{i}", "dnis": [f"{i}A"]} for i in range(11)]
+        client = StubScanClient(items)
+
+        result = scan_table("users", segments=3, client_factory=lambda: client)
+
+        assert sorted(result) == sorted(f"player{i}" for i in range(11))
+        assert result["player4"] == {"username": "player4", "dnis": ["4A"]}
+        assert {segment for segment, _ in client.calls} == {0, 1, 2}
+        assert any(start_key is not None for _, start_key in client.calls)
+
+    def test_projects_the_keys_of_tables_with_a_sort_key(self):
+        items = [{"dni": f"{i}A", "username": f"player{i}", "updated_by": "uploader"} for i in range(5)]
+        client = StubScanClient(items)
+
+        result = scan_table(
+            "dni_index",
+            segments=2,
+            client_factory=lambda: client,
+            partition_key="dni",
+            sort_key="username",
+            attributes=("updated_by",),
+        )
+
+        assert result[("3A", "player3")] == {"dni": "3A", "username": "player3", "updated_by": "uploader"}
+        assert len(result) == 5
+        assert client.projection["ExpressionAttributeNames"] == {"#a0": "dni", "#a1": "username", "#a2": "updated_by"}
+
+    def test_empty_table(self):
+        result = scan_table("users", segments=2, client_factory=lambda: StubScanClient([]))
+
+        assert result == {}
+
+
+class TestComputeSyncPlan:
+    def test_classifies_new_changed_and_unchanged(self):
+        current = {
+            "same": {"username": "same", "dnis": ["1A"], "photos": ["same/001.png"]},
+            "changed": {"username": "changed", "dnis": ["2A"], "photos": ["changed/001.png"]},
+        }
+        players = [
+            {"username": "same", "dnis": ["1A"], "photos": ["same/001.png"]},
+            {"username": "changed", "dnis": ["2A", "2B"], "photos": ["changed/001.png"]},
+            {"username": "new", "dnis": ["3A"], "photos": ["new/001.png"]},
+        ]
+
+        plan = compute_sync_plan(players, current)
+
+        assert [p["username"] for p in plan.new] == ["new"]
+        assert [p["username"] for p in plan.changed] == ["changed"]
+        assert plan.unchanged == 1
+        assert plan.removed == []
+
+    def test_removed_only_listed_when_requested(self):
+        current = {"gone": {"username": "gone", "dnis": []}}
+
+        assert compute_sync_plan([], current).removed == []
+        assert compute_sync_plan([], current, delete_removed=True).removed == ["gone"]
+
+    def test_extra_attributes_do_not_count_as_changes(self):
+        current = {"player1": {"username": "player1", "dnis": ["1A"], "derivatives": {"web": "x"}}}
+
+        plan = compute_sync_plan([{"username": "player1", "dnis": ["1A"]}], current)
+
+        assert plan.unchanged == 1
+
+    def test_changed_items_keep_extra_attributes(self):
+        current = {"player1": {"username": "player1", "dnis": ["1A"], "derivatives": {"web": "x"}}}
+
+        plan = compute_sync_plan([{"username": "player1", "dnis": ["1B"]}], current)
+
+        assert plan.changed == [{"username": "player1", "dnis": ["1B"], "derivatives": {"web": "x"}}]
+
+    def test_summary(self):
+        plan = SyncPlan(new=[{}], changed=[{}, {}], removed=["a"], unchanged=5)
+
+        assert plan.summary() == "1 new, 2 changed, 1 removed, 5 unchanged"
+        assert len(plan.to_put) == 3
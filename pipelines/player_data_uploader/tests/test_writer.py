@@ -0,0 +1,232 @@
+import threading
+
+import pytest
+from botocore.exceptions import ClientError
+from src.checkpoint import UploadCheckpoint
+from src.writer import MAX_BATCH_SIZE, AdaptiveConcurrency, BatchWriteError, ParallelBatchWriter
+
+
+def make_items(count: int) -> list[dict]:
+    return [{"username": f"player{i}", "dnis": [f"{i:08d}A"], "photos": [f"player{i}/001.png"]} for i in range(count)]
+
+
+def throttling_error() -> ClientError:
+    return ClientError(
+        {"Error": {"Code": "ProvisionedThroughputExceededException", "Message": "Slow down"}}, "BatchWriteItem"
+    )
+
+
+class StubDynamoDBClient:
+    """Local stand-in for the low-level client, scripted with one outcome per call.
+
+    Each outcome is either an exception to raise, the number of requests to
+    return as unprocessed, or None to accept the whole batch.
+    """
+
+    def __init__(self, outcomes=None, capacity_per_item: float = 1.0):
+        self.outcomes = list(outcomes or [])
+        self.capacity_per_item = capacity_per_item
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity):
+        with self._lock:
+            self.calls.append(RequestItems)
+            outcome = self.outcomes.pop(0) if self.outcomes else None
+
+        if isinstance(outcome, Exception):
+            raise outcome
+
+        ((table_name, requests),) = RequestItems.items()
+        unprocessed = requests[: outcome or 0]
+        processed = len(requests) - len(unprocessed)
+        return {
+            "UnprocessedItems": {table_name: unprocessed} if unprocessed else {},
+            "ConsumedCapacity": [{"TableName": table_name, "CapacityUnits": processed * self.capacity_per_item}],
+        }
+
+    def written_usernames(self) -> list[str]:
+        return [request["PutRequest"]["Item"]["username"]["S"] for call in self.calls for request in call["users"]]
+
+
+def make_writer(client, workers: int = 1, **kwargs) -> ParallelBatchWriter:
+    return ParallelBatchWriter("users", workers=workers, client_factory=lambda: client, sleep=lambda _: None, **kwargs)
+
+
+class TestParallelBatchWriter:
+    def test_splits_items_in_batches_of_25(self):
+        client = StubDynamoDBClient()
+
+        stats = make_writer(client).write(make_items(60))
+
+        assert [len(call["users"]) for call in client.calls] == [MAX_BATCH_SIZE, MAX_BATCH_SIZE, 10]
+        assert stats.items == 60
+        assert stats.batches == 3
+
+    def test_serialises_items_for_low_level_client(self):
+        client = StubDynamoDBClient()
+
+        make_writer(client).write(make_items(1))
+
+        assert client.calls[0]["users"][0]["PutRequest"]["Item"] == {
+            "username": {"S": "player0"},
+            "dnis": {"L": [{"S": "00000000A"}]},
+            "photos": {"L": [{"S": "player0/001.png"}]},
+        }
+
+    def test_duplicate_keys_in_a_batch_keep_last_item(self):
+        client = StubDynamoDBClient()
+        items = [{"username": "player1", "dnis": ["old"]}, {"username": "player1", "dnis": ["new"]}]
+
+        stats = make_writer(client).write(items)
+
+        assert stats.items == 1
+        assert client.calls[0]["users"][0]["PutRequest"]["Item"]["dnis"] == {"L": [{"S": "new"}]}
+
+    def test_retries_unprocessed_items(self):
+        client = StubDynamoDBClient(outcomes=[5, 2])
+
+        stats = make_writer(client).write(make_items(10))
+
+        assert [len(call["users"]) for call in client.calls] == [10, 5, 2]
+        assert stats.items == 10
+        assert stats.retries == 2
+
+    def test_retries_throttling_errors(self):
+        client = StubDynamoDBClient(outcomes=[throttling_error()])
+
+        stats = make_writer(client).write(make_items(3))
+
+        assert len(client.calls) == 2
+        assert stats.items == 3
+        assert stats.retries == 1
+
+    def test_raises_on_non_throttling_errors(self):
+        error = ClientError({"Error": {"Code": "ValidationException", "Message": "Bad"}}, "BatchWriteItem")
+        client = StubDynamoDBClient(outcomes=[error])
+
+        with pytest.raises(ClientError):
+            make_writer(client).write(make_items(3))
+
+    def test_gives_up_after_max_retries(self):
+        client = StubDynamoDBClient(outcomes=[throttling_error()] * 4)
+
+        with pytest.raises(BatchWriteError):
+            make_writer(client, max_retries=3).write(make_items(3))
+
+        assert len(client.calls) == 4
+
+    def test_backoff_grows_between_retries(self):
+        client = StubDynamoDBClient(outcomes=[throttling_error()] * 3)
+        delays = []
+        writer = ParallelBatchWriter(
+            "users", workers=1, client_factory=lambda: client, sleep=delays.append, base_delay=1.0, max_delay=3.0
+        )
+
+        writer.write(make_items(1))
+
+        assert len(delays) == 3
+        assert all(0 <= delay <= 3.0 for delay in delays)
+
+    def test_reports_consumed_capacity(self):
+        client = StubDynamoDBClient(capacity_per_item=1.5)
+
+        stats = make_writer(client).write(make_items(30))
+
+        assert stats.consumed_wcu == pytest.approx(45.0)
+
+    def test_each_worker_uses_its_own_client(self):
+        clients = []
+
+        def client_factory():
+            client = StubDynamoDBClient()
+            clients.append(client)
+            return client
+
+        writer = ParallelBatchWriter("users", workers=3, client_factory=client_factory)
+        stats = writer.write(make_items(200))
+
+        assert len(clients) == 3
+        assert stats.items == 200
+        assert sorted(u for c in clients for u in c.written_usernames()) == sorted(f"player{i}" for i in range(200))
+
+    def test_throttling_reduces_concurrency(self):
+        client = StubDynamoDBClient(outcomes=[throttling_error()])
+        writer = make_writer(client, workers=4)
+
+        writer.write(make_items(1))
+
+        assert writer.concurrency.limit == 2
+
+    def test_deletes_by_partition_key(self):
+        client = StubDynamoDBClient()
+
+        stats = make_writer(client).delete(["player1", "player2"])
+
+        assert client.calls[0]["users"] == [
+            {"DeleteRequest": {"Key": {"username": {"S": "player1"}}}},
+            {"DeleteRequest": {"Key": {"username": {"S": "player2"}}}},
+        ]
+        assert stats.items == 2
+
+    def test_composite_keys(self):
+        client = StubDynamoDBClient()
+        writer = make_writer(client, partition_key="dni", sort_key="username")
+
+        writer.write([{"dni": "1A", "username": "player1"}, {"dni": "1A", "username": "player2"}])
+        writer.delete([("1A", "player1")])
+
+        # Items sharing the partition key are not deduplicated
+        assert len(client.calls[0]["users"]) == 2
+        assert client.calls[1]["users"] == [
+            {"DeleteRequest": {"Key": {"dni": {"S": "1A"}, "username": {"S": "player1"}}}}
+        ]
+
+    def test_records_written_batches_in_checkpoint(self, tmp_path):
+        client = StubDynamoDBClient()
+        checkpoint = UploadCheckpoint(str(tmp_path / "cp.json"), "hash")
+
+        make_writer(client, workers=2).write(make_items(60), checkpoint=checkpoint)
+
+        assert checkpoint.committed == 3
+
+    def test_resume_skips_acknowledged_batches(self, tmp_path):
+        path = str(tmp_path / "cp.json")
+        error = ClientError({"Error": {"Code": "ExpiredTokenException", "Message": "Expired"}}, "BatchWriteItem")
+        failing_client = StubDynamoDBClient(outcomes=[None, error])
+
+        with pytest.raises(ClientError):
+            make_writer(failing_client).write(make_items(60), checkpoint=UploadCheckpoint(path, "hash"))
+
+        client = StubDynamoDBClient()
+        stats = make_writer(client).write(make_items(60), checkpoint=UploadCheckpoint.load(path, "hash"))
+
+        assert stats.skipped_batches == 1
+        assert stats.items == 35
+        assert client.written_usernames() == [f"player{i}" for i in range(25, 60)]
+
+    def test_rejects_invalid_worker_count(self):
+        with pytest.raises(ValueError):
+            ParallelBatchWriter("users", workers=0)
+
+
+class TestAdaptiveConcurrency:
+    def test_halves_on_throttle_down_to_one(self):
+        concurrency = AdaptiveConcurrency(maximum=8)
+
+        for _ in range(5):
+            concurrency.on_throttle()
+
+        assert concurrency.limit == 1
+
+    def test_grows_back_after_successes(self):
+        concurrency = AdaptiveConcurrency(maximum=4, increase_after=2)
+        concurrency.on_throttle()
+
+        for _ in range(2):
+            concurrency.on_success()
+        assert concurrency.limit == 3
+
+        for _ in range(10):
+            concurrency.on_success()
+        assert concurrency.limit == 4
@@ -34,6 +34,13 @@ mkdir -p "$DIST_DIR"
 echo "📋 Copying source code..."
 cp -r src/* "$DIST_DIR/"
 
+# Copy the shared libraries the handlers import
+echo "📚 Copying shared libraries..."
+cp -r ../../libs/observability "$DIST_DIR/"
+rm -rf "$DIST_DIR/observability/tests"
+cp -r ../../libs/userstore "$DIST_DIR/"
+rm -rf "$DIST_DIR/userstore/tests"
+
 # Install dependencies if requirements.txt exists
 if [ -f "requirements.txt" ]; then
     echo "📥 Installing dependencies..."
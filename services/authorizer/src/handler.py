@@ -6,20 +6,38 @@ containing DNI:Name pairs and validating against a DynamoDB users table.
 """
 
 import base64
-import logging
+import functools
 import os
 from typing import Any
 
 import boto3
 from botocore.exceptions import ClientError
+from observability import Tracer, current_metrics, current_trace_id, get_logger, metered, start_invocation, traced
+from userstore import UserRecord, UserStore
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = get_logger("authorizer")
+tracer = Tracer("authorizer")
 
 USERS_TABLE_NAME = os.environ.get("USERS_TABLE_NAME", "users")
 
+# Username looked up by warm-up invocations to open the DynamoDB connection
+WARMUP_USERNAME = "__warmup__"
 
-def get_user_from_dynamodb(username: str) -> dict[str, Any] | None:
+# The authorizer only matches the DNI, so GetItem reads nothing else of the user
+USER_ATTRIBUTES = ("dnis",)
+
+
+@functools.cache
+def get_user_store() -> UserStore:
+    """
+    Get the users table on the low-level client, created once per container so warm connections are reused.
+
+    Created lazily to avoid issues during testing.
+    """
+    return UserStore(boto3.client("dynamodb"), USERS_TABLE_NAME)
+
+
+def get_user_from_dynamodb(username: str) -> UserRecord | None:
     """
     Retrieve user from DynamoDB users table.
 
@@ -27,19 +45,39 @@ def get_user_from_dynamodb(username: str) -> dict[str, Any] | None:
         username: The username to look up
 
     Returns:
-        User item if found, None otherwise
+        User record with its DNIs if found, None otherwise
     """
+    metrics = current_metrics()
+    metrics.add("DynamoDBCalls")
     try:
-        # Initialize DynamoDB client lazily to avoid issues during testing
-        dynamodb = boto3.resource("dynamodb")
-        users_table = dynamodb.Table(USERS_TABLE_NAME)
-        response = users_table.get_item(Key={"username": username})
-        return response.get("Item")
+        store = get_user_store()
+        with metrics.timer("DynamoDB"), tracer.span("dynamodb.GetItem", table=store.name):
+            return store.get(username, USER_ATTRIBUTES)
     except ClientError as e:
-        logger.error(f"Error fetching user from DynamoDB: {e}")
+        logger.error("Error fetching user from DynamoDB: %s", e)
         return None
 
 
+def allowed_resource(method_arn: str) -> str:
+    """
+    Widen a method ARN to every method of its API stage.
+
+    API Gateway caches the policy per token, so allowing only the requested
+    method would deny the other content routes, such as the POST starting an
+    archive job, until the cache expires.
+
+    Args:
+        method_arn: ARN of the method being accessed, e.g. arn:...:api-id/stage/GET/content
+
+    Returns:
+        ARN covering the methods of the stage, or the method ARN if it cannot be parsed
+    """
+    parts = method_arn.split("/")
+    if len(parts) < 3:
+        return method_arn
+    return f"{parts[0]}/{parts[1]}/*/*"
+
+
 def generate_policy(
     principal_id: str, effect: str, resource: str, context: dict[str, str] | None = None
 ) -> dict[str, Any]:
@@ -72,9 +110,56 @@ def generate_policy(
     if context:
         policy["context"] = context
 
+    current_metrics().set_property("Effect", effect)
     return policy
 
 
+def get_authorization_header(event: dict[str, Any]) -> str | None:
+    """
+    Get the Authorization header of a REQUEST authorizer event, or the token of a TOKEN one.
+
+    Args:
+        event: Lambda event payload
+
+    Returns:
+        Authorization header value, None if missing
+    """
+    if event.get("authorizationToken"):
+        return event["authorizationToken"]
+    for header, value in (event.get("headers") or {}).items():
+        if header.lower() == "authorization":
+            return value
+    return None
+
+
+def is_warmup_event(event: dict[str, Any]) -> bool:
+    """
+    Check whether the invocation comes from the warm-up schedule rather than API Gateway.
+
+    Args:
+        event: Lambda event payload
+
+    Returns:
+        True for warm-up events
+    """
+    return event.get("warmup") is True or event.get("source") == "aws.events"
+
+
+def warm_up() -> dict[str, Any]:
+    """
+    Build the DynamoDB client and open its connection ahead of the first authorization.
+
+    Returns:
+        Warm-up summary
+    """
+    current_metrics().set_property("Warmup", True)
+    get_user_from_dynamodb(WARMUP_USERNAME)
+    logger.info("Warmed up")
+    return {"warmup": True}
+
+
+@metered("authorizer", (("DynamoDBCalls", "Count"),))
+@traced(tracer, "authorizer.request")
 def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
     """
     Lambda authorizer handler function.
@@ -85,17 +170,24 @@ def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
     3. Looking up user in DynamoDB
     4. Validating DNI is in user's dnis list
 
+    Every invocation emits its metrics in EMF and is traced under its API
+    Gateway request ID, passed on as the traceId of the authorizer context.
+
     Args:
         event: Lambda event payload containing authorization header
         context: Lambda context object
 
     Returns:
-        IAM policy document (Allow or Deny)
+        IAM policy document (Allow or Deny), or a warm-up summary for warm-up events
     """
+    start_invocation(logger, context, traceId=current_trace_id())
+    if is_warmup_event(event):
+        return warm_up()
+
     method_arn = event.get("methodArn", "")
 
     # Get authorization header
-    auth_header = event.get("authorizationToken")
+    auth_header = get_authorization_header(event)
     if not auth_header:
         logger.warning("Missing authorization header")
         return generate_policy("unknown", "Deny", method_arn)
@@ -110,8 +202,8 @@ def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
 
     try:
         # Decode base64 authorization header
-        decoded_auth = base64.b64decode(auth_header).decode("utf-8")
-        logger.info(f"Decoded authorization: {decoded_auth}")
+        with current_metrics().timer("Decode"):
+            decoded_auth = base64.b64decode(auth_header).decode("utf-8")
 
         # Parse DNI:Name format
         if ":" not in decoded_auth:
@@ -128,28 +220,28 @@ def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
         user = get_user_from_dynamodb(name)
 
         if not user:
-            logger.warning(f"User not found: {name}")
+            logger.warning("User not found: %s", name)
             return generate_policy(name, "Deny", method_arn)
 
         # Validate DNI is in user's dnis list
         user_dnis = user.get("dnis", [])
 
         if dni not in user_dnis:
-            logger.warning(f"DNI {dni} not authorized for user {name}")
+            logger.warning("DNI not authorized for user %s", name)
             return generate_policy(name, "Deny", method_arn)
 
         # Authorization successful
-        logger.info(f"Authorization successful for user {name} with DNI {dni}")
+        logger.info("Authorization successful for user %s", name)
         return generate_policy(
             name,
             "Allow",
-            method_arn,
-            context={"username": name, "dni": dni},
+            allowed_resource(method_arn),
+            context={"username": name, "dni": dni, "traceId": current_trace_id()},
         )
 
     except (base64.binascii.Error, UnicodeDecodeError) as e:
-        logger.error(f"Invalid base64 encoding: {e}")
+        logger.warning("Invalid base64 encoding: %s", e)
         return generate_policy("unknown", "Deny", method_arn)
     except Exception as e:
-        logger.error(f"Unexpected error during authorization: {e}")
+        logger.exception("Unexpected error during authorization: %s", e)
         return generate_policy("unknown", "Deny", method_arn)
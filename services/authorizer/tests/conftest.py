@@ -0,0 +1,15 @@
+"""
+Shared fixtures for the authorizer tests.
+"""
+
+import pytest
+
+from services.authorizer.src import handler
+
+
+@pytest.fixture(autouse=True)
+def fresh_user_store():
+    """Create the user store again in every test, so each test sees its own boto3 mocks."""
+    handler.get_user_store.cache_clear()
+    yield
+    handler.get_user_store.cache_clear()
@@ -3,8 +3,11 @@ Unit tests for Lambda authorizer.
 """
 
 import base64
-from unittest.mock import patch
+import json
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
 
+from services.authorizer.src import handler
 from services.authorizer.src.handler import lambda_handler
 
 
@@ -36,7 +39,10 @@ class TestAuthorizerHandler:
         # Assert
         assert response["principalId"] == "JohnDoe"
         assert response["policyDocument"]["Statement"][0]["Effect"] == "Allow"
-        assert response["policyDocument"]["Statement"][0]["Resource"] == event["methodArn"]
+        assert (
+            response["policyDocument"]["Statement"][0]["Resource"]
+            == "arn:aws:execute-api:us-east-1:123456789012:abcdef123/test/*/*"
+        )
         mock_get_user.assert_called_once_with("JohnDoe")
 
     @patch("services.authorizer.src.handler.get_user_from_dynamodb")
@@ -173,3 +179,104 @@ class TestAuthorizerHandler:
         assert "context" in response
         assert response["context"]["username"] == "JohnDoe"
         assert response["context"]["dni"] == "12345678A"
+
+
+class TestWarmUp:
+    """Tests for warm-up invocations."""
+
+    @patch("boto3.client")
+    def test_warmup_event_opens_connection_without_authorizing(self, mock_boto_client):
+        mock_client = MagicMock()
+        mock_boto_client.return_value = mock_client
+        mock_client.get_item.return_value = {}
+
+        response = lambda_handler({"source": "aws.events", "detail-type": "Scheduled Event"}, {})
+
+        assert response == {"warmup": True}
+        mock_client.get_item.assert_called_once_with(
+            TableName="users",
+            Key={"username": {"S": "__warmup__"}},
+            ProjectionExpression="#a0, #a1",
+            ExpressionAttributeNames={"#a0": "username", "#a1": "dnis"},
+        )
+
+    @patch("boto3.client")
+    def test_client_is_reused_across_invocations(self, mock_boto_client):
+        mock_boto_client.return_value.get_item.return_value = {}
+
+        lambda_handler({"warmup": True}, {})
+        lambda_handler({"warmup": True}, {})
+
+        mock_boto_client.assert_called_once_with("dynamodb")
+
+
+class TestMetrics:
+    """Tests for the EMF metrics of every invocation."""
+
+    @patch("boto3.client")
+    def test_emits_decision_and_dynamodb_calls(self, mock_boto_client, capsys):
+        mock_boto_client.return_value.get_item.return_value = {
+            "Item": {"username": {"S": "JohnDoe"}, "dnis": {"L": [{"S": "12345678A"}]}}
+        }
+        encoded_auth = base64.b64encode(b"12345678A:JohnDoe").decode()
+
+        lambda_handler(
+            {"methodArn": "arn:aws:execute-api:r:1:api/test/GET/content", "authorizationToken": encoded_auth}, {}
+        )
+
+        records = [json.loads(line) for line in capsys.readouterr().out.splitlines() if '"_aws"' in line]
+        assert len(records) == 1
+        record = records[0]
+        assert record["Service"] == "authorizer"
+        assert record["ColdStart"] in ("cold", "warm")
+        assert record["Effect"] == "Allow"
+        assert record["DynamoDBCalls"] == 1
+        assert {"DecodeTime", "DynamoDBTime", "TotalTime"} <= set(record)
+
+
+class TestLogging:
+    """Tests for the structured logs of every invocation."""
+
+    @patch("boto3.client")
+    def test_never_logs_credentials(self, mock_boto_client, capsys):
+        mock_boto_client.return_value.get_item.return_value = {
+            "Item": {"username": {"S": "JohnDoe"}, "dnis": {"L": [{"S": "87654321B"}]}}
+        }
+        encoded_auth = base64.b64encode(b"12345678A:JohnDoe").decode()
+
+        response = lambda_handler({"methodArn": "arn", "authorizationToken": f"Basic {encoded_auth}"}, {})
+
+        assert response["policyDocument"]["Statement"][0]["Effect"] == "Deny"
+        lines = [json.loads(line) for line in capsys.readouterr().out.splitlines() if '"_aws"' not in line]
+        assert [line["message"] for line in lines] == ["DNI not authorized for user JohnDoe"]
+        output = json.dumps(lines)
+        assert "12345678A" not in output and encoded_auth not in output
+
+
+class TestTracing:
+    """Tests for the spans of every invocation."""
+
+    @patch("boto3.client")
+    def test_passes_request_id_as_trace_id(self, mock_boto_client, monkeypatch):
+        spans = []
+        monkeypatch.setattr(handler.tracer, "exporters", [SimpleNamespace(export=spans.append)])
+        mock_boto_client.return_value.get_item.return_value = {
+            "Item": {"username": {"S": "JohnDoe"}, "dnis": {"L": [{"S": "12345678A"}]}}
+        }
+        encoded_auth = base64.b64encode(b"12345678A:JohnDoe").decode()
+        event = {
+            "type": "REQUEST",
+            "methodArn": "arn:aws:execute-api:r:1:api/test/GET/content",
+            "headers": {"authorization": f"Basic {encoded_auth}"},
+            "requestContext": {"requestId": "request-1"},
+        }
+
+        response = lambda_handler(event, {})
+
+        assert response["policyDocument"]["Statement"][0]["Effect"] == "Allow"
+        assert response["context"]["traceId"] == "request-1"
+        assert [(span.name, span.trace_id) for span in spans] == [
+            ("dynamodb.GetItem", "request-1"),
+            ("authorizer.request", "request-1"),
+        ]
+        assert spans[0].parent_id == spans[1].span_id
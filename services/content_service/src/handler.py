@@ -5,17 +5,113 @@ Implements US-004: Retrieve file based on DNI/Nombre authentication.
 """
 
 import base64
+import contextvars
+import functools
+import hashlib
 import io
 import json
-import logging
+import mimetypes
 import os
+import queue
+import random
+import threading
+import time
+import uuid
 import zipfile
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from typing import Any
 
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from observability import (
+    Tracer,
+    current_metrics,
+    current_trace_id,
+    get_logger,
+    metered,
+    start_invocation,
+    traced,
+)
+from photoarchive import archive_key, photos_fingerprint, zip_info
+from userstore import BATCH_GET_MAX_KEYS, DniIndex, UserRecord, UserStore
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+logger = get_logger("content")
+tracer = Tracer("content")
+
+# Query string parameter selecting the photos to download, e.g. ?photos=0,Infantil%20A.png
+PHOTOS_QUERY_PARAMETER = "photos"
+
+# Query string parameter downloading the photos of every player listing the DNI, e.g. ?family=true
+FAMILY_QUERY_PARAMETER = "family"
+
+# Retries of the keys BatchGetItem leaves unprocessed, after a full-jitter exponential backoff
+BATCH_GET_MAX_RETRIES = 5
+BATCH_GET_BASE_DELAY_SECONDS = 0.05
+BATCH_GET_MAX_DELAY_SECONDS = 1.0
+
+# Attributes of the user item each caller reads, so GetItem transfers and decodes nothing else
+CONTENT_ATTRIBUTES = ("photos", "photo_objects")
+PREVIEW_ATTRIBUTES = ("photos", "photo_objects", "derivatives")
+FAMILY_ATTRIBUTES = ("dnis", "photos", "photo_objects")
+
+# Responses are personal, so only the browser cache may store them, for up to an hour
+CACHE_CONTROL = "private, max-age=3600"
+
+# Photos cached in the container's /tmp, shared by every request it serves
+PHOTO_CACHE_DIR = os.environ.get("PHOTO_CACHE_DIR", "/tmp/photo-cache")
+PHOTO_CACHE_MAX_BYTES = int(os.environ.get("PHOTO_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# S3 calls fail fast instead of holding the request until the Lambda timeout
+S3_CONNECT_TIMEOUT = 2
+S3_READ_TIMEOUT = 5
+S3_MAX_ATTEMPTS = 2
+
+# Time kept at the end of the invocation to zip, encode and return the response
+RESPONSE_MARGIN_SECONDS = 2.0
+
+# Request budget when the Lambda context does not tell the remaining time
+DEFAULT_REQUEST_BUDGET_SECONDS = 25.0
+
+# A duplicate GET is sent for photos slower than this percentile of recent GETs
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_DELAY_SECONDS = 0.25
+HEDGE_DEFAULT_DELAY_SECONDS = 1.0
+HEDGE_MIN_SAMPLES = 20
+
+# Threads running the S3 GETs of every request the container serves at the same time
+S3_GET_THREADS = int(os.environ.get("S3_GET_THREADS", 8))
+
+# Shared photos prefetched into the photo cache by warm-up invocations
+WARMUP_PREFETCH_PREFIX = "Teams/"
+
+# Username looked up by warm-up invocations to open the DynamoDB connection
+WARMUP_USERNAME = "__warmup__"
+
+# Lifetime of the presigned thumbnail URLs returned by the preview
+PREVIEW_URL_EXPIRES_IN = 300
+
+# Archive jobs keep their status, and their archive once built, under this prefix
+JOBS_PREFIX = "jobs/"
+
+# Archives of jobs are uploaded in parts of this size, the only part of them held in memory
+JOB_UPLOAD_PART_BYTES = 8 * 1024 * 1024
+
+# The status of a running job is saved every this many photos
+JOB_PROGRESS_INTERVAL = 10
+
+# Lifetime of the presigned archive URLs returned once a job succeeds
+JOB_DOWNLOAD_URL_EXPIRES_IN = 3600
+
+# Metrics reported by every invocation, even when nothing was recorded
+METRIC_COUNTERS = (
+    ("DynamoDBCalls", "Count"),
+    ("S3Gets", "Count"),
+    ("S3BytesFetched", "Bytes"),
+    ("PhotosSkipped", "Count"),
+)
 
 
 def _get_env_var(name: str) -> str:
@@ -25,14 +121,785 @@ def _get_env_var(name: str) -> str:
     return val
 
 
+def _parse_credentials(auth_header: str) -> tuple[str, str]:
+    """
+    Decode a "Basic" Authorization header into its DNI and name.
+
+    Raises an exception when the header is not base64 encoded "DNI:Name".
+    """
+    if auth_header.startswith("Basic "):
+        encoded_auth = auth_header.split(" ")[1]
+    else:
+        encoded_auth = auth_header
+
+    decoded_bytes = base64.b64decode(encoded_auth)
+    decoded_auth = decoded_bytes.decode("utf-8")
+    dni, name = decoded_auth.split(":", 1)
+    return dni, name
+
+
+@functools.cache
+def _dynamodb_client():
+    """
+    Low-level DynamoDB client, created once per container so warm connections are reused across invocations.
+    """
+    return boto3.client("dynamodb")
+
+
+@functools.cache
+def _user_store() -> UserStore:
+    """
+    Users table, read on the low-level client with per-caller projections.
+    """
+    return UserStore(_dynamodb_client(), _get_env_var("USERS_TABLE_NAME"))
+
+
+@functools.cache
+def _dni_index() -> DniIndex:
+    """
+    DNI inverted index written by the player data uploader, keyed by dni and username.
+    """
+    return DniIndex(_dynamodb_client(), _get_env_var("DNI_INDEX_TABLE_NAME"))
+
+
+@functools.cache
+def _s3_client():
+    """
+    S3 client, created once per container so warm connections are reused across invocations.
+    """
+    return boto3.client(
+        "s3",
+        config=Config(
+            connect_timeout=S3_CONNECT_TIMEOUT,
+            read_timeout=S3_READ_TIMEOUT,
+            retries={"max_attempts": S3_MAX_ATTEMPTS, "mode": "standard"},
+        ),
+    )
+
+
+def _get_user_item(name: str, attributes: tuple[str, ...] = CONTENT_ATTRIBUTES) -> UserRecord | None:
+    metrics = current_metrics()
+    metrics.add("DynamoDBCalls")
+    store = _user_store()
+    with metrics.timer("DynamoDB"), tracer.span("dynamodb.GetItem", table=store.name):
+        return store.get(name, attributes)
+
+
+def _get_family_items(dni: str) -> list[UserRecord]:
+    """
+    Records of every user listing the DNI, such as all the children of a tutor, sorted by username.
+
+    A Query of the DNI index finds the usernames and BatchGetItem reads their
+    records. Index entries of a DNI since removed from the user are ignored.
+    """
+    metrics = current_metrics()
+    index = _dni_index()
+    usernames: list[str] = []
+    start_key = None
+    while True:
+        metrics.add("DynamoDBCalls")
+        with metrics.timer("DynamoDB"), tracer.span("dynamodb.Query", table=index.name):
+            page, start_key = index.usernames(dni, start_key)
+        usernames += page
+        if not start_key:
+            break
+
+    store = _user_store()
+    pending = list(dict.fromkeys(usernames))
+    records: list[UserRecord] = []
+    retries = 0
+    while pending:
+        unprocessed: list[str] = []
+        for start in range(0, len(pending), BATCH_GET_MAX_KEYS):
+            keys = pending[start : start + BATCH_GET_MAX_KEYS]
+            metrics.add("DynamoDBCalls")
+            with metrics.timer("DynamoDB"), tracer.span("dynamodb.BatchGetItem", table=store.name, keys=len(keys)):
+                found, left = store.batch_get(keys, FAMILY_ATTRIBUTES)
+            records += found
+            unprocessed += left
+        pending = unprocessed
+        if pending:
+            retries += 1
+            if retries > BATCH_GET_MAX_RETRIES:
+                raise RuntimeError(f"Could not read {len(pending)} users of the family")
+            time.sleep(_batch_get_backoff(retries))
+
+    return sorted((record for record in records if dni in (record.dnis or [])), key=lambda record: record.username)
+
+
+def _batch_get_backoff(retry: int) -> float:
+    """
+    Full-jitter exponential backoff delay before the given retry of unprocessed keys.
+    """
+    return random.uniform(0, min(BATCH_GET_MAX_DELAY_SECONDS, BATCH_GET_BASE_DELAY_SECONDS * 2**retry))
+
+
+def _family_item(items: list[UserRecord]) -> tuple[dict[str, Any] | None, list[str] | None]:
+    """
+    Merge the items of a family into one, with the archive name of every photo in a folder per child.
+
+    Returns None and None when no child has photos.
+    """
+    photos, arcnames, photo_objects = [], [], {}
+    for item in items:
+        for s3_key in item.get("photos") or []:
+            photos.append(s3_key)
+            arcnames.append(f"{item.username}/{s3_key.split('/')[-1]}")
+        photo_objects.update(item.get("photo_objects") or {})
+    if not photos:
+        return None, None
+    return {"photos": photos, "photo_objects": photo_objects}, arcnames
+
+
+def _s3_get_object(s3_client, **kwargs) -> dict:
+    """
+    GET an S3 object, counting the request in the invocation metrics.
+    """
+    current_metrics().add("S3Gets")
+    with tracer.span("s3.GetObject", key=kwargs["Key"], range=kwargs.get("Range")):
+        return s3_client.get_object(**kwargs)
+
+
+def _read_body(s3_response: dict) -> bytes:
+    """
+    Read the body of an S3 response, counting the bytes fetched in the invocation metrics.
+    """
+    with tracer.span("s3.GetObject.Body") as span:
+        content = s3_response["Body"].read()
+        span.set_attribute("bytes", len(content))
+    current_metrics().add("S3BytesFetched", len(content), "Bytes")
+    return content
+
+
+def _is_warmup_event(event: dict[str, Any]) -> bool:
+    """
+    Whether the invocation comes from the warm-up schedule rather than API Gateway.
+    """
+    return event.get("warmup") is True or event.get("source") == "aws.events"
+
+
+def _warm_up(prefetch: bool = True) -> dict[str, Any]:
+    """
+    Build the clients, open their connections and prefetch the shared photos into the photo cache.
+    """
+    current_metrics().set_property("Warmup", True)
+    _get_user_item(WARMUP_USERNAME, ("photos",))
+
+    bucket_name = _get_env_var("CONTENT_BUCKET_NAME")
+    s3_client = _s3_client()
+    prefetched = 0
+    prefetched_bytes = 0
+
+    if prefetch and _photo_cache.max_bytes > 0:
+        with tracer.span("s3.ListObjectsV2", prefix=WARMUP_PREFETCH_PREFIX):
+            paginator = s3_client.get_paginator("list_objects_v2")
+            pages = list(paginator.paginate(Bucket=bucket_name, Prefix=WARMUP_PREFETCH_PREFIX))
+        for page in pages:
+            for obj in page.get("Contents", []):
+                if obj["Key"].endswith("/"):
+                    continue
+                if prefetched_bytes + obj["Size"] > _photo_cache.max_bytes:
+                    break
+                _read_photo(s3_client, bucket_name, obj["Key"], obj["ETag"].strip('"'))
+                prefetched += 1
+                prefetched_bytes += obj["Size"]
+    else:
+        with tracer.span("s3.HeadBucket"):
+            s3_client.head_bucket(Bucket=bucket_name)
+
+    logger.info("Warmed up, prefetched %d photos (%d bytes)", prefetched, prefetched_bytes)
+    return {"warmup": True, "prefetched": prefetched}
+
+
+def _select_photos(photos: list[str], selection: str | None) -> list[str]:
+    """
+    Select the requested photos from the stored list, keeping its order.
+
+    The selection is a comma separated list of photo indexes, zero based as in
+    the preview, or filenames. Every photo is selected when it is empty.
+    Raises ValueError when a photo is not in the stored list.
+    """
+    if not selection:
+        return photos
+
+    filenames = [s3_key.split("/")[-1] for s3_key in photos]
+    selected = set()
+    for token in (token.strip() for token in selection.split(",")):
+        if not token:
+            continue
+        if token.isdigit():
+            if int(token) >= len(photos):
+                raise ValueError(f"Photo index out of range: {token}")
+            selected.add(int(token))
+        elif token in filenames:
+            selected.add(filenames.index(token))
+        else:
+            raise ValueError(f"Unknown photo: {token}")
+
+    if not selected:
+        raise ValueError("No photos selected")
+    return [photos[index] for index in sorted(selected)]
+
+
+def _get_photo(
+    s3_client, bucket_name: str, s3_key: str, byte_range=None, etag: str | None = None
+) -> tuple[bytes, str, tuple[int, int, int] | None] | None:
+    """
+    Retrieve a single photo, or the requested byte range of it, with its content type.
+
+    Whole photos with a known ETag are read through the container cache.
+    Returns None when the photo does not exist.
+    """
+    guessed_type = mimetypes.guess_type(s3_key)[0] or "application/octet-stream"
+    try:
+        if byte_range is None:
+            return _read_photo(s3_client, bucket_name, s3_key, etag), guessed_type, None
+        s3_response, served_range = _get_object(s3_client, bucket_name, s3_key, byte_range)
+    except s3_client.exceptions.NoSuchKey:
+        logger.warning("Photo not found in S3: %s", s3_key)
+        return None
+    return _read_body(s3_response), s3_response.get("ContentType") or guessed_type, served_range
+
+
+class RangeNotSatisfiableError(Exception):
+    """Raised when a requested byte range starts beyond the end of the content."""
+
+    def __init__(self, size: int):
+        super().__init__(f"Range not satisfiable for {size} bytes")
+        self.size = size
+
+
+def _parse_range(range_header: str | None) -> tuple[int | None, int | None] | None:
+    """
+    Parse a single "bytes" range into its first and last positions.
+
+    A suffix range "bytes=-N" is returned as (None, N). Returns None when the
+    header is missing, malformed or asks for several ranges, so it is ignored.
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.strip().partition("=")
+    first, separator, last = spec.strip().partition("-")
+    if unit.strip().lower() != "bytes" or not separator or "," in spec:
+        return None
+    if not first:
+        return (None, int(last)) if last.isdigit() else None
+    if not first.isdigit() or (last and not last.isdigit()):
+        return None
+    if last and int(last) < int(first):
+        return None
+    return int(first), int(last) if last else None
+
+
+def _resolve_range(byte_range: tuple[int | None, int | None], size: int) -> tuple[int, int]:
+    """
+    Resolve a parsed range against the content size into inclusive positions.
+    """
+    first, last = byte_range
+    if first is None:
+        if last == 0 or size == 0:
+            raise RangeNotSatisfiableError(size)
+        return max(size - last, 0), size - 1
+    if first >= size:
+        raise RangeNotSatisfiableError(size)
+    return first, size - 1 if last is None else min(last, size - 1)
+
+
+def _get_object(s3_client, bucket_name: str, s3_key: str, byte_range=None) -> tuple[dict, tuple[int, int, int] | None]:
+    """
+    Get an object, only the requested byte range of it when given.
+
+    Returns the S3 response and the (first, last, size) positions served for a range.
+    """
+    if byte_range is None:
+        return _s3_get_object(s3_client, Bucket=bucket_name, Key=s3_key), None
+
+    first, last = byte_range
+    try:
+        s3_response = _s3_get_object(
+            s3_client,
+            Bucket=bucket_name,
+            Key=s3_key,
+            Range=f"bytes={'' if first is None else first}-{'' if last is None else last}",
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "InvalidRange":
+            raise
+        size = e.response["Error"].get("ActualObjectSize")
+        if size is None:
+            with tracer.span("s3.HeadObject", key=s3_key):
+                size = s3_client.head_object(Bucket=bucket_name, Key=s3_key)["ContentLength"]
+        raise RangeNotSatisfiableError(int(size)) from e
+
+    # ContentRange is "bytes first-last/size"
+    positions, _, size = s3_response["ContentRange"].split(" ")[-1].partition("/")
+    first, _, last = positions.partition("-")
+    return s3_response, (int(first), int(last), int(size))
+
+
+def _get_header(event: dict[str, Any], name: str) -> str | None:
+    """
+    Look up a request header ignoring its case, as HTTP/2 clients send them lowercased.
+    """
+    headers = event.get("headers") or {}
+    for header, value in headers.items():
+        if header.lower() == name.lower():
+            return value
+    return None
+
+
+def _content_etag(
+    s3_keys: list[str], item: dict[str, Any], single_photo: bool, arcnames: list[str] | None = None
+) -> str | None:
+    """
+    Strong ETag of the content response, from the selected photos, their S3 ETags and their archive names.
+
+    Returns None when the S3 ETag of any selected photo is unknown.
+    """
+    fingerprint = photos_fingerprint(s3_keys, item.get("photo_objects"))
+    if fingerprint is None:
+        return None
+    representation = "photo" if single_photo else "zip"
+    if arcnames is not None:
+        representation += ":" + "\n".join(arcnames)
+    digest = hashlib.sha256(f"{representation}:{fingerprint}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches the ETag, using the weak comparison of RFC 9110.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (candidate.strip().removeprefix("W/") for candidate in if_none_match.split(","))
+    return etag.removeprefix("W/") in candidates
+
+
+def _get_prebuilt_archive(
+    s3_client, bucket_name: str, username: str, item: dict[str, Any], byte_range=None
+) -> tuple[bytes, tuple[int, int, int] | None] | None:
+    """
+    Retrieve the archive prebuilt for the user's current photo set, or the requested byte range of it.
+
+    Archives are stored under a key derived from the photo ETags, so a stale
+    archive is never served after the photos change. Returns None when there
+    is no prebuilt archive.
+    """
+    fingerprint = photos_fingerprint(item["photos"], item.get("photo_objects"))
+    if fingerprint is None:
+        return None
+
+    prebuilt_key = archive_key(username, fingerprint)
+    try:
+        s3_response, served_range = _get_object(s3_client, bucket_name, prebuilt_key, byte_range)
+        return _read_body(s3_response), served_range
+    except s3_client.exceptions.NoSuchKey:
+        logger.debug("No prebuilt archive, building it")
+    except RangeNotSatisfiableError:
+        raise
+    except Exception as e:
+        logger.warning("Error retrieving prebuilt archive %s: %s, building it", prebuilt_key, e)
+    return None
+
+
+class PhotoCache:
+    """
+    Content addressed cache of S3 objects on local disk, keyed by bucket, key and ETag.
+
+    Entries are evicted least recently used first to stay within the byte
+    budget. The index lives in memory, so the cache is rebuilt from the files
+    left by previous invocations when the container starts.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        if max_bytes > 0 and os.path.isdir(directory):
+            paths = (os.path.join(directory, name) for name in os.listdir(directory) if not name.endswith(".tmp"))
+            for path in sorted(paths, key=os.path.getatime):
+                size = os.path.getsize(path)
+                self._entries[os.path.basename(path)] = size
+                self._size += size
+            self._evict()
+
+    @staticmethod
+    def _entry_name(bucket_name: str, s3_key: str, etag: str) -> str:
+        return hashlib.sha256(f"{bucket_name}/{s3_key}/{etag}".encode()).hexdigest()
+
+    def get(self, bucket_name: str, s3_key: str, etag: str) -> bytes | None:
+        name = self._entry_name(bucket_name, s3_key, etag)
+        with self._lock:
+            if name not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+        try:
+            with open(os.path.join(self.directory, name), "rb") as f:
+                content = f.read()
+        except OSError:
+            with self._lock:
+                self._size -= self._entries.pop(name, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += len(content)
+        return content
+
+    def put(self, bucket_name: str, s3_key: str, etag: str, content: bytes) -> None:
+        if len(content) > self.max_bytes:
+            return
+        name = self._entry_name(bucket_name, s3_key, etag)
+        path = os.path.join(self.directory, name)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not cache %s: %s", s3_key, e)
+            return
+        with self._lock:
+            self._size += len(content) - self._entries.pop(name, 0)
+            self._entries[name] = len(content)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def log_metrics(self) -> None:
+        logger.info(
+            "Photo cache: %d hits, %d misses, %d bytes saved, %d entries, %d of %d bytes used",
+            self.hits,
+            self.misses,
+            self.bytes_saved,
+            len(self._entries),
+            self._size,
+            self.max_bytes,
+        )
+
+
+_photo_cache = PhotoCache(PHOTO_CACHE_DIR, PHOTO_CACHE_MAX_BYTES)
+
+
+class DeadlineExceededError(Exception):
+    """Raised when a photo cannot be read before the request deadline."""
+
+
+class LatencyTracker:
+    """
+    Rolling window of recent S3 GET latencies, giving the delay after which a GET is hedged.
+    """
+
+    def __init__(self, window: int = 200):
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self) -> float:
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return HEDGE_DEFAULT_DELAY_SECONDS
+            latencies = sorted(self._latencies)
+        percentile = latencies[min(int(len(latencies) * HEDGE_PERCENTILE), len(latencies) - 1)]
+        return max(percentile, HEDGE_MIN_DELAY_SECONDS)
+
+
+_s3_latency = LatencyTracker()
+
+
+class GetPool:
+    """
+    Threads of the S3 GETs, kept across invocations and shared by concurrent requests.
+
+    Counts the GETs submitted and not finished yet, so a hedge is only sent
+    when a thread is free to run it rather than queued behind other GETs.
+    GETs dropped at the deadline finish in the background, bounded by the S3
+    read timeout.
+    """
+
+    def __init__(self, threads: int):
+        self.threads = threads
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="s3-get")
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def has_free_thread(self) -> bool:
+        with self._lock:
+            return self._in_flight < self.threads
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        Run fn on a thread of the pool in the caller's context, so its spans are children of the current one.
+        """
+        with self._lock:
+            self._in_flight += 1
+        future = self._executor.submit(contextvars.copy_context().run, fn, *args)
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+
+_s3_pool = GetPool(S3_GET_THREADS)
+
+
+def _request_deadline(context: Any) -> float:
+    """
+    Monotonic time by which every photo must be read, leaving time to send the response.
+    """
+    get_remaining_time = getattr(context, "get_remaining_time_in_millis", None)
+    budget = get_remaining_time() / 1000 if get_remaining_time else DEFAULT_REQUEST_BUDGET_SECONDS
+    return time.monotonic() + budget - RESPONSE_MARGIN_SECONDS
+
+
+def _timed_get(s3_client, bucket_name: str, s3_key: str, running: threading.Event | None = None) -> bytes:
+    if running is not None:
+        running.set()
+    started = time.monotonic()
+    content = _read_body(_s3_get_object(s3_client, Bucket=bucket_name, Key=s3_key))
+    _s3_latency.record(time.monotonic() - started)
+    return content
+
+
+def _hedged_get(s3_client, bucket_name: str, s3_key: str, deadline: float) -> bytes:
+    """
+    GET a photo, sending a duplicate GET when the first one is slower than usual.
+
+    The first GET to succeed wins. The hedge delay counts from when the GET
+    starts running, not while it waits for a thread, and no duplicate is sent
+    when every thread is busy, as it would only queue behind other GETs.
+    Raises DeadlineExceededError when neither succeeds before the deadline.
+    """
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceededError(s3_key)
+
+    running = threading.Event()
+    first = _s3_pool.submit(_timed_get, s3_client, bucket_name, s3_key, running)
+    if not running.wait(remaining):
+        first.cancel()
+        raise DeadlineExceededError(s3_key)
+
+    pending = {first}
+    done, pending = wait(pending, timeout=min(_s3_latency.hedge_delay(), max(deadline - time.monotonic(), 0)))
+    if not done and deadline - time.monotonic() > 0:
+        if _s3_pool.has_free_thread():
+            logger.debug("Hedging slow GET of %s", s3_key)
+            pending.add(_s3_pool.submit(_timed_get, s3_client, bucket_name, s3_key))
+        else:
+            logger.debug("Not hedging slow GET of %s, every S3 thread is busy", s3_key)
+
+    error = None
+    while True:
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        remaining = deadline - time.monotonic()
+        if not pending or remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+
+    if error is not None and not pending:
+        raise error
+    raise DeadlineExceededError(s3_key)
+
+
+def _read_photo(s3_client, bucket_name: str, s3_key: str, etag: str | None, deadline: float | None = None) -> bytes:
+    """
+    Read a photo from the container cache when its ETag is known, from S3 otherwise.
+
+    With a deadline the S3 GET is hedged and abandoned when the deadline passes.
+    """
+    use_cache = etag is not None and _photo_cache.max_bytes > 0
+    content = _photo_cache.get(bucket_name, s3_key, etag) if use_cache else None
+    if content is not None:
+        current_metrics().add("PhotoCacheHits")
+        current_metrics().add("PhotoCacheBytesSaved", len(content), "Bytes")
+        return content
+    if use_cache:
+        current_metrics().add("PhotoCacheMisses")
+
+    if deadline is None:
+        content = _read_body(_s3_get_object(s3_client, Bucket=bucket_name, Key=s3_key))
+    else:
+        content = _hedged_get(s3_client, bucket_name, s3_key, deadline)
+    if use_cache:
+        _photo_cache.put(bucket_name, s3_key, etag, content)
+    return content
+
+
+def _write_photos(
+    zip_file: zipfile.ZipFile,
+    s3_client,
+    bucket_name: str,
+    s3_keys: list[str],
+    photo_objects: dict | None = None,
+    deadline: float | None = None,
+    progress: Callable[[int], None] | None = None,
+    arcnames: list[str] | None = None,
+) -> int:
+    """
+    Add the photos to a zip file, skipping the ones that cannot be retrieved.
+
+    Photos are named after their S3 key, or their entry in arcnames. Photos
+    whose ETag is known from photo_objects are read through the container
+    cache. Photos not read by the deadline are left out. progress is called
+    with the number of photos processed after each one. Returns the number of
+    photos added.
+    """
+    metrics = current_metrics()
+    photo_objects = photo_objects or {}
+    omitted = []
+    successful_photos = 0
+
+    # Iterate through all photos
+    for processed, s3_key in enumerate(s3_keys, start=1):
+        try:
+            logger.debug("Retrieving photo: %s", s3_key)
+            etag = photo_objects.get(s3_key, {}).get("etag")
+            with metrics.timer("S3"):
+                photo_content = _read_photo(s3_client, bucket_name, s3_key, etag, deadline)
+
+            # Extract filename from S3 key (e.g., "TestUser/photo1.jpg" -> "photo1.jpg")
+            filename = arcnames[processed - 1] if arcnames else s3_key.split("/")[-1]
+
+            # Add photo to zip file
+            with metrics.timer("Zip"):
+                zip_file.writestr(zip_info(filename), photo_content)
+            successful_photos += 1
+            logger.debug("Added photo: %s", filename)
+
+        except DeadlineExceededError:
+            omitted.append(s3_key)
+        except s3_client.exceptions.NoSuchKey:
+            logger.warning("Photo not found in S3, skipping: %s", s3_key)
+        except Exception as e:
+            logger.error("Error retrieving photo %s: %s, skipping", s3_key, e)
+        finally:
+            if progress is not None:
+                progress(processed)
+
+    metrics.put("PhotosSkipped", len(s3_keys) - successful_photos)
+    if omitted:
+        logger.warning("Request deadline reached, omitting %d photos from the archive: %s", len(omitted), omitted)
+    return successful_photos
+
+
+def _build_zip_archive(
+    s3_client,
+    bucket_name: str,
+    s3_keys: list[str],
+    photo_objects: dict | None = None,
+    deadline: float | None = None,
+    arcnames: list[str] | None = None,
+) -> tuple[bytes, bool] | None:
+    """
+    Build a zip file with the photos, skipping the ones that cannot be retrieved.
+
+    Photos are named after their S3 key, or their entry in arcnames. Photos
+    whose ETag is known from photo_objects are read through the container
+    cache. Photos not read by the deadline are left out, so the archive still
+    ships in time. Returns the archive and whether every photo was included,
+    or None when no photo could be retrieved.
+    """
+    logger.debug("Creating ZIP file with %d photos", len(s3_keys))
+    zip_buffer = io.BytesIO()
+
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_STORED) as zip_file:
+        successful_photos = _write_photos(
+            zip_file, s3_client, bucket_name, s3_keys, photo_objects, deadline, arcnames=arcnames
+        )
+
+    # Check if any photos were successfully retrieved
+    if successful_photos == 0:
+        logger.warning("No photos were successfully retrieved for user")
+        return None
+
+    logger.info("Retrieved %d out of %d photos", successful_photos, len(s3_keys))
+    return zip_buffer.getvalue(), successful_photos == len(s3_keys)
+
+
+def _content_response(
+    app_url: str,
+    content: bytes,
+    content_type: str,
+    content_disposition: str,
+    cache_headers: dict[str, str],
+    served_range: tuple[int, int, int] | None,
+) -> dict[str, Any]:
+    """
+    Build a binary response, partial when a byte range was served.
+    """
+    headers = {
+        "Access-Control-Allow-Origin": app_url,
+        "Content-Type": content_type,
+        "Content-Disposition": content_disposition,
+        **cache_headers,
+    }
+    status_code = 200
+    if served_range is not None:
+        first, last, size = served_range
+        headers["Content-Range"] = f"bytes {first}-{last}/{size}"
+        status_code = 206
+
+    logger.debug("Base64 encoding content")
+    metrics = current_metrics()
+    with metrics.timer("Encode"):
+        body = base64.b64encode(content).decode("utf-8")
+    metrics.put("ResponseBytes", len(body), "Bytes")
+    return {
+        "statusCode": status_code,
+        "headers": headers,
+        "body": body,
+        "isBase64Encoded": True,
+    }
+
+
+@metered("content", METRIC_COUNTERS)
+@traced(tracer, "content.request")
 def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
     """
     Lambda handler for retrieving content.
 
     Expects 'Authorization' header with base64 encoded "DNI:Name".
-    Returns a zip file containing the user's photos.
+    Returns a zip file containing the user's photos, or the photos selected
+    by the 'photos' query string parameter. A single selected photo is
+    returned as is, without zipping it. With 'family=true' the archive holds
+    the photos of every player listing the DNI, in a folder per player. Responses with an ETag honour
+    'Range' and 'If-Range' with partial responses, so downloads can resume.
+    Warm-up events only warm the container up, skipping authentication.
+    Every invocation emits its metrics in EMF and is traced under its API Gateway request ID.
     """
-    logger.info(f"Received event: {json.dumps(event)}")
+    start_invocation(logger, context, traceId=current_trace_id())
+    if _is_warmup_event(event):
+        return _warm_up()
+
+    metrics = current_metrics()
+    deadline = _request_deadline(context)
 
     # CORS headers
     app_url = _get_env_var("CBTC_APP_URL")
@@ -42,7 +909,7 @@ def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
     }
 
     try:
-        logger.error("Parsing Authorization header")
+        logger.debug("Parsing Authorization header")
         auth_header = event.get("headers", {}).get("Authorization")
         if not auth_header:
             return {
@@ -52,15 +919,9 @@ def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
             }
 
         try:
-            logger.error("Decoding Authorization header")
-            if auth_header.startswith("Basic "):
-                encoded_auth = auth_header.split(" ")[1]
-            else:
-                encoded_auth = auth_header
-
-            decoded_bytes = base64.b64decode(encoded_auth)
-            decoded_auth = decoded_bytes.decode("utf-8")
-            dni, name = decoded_auth.split(":", 1)
+            logger.debug("Decoding Authorization header")
+            with metrics.timer("Auth"):
+                dni, name = _parse_credentials(auth_header)
         except Exception:
             return {
                 "statusCode": 400,
@@ -68,13 +929,24 @@ def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
                 "body": json.dumps({"message": "Invalid Authorization header format", "success": False}),
             }
 
-        table_name = _get_env_var("USERS_TABLE_NAME")
-        dynamodb = boto3.resource("dynamodb")
-        table = dynamodb.Table(table_name)
+        query = event.get("queryStringParameters") or {}
+        family = (query.get(FAMILY_QUERY_PARAMETER) or "").strip().lower() in ("1", "true")
+        selection = (query.get(PHOTOS_QUERY_PARAMETER) or "").strip()
+        if family and selection:
+            return {
+                "statusCode": 400,
+                "headers": headers,
+                "body": json.dumps({"message": "Photos cannot be selected in family downloads", "success": False}),
+            }
 
-        logger.error("Verifying user exists and contains photos")
-        response = table.get_item(Key={"username": name})
-        item = response.get("Item")
+        # The authorizer has checked the DNI against the player, so it identifies the family
+        logger.debug("Verifying user exists and contains photos")
+        arcnames = None
+        if family:
+            metrics.set_property("Family", True)
+            item, arcnames = _family_item(_get_family_items(dni))
+        else:
+            item = _get_user_item(name)
 
         if not item or "photos" not in item or not item["photos"]:
             return {
@@ -83,72 +955,586 @@ def lambda_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
                 "body": json.dumps({"message": "No photos associated to this player", "success": False}),
             }
 
-        logger.info("Retrieving photos from S3")
-        s3_keys = item["photos"]
+        try:
+            s3_keys = _select_photos(item["photos"], selection)
+        except ValueError as e:
+            return {
+                "statusCode": 400,
+                "headers": headers,
+                "body": json.dumps({"message": f"Invalid photo selection: {e}", "success": False}),
+            }
+
+        single_photo = bool(selection) and len(s3_keys) == 1
+        cache_headers = {"Cache-Control": CACHE_CONTROL, "Vary": "Authorization"}
+        etag = _content_etag(s3_keys, item, single_photo, arcnames)
+        if etag is not None:
+            cache_headers["ETag"] = etag
+            if _etag_matches(_get_header(event, "If-None-Match"), etag):
+                logger.info("Content not modified")
+                return {
+                    "statusCode": 304,
+                    "headers": {"Access-Control-Allow-Origin": app_url, **cache_headers},
+                    "body": "",
+                }
+
+        # Ranges are only served for content with an ETag, the validator of resumed downloads
+        byte_range = None
+        if etag is not None:
+            cache_headers["Accept-Ranges"] = "bytes"
+            if_range = _get_header(event, "If-Range")
+            if if_range is None or if_range.strip() == etag:
+                byte_range = _parse_range(_get_header(event, "Range"))
 
+        logger.debug("Retrieving photos from S3")
         bucket_name = _get_env_var("CONTENT_BUCKET_NAME")
-        s3_client = boto3.client("s3")
-
-        logger.info(f"Creating ZIP file with {len(s3_keys)} photos")
-        zip_buffer = io.BytesIO()
-        successful_photos = 0
-
-        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-            # Iterate through all photos
-            for s3_key in s3_keys:
-                try:
-                    logger.info(f"Retrieving photo: {s3_key}")
-                    s3_response = s3_client.get_object(Bucket=bucket_name, Key=s3_key)
-                    photo_content = s3_response["Body"].read()
-
-                    # Extract filename from S3 key (e.g., "TestUser/photo1.jpg" -> "photo1.jpg")
-                    filename = s3_key.split("/")[-1]
-
-                    # Add photo to zip file
-                    zip_file.writestr(filename, photo_content)
-                    successful_photos += 1
-                    logger.info(f"Successfully added photo: {filename}")
-
-                except s3_client.exceptions.NoSuchKey:
-                    logger.warning(f"Photo not found in S3, skipping: {s3_key}")
-                    continue
-                except Exception as e:
-                    logger.error(f"Error retrieving photo {s3_key}: {str(e)}, skipping")
-                    continue
+        s3_client = _s3_client()
+
+        try:
+            if single_photo:
+                photo_etag = (item.get("photo_objects") or {}).get(s3_keys[0], {}).get("etag")
+                with metrics.timer("S3"):
+                    photo = _get_photo(s3_client, bucket_name, s3_keys[0], byte_range, photo_etag)
+                _photo_cache.log_metrics()
+                if photo is None:
+                    return {
+                        "statusCode": 404,
+                        "headers": headers,
+                        "body": json.dumps({"message": "No photos associated to this player", "success": False}),
+                    }
+
+                photo_content, content_type, served_range = photo
+                filename = s3_keys[0].split("/")[-1]
+                return _content_response(
+                    app_url,
+                    photo_content,
+                    content_type,
+                    f'attachment; filename="{filename}"',
+                    cache_headers,
+                    served_range,
+                )
+
+            archive = None
+            if not family and s3_keys == item["photos"]:
+                with metrics.timer("S3"):
+                    archive = _get_prebuilt_archive(s3_client, bucket_name, name, item, byte_range)
+                if archive is not None:
+                    archive_content, served_range = archive
+                    metrics.put("ArchiveBytes", served_range[2] if served_range else len(archive_content), "Bytes")
+                    metrics.set_property("PrebuiltArchive", True)
+            if archive is None:
+                built = _build_zip_archive(
+                    s3_client, bucket_name, s3_keys, item.get("photo_objects"), deadline, arcnames
+                )
+                _photo_cache.log_metrics()
+                if built is None:
+                    return {
+                        "statusCode": 404,
+                        "headers": headers,
+                        "body": json.dumps({"message": "No photos associated to this player", "success": False}),
+                    }
+
+                zip_content, complete = built
+                metrics.put("ArchiveBytes", len(zip_content), "Bytes")
+                if not complete:
+                    # A partial archive does not match the ETag, so it is neither validated nor resumable
+                    cache_headers = {"Cache-Control": "no-store"}
+                    byte_range = None
 
-        # Check if any photos were successfully retrieved
-        if successful_photos == 0:
-            logger.warning("No photos were successfully retrieved for user")
+                served_range = None
+                if byte_range is not None:
+                    first, last = _resolve_range(byte_range, len(zip_content))
+                    served_range = (first, last, len(zip_content))
+                    zip_content = zip_content[first : last + 1]
+                archive = zip_content, served_range
+
+        except RangeNotSatisfiableError as e:
+            return {
+                "statusCode": 416,
+                "headers": {
+                    "Access-Control-Allow-Origin": app_url,
+                    "Content-Range": f"bytes */{e.size}",
+                    **cache_headers,
+                },
+                "body": "",
+            }
+
+        zip_content, served_range = archive
+        return _content_response(
+            app_url,
+            zip_content,
+            "application/zip",
+            "attachment; filename=cbtc-media-day-2025.zip",
+            cache_headers,
+            served_range,
+        )
+
+    except Exception as e:
+        logger.exception("Error processing request: %s", e)
+        return {
+            "statusCode": 500,
+            "headers": headers,
+            "body": json.dumps({"message": "Internal server error", "success": False, "error": str(e)}),
+        }
+
+
+def _photo_preview(s3_client, bucket_name: str, s3_key: str, item: dict[str, Any]) -> dict[str, Any]:
+    """
+    Describe a photo from the user item, presigning its thumbnail without fetching any object.
+
+    The thumbnail is None until the image derivatives pipeline has generated it.
+    """
+    photo_object = (item.get("photo_objects") or {}).get(s3_key) or {}
+    derivatives = (item.get("derivatives") or {}).get(s3_key) or {}
+    etag = photo_object.get("etag")
+
+    preview = {"name": s3_key.split("/")[-1], "size": photo_object.get("size"), "thumbnail": None}
+
+    thumbnail = derivatives.get("thumbnail")
+    if thumbnail and (etag is None or derivatives.get("source_etag") == etag):
+        preview["thumbnail"] = {
+            "url": s3_client.generate_presigned_url(
+                "get_object",
+                Params={"Bucket": bucket_name, "Key": thumbnail["key"]},
+                ExpiresIn=PREVIEW_URL_EXPIRES_IN,
+            ),
+            "size": thumbnail.get("size"),
+            "width": thumbnail.get("width"),
+            "height": thumbnail.get("height"),
+        }
+    return preview
+
+
+@metered("content-preview", METRIC_COUNTERS)
+@traced(tracer, "content.preview")
+def preview_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
+    """
+    Lambda handler for previewing content.
+
+    Expects 'Authorization' header with base64 encoded "DNI:Name".
+    Returns the user's photos with their sizes and presigned thumbnail URLs,
+    read from the user item only, so no object is fetched from S3.
+    """
+    start_invocation(logger, context, traceId=current_trace_id())
+    if _is_warmup_event(event):
+        return _warm_up(prefetch=False)
+
+    app_url = _get_env_var("CBTC_APP_URL")
+    headers = {
+        "Access-Control-Allow-Origin": app_url,
+        "Content-Type": "application/json",
+    }
+
+    try:
+        auth_header = event.get("headers", {}).get("Authorization")
+        if not auth_header:
+            return {
+                "statusCode": 401,
+                "headers": headers,
+                "body": json.dumps({"message": "Missing Authorization header", "success": False}),
+            }
+
+        try:
+            _, name = _parse_credentials(auth_header)
+        except Exception:
+            return {
+                "statusCode": 400,
+                "headers": headers,
+                "body": json.dumps({"message": "Invalid Authorization header format", "success": False}),
+            }
+
+        item = _get_user_item(name, PREVIEW_ATTRIBUTES)
+        if not item or "photos" not in item or not item["photos"]:
             return {
                 "statusCode": 404,
                 "headers": headers,
                 "body": json.dumps({"message": "No photos associated to this player", "success": False}),
             }
 
-        logger.info(f"Successfully retrieved {successful_photos} out of {len(s3_keys)} photos")
+        bucket_name = _get_env_var("CONTENT_BUCKET_NAME")
+        s3_client = _s3_client()
+        photos = [_photo_preview(s3_client, bucket_name, s3_key, item) for s3_key in item["photos"]]
+
+        return {
+            "statusCode": 200,
+            "headers": headers,
+            "body": json.dumps(
+                {"success": True, "photos": photos, "expiresIn": PREVIEW_URL_EXPIRES_IN},
+                default=int,
+            ),
+        }
+
+    except Exception as e:
+        logger.exception("Error processing preview request: %s", e)
+        return {
+            "statusCode": 500,
+            "headers": headers,
+            "body": json.dumps({"message": "Internal server error", "success": False, "error": str(e)}),
+        }
+
+
+class MultipartUpload(io.RawIOBase):
+    """
+    Write-only stream uploading an S3 object in parts, holding at most one part in memory.
+
+    It cannot seek, so zip files written to it carry data descriptors. The
+    object only appears once complete() is called, abort() discards the parts.
+    """
+
+    def __init__(self, s3_client, bucket_name: str, key: str, part_bytes: int = JOB_UPLOAD_PART_BYTES):
+        super().__init__()
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.key = key
+        self.part_bytes = part_bytes
+        self._buffer = bytearray()
+        self._parts: list[dict[str, Any]] = []
+        self._position = 0
+        with tracer.span("s3.CreateMultipartUpload", key=key):
+            response = s3_client.create_multipart_upload(Bucket=bucket_name, Key=key, ContentType="application/zip")
+        self._upload_id = response["UploadId"]
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        while len(self._buffer) >= self.part_bytes:
+            self._upload_part(bytes(self._buffer[: self.part_bytes]))
+            del self._buffer[: self.part_bytes]
+        return len(data)
+
+    def _upload_part(self, body: bytes) -> None:
+        number = len(self._parts) + 1
+        with tracer.span("s3.UploadPart", key=self.key, part=number, bytes=len(body)):
+            response = self.s3_client.upload_part(
+                Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id, PartNumber=number, Body=body
+            )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": number})
+
+    def complete(self) -> int:
+        """Upload the last part and assemble the object, returning its size."""
+        if self._buffer or not self._parts:
+            self._upload_part(bytes(self._buffer))
+            self._buffer.clear()
+        with tracer.span("s3.CompleteMultipartUpload", key=self.key, parts=len(self._parts)):
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        return self._position
+
+    def abort(self) -> None:
+        try:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=self.key, UploadId=self._upload_id)
+        except Exception as e:
+            logger.warning("Error aborting the upload of %s: %s", self.key, e)
+
+
+def _job_status_key(job_id: str) -> str:
+    return f"{JOBS_PREFIX}{job_id}/status.json"
+
+
+def _job_archive_key(job_id: str) -> str:
+    return f"{JOBS_PREFIX}{job_id}/cbtc-media-day-2025.zip"
+
+
+def _timestamp() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+def _save_job(s3_client, bucket_name: str, job: dict[str, Any]) -> None:
+    job["updatedAt"] = _timestamp()
+    with tracer.span("s3.PutObject", key=_job_status_key(job["jobId"])):
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=_job_status_key(job["jobId"]),
+            Body=json.dumps(job).encode(),
+            ContentType="application/json",
+        )
+
+
+def _load_job(s3_client, bucket_name: str, job_id: str) -> dict[str, Any] | None:
+    """
+    Read the status of a job, None when there is no such job.
+    """
+    try:
+        s3_response = _s3_get_object(s3_client, Bucket=bucket_name, Key=_job_status_key(job_id))
+    except s3_client.exceptions.NoSuchKey:
+        return None
+    return json.loads(_read_body(s3_response))
+
+
+def run_archive_job(job_id: str) -> dict[str, Any] | None:
+    """
+    Build the archive of a job into S3, saving its progress as photos are added.
+
+    The archive is streamed to S3 in parts, so its size is not bound by the
+    memory of the worker nor by the Lambda response limit. A job already
+    finished is left as is, so redelivered messages do not build it again.
+    Returns the final status of the job, None when there is no such job.
+    """
+    bucket_name = _get_env_var("CONTENT_BUCKET_NAME")
+    s3_client = _s3_client()
+    job = _load_job(s3_client, bucket_name, job_id)
+    if job is None:
+        logger.warning("Unknown archive job %s", job_id)
+        return None
+    if job["status"] in ("succeeded", "failed"):
+        logger.info("Archive job %s already %s", job_id, job["status"])
+        return job
+
+    item = _get_user_item(job["username"]) or {}
+    photos = item.get("photos") or []
+    if not photos:
+        job.update(status="failed", error="No photos associated to this player")
+        _save_job(s3_client, bucket_name, job)
+        return job
+
+    job.update(status="running", photos=len(photos), photosDone=0)
+    _save_job(s3_client, bucket_name, job)
+
+    def progress(done: int) -> None:
+        job["photosDone"] = done
+        if done % JOB_PROGRESS_INTERVAL == 0 and done < len(photos):
+            _save_job(s3_client, bucket_name, job)
+
+    upload_key = _job_archive_key(job_id)
+    upload = MultipartUpload(s3_client, bucket_name, upload_key)
+    try:
+        with zipfile.ZipFile(upload, "w", zipfile.ZIP_STORED) as zip_file:
+            added = _write_photos(
+                zip_file, s3_client, bucket_name, photos, item.get("photo_objects"), progress=progress
+            )
+        if added == 0:
+            raise ValueError("No photos could be retrieved")
+        archive_bytes = upload.complete()
+    except Exception as e:
+        logger.exception("Archive job %s failed: %s", job_id, e)
+        upload.abort()
+        job.update(status="failed", error=str(e))
+        _save_job(s3_client, bucket_name, job)
+        return job
+
+    current_metrics().put("ArchiveBytes", archive_bytes, "Bytes")
+    logger.info("Archive job %s built %d out of %d photos, %d bytes", job_id, added, len(photos), archive_bytes)
+    job.update(status="succeeded", photosIncluded=added, archiveKey=upload_key, archiveBytes=archive_bytes, error=None)
+    _save_job(s3_client, bucket_name, job)
+    return job
+
+
+class InProcessJobQueue:
+    """
+    Runs archive jobs one at a time on a thread of the process, standing in for SQS.
+
+    Meant for long lived processes, such as the self-hosted server and tests:
+    a Lambda container is frozen between invocations, and its jobs with it.
+    """
+
+    def __init__(self, worker: Callable[[str], Any] = run_archive_job):
+        self.worker = worker
+        self._jobs: queue.Queue[str] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def send(self, job_id: str) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="archive-jobs", daemon=True)
+                self._thread.start()
+        self._jobs.put(job_id)
+
+    def join(self) -> None:
+        """Wait until every job sent has run."""
+        self._jobs.join()
+
+    def _run(self) -> None:
+        while True:
+            job_id = self._jobs.get()
+            try:
+                self.worker(job_id)
+            except Exception as e:
+                logger.exception("Archive job %s failed: %s", job_id, e)
+            finally:
+                self._jobs.task_done()
+
+
+class SqsJobQueue:
+    """
+    Sends archive jobs to the SQS queue consumed by archive_jobs_handler.
+    """
+
+    def __init__(self, queue_url: str):
+        self.queue_url = queue_url
+        self.sqs_client = boto3.client("sqs")
+
+    def send(self, job_id: str) -> None:
+        with tracer.span("sqs.SendMessage", jobId=job_id):
+            self.sqs_client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps({"jobId": job_id}))
+
+
+@functools.cache
+def _job_queue() -> InProcessJobQueue | SqsJobQueue:
+    """
+    Queue of the archive jobs: the SQS queue in ARCHIVE_JOBS_QUEUE_URL, or a thread of the process without it.
+    """
+    queue_url = os.environ.get("ARCHIVE_JOBS_QUEUE_URL")
+    return SqsJobQueue(queue_url) if queue_url else InProcessJobQueue()
+
+
+def _job_view(s3_client, bucket_name: str, job: dict[str, Any]) -> dict[str, Any]:
+    """
+    Describe a job to its owner, with a presigned download URL once its archive is built.
+    """
+    photos = job.get("photos") or 0
+    view = {
+        "success": True,
+        "jobId": job["jobId"],
+        "status": job["status"],
+        "photos": photos,
+        "photosDone": job.get("photosDone", 0),
+        "progress": round(job.get("photosDone", 0) / photos, 2) if photos else 0.0,
+        "createdAt": job.get("createdAt"),
+        "updatedAt": job.get("updatedAt"),
+    }
+    if job["status"] == "succeeded":
+        view["photosIncluded"] = job.get("photosIncluded")
+        view["archiveBytes"] = job.get("archiveBytes")
+        view["downloadUrl"] = s3_client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": bucket_name,
+                "Key": job["archiveKey"],
+                "ResponseContentDisposition": "attachment; filename=cbtc-media-day-2025.zip",
+            },
+            ExpiresIn=JOB_DOWNLOAD_URL_EXPIRES_IN,
+        )
+        view["expiresIn"] = JOB_DOWNLOAD_URL_EXPIRES_IN
+    elif job["status"] == "failed":
+        view["error"] = job.get("error")
+    return view
+
+
+@metered("content-jobs", METRIC_COUNTERS)
+@traced(tracer, "content.jobs")
+def jobs_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
+    """
+    Lambda handler for asynchronous archive jobs, for photo sets too large to return in a response.
+
+    Expects 'Authorization' header with base64 encoded "DNI:Name".
+    POST /content/jobs enqueues a job building the archive of every photo of
+    the user into S3 and answers 202 with its ID at once. GET
+    /content/jobs/{id} reports its progress and, once built, a presigned
+    download URL. Jobs of other users are not found.
+    """
+    start_invocation(logger, context, traceId=current_trace_id())
+    if _is_warmup_event(event):
+        return _warm_up(prefetch=False)
+
+    app_url = _get_env_var("CBTC_APP_URL")
+    headers = {
+        "Access-Control-Allow-Origin": app_url,
+        "Content-Type": "application/json",
+    }
+
+    try:
+        auth_header = event.get("headers", {}).get("Authorization")
+        if not auth_header:
+            return {
+                "statusCode": 401,
+                "headers": headers,
+                "body": json.dumps({"message": "Missing Authorization header", "success": False}),
+            }
+
+        try:
+            _, name = _parse_credentials(auth_header)
+        except Exception:
+            return {
+                "statusCode": 400,
+                "headers": headers,
+                "body": json.dumps({"message": "Invalid Authorization header format", "success": False}),
+            }
 
-        # Get zip file content
-        zip_buffer.seek(0)
-        zip_content = zip_buffer.read()
+        bucket_name = _get_env_var("CONTENT_BUCKET_NAME")
+        s3_client = _s3_client()
+
+        if event.get("httpMethod") == "POST":
+            item = _get_user_item(name, ("photos",))
+            if not item or "photos" not in item or not item["photos"]:
+                return {
+                    "statusCode": 404,
+                    "headers": headers,
+                    "body": json.dumps({"message": "No photos associated to this player", "success": False}),
+                }
+
+            job = {
+                "jobId": uuid.uuid4().hex,
+                "username": name,
+                "status": "queued",
+                "photos": len(item["photos"]),
+                "photosDone": 0,
+                "traceId": current_trace_id(),
+                "createdAt": _timestamp(),
+            }
+            _save_job(s3_client, bucket_name, job)
+            _job_queue().send(job["jobId"])
+            logger.info("Queued archive job %s of %d photos", job["jobId"], job["photos"])
 
-        logger.info("Base64 encoding ZIP content")
-        b64_content = base64.b64encode(zip_content).decode("utf-8")
+            status_url = f"/content/jobs/{job['jobId']}"
+            return {
+                "statusCode": 202,
+                "headers": {**headers, "Location": status_url},
+                "body": json.dumps(
+                    {"success": True, "jobId": job["jobId"], "status": job["status"], "statusUrl": status_url}
+                ),
+            }
+
+        job_id = (event.get("pathParameters") or {}).get("id") or ""
+        # Job IDs are checked before reaching S3, so no other key can be read through them
+        job = _load_job(s3_client, bucket_name, job_id) if job_id.isalnum() else None
+        if job is None or job.get("username") != name:
+            return {
+                "statusCode": 404,
+                "headers": headers,
+                "body": json.dumps({"message": "Archive job not found", "success": False}),
+            }
 
         return {
             "statusCode": 200,
-            "headers": {
-                "Access-Control-Allow-Origin": app_url,
-                "Content-Type": "application/zip",
-                "Content-Disposition": "attachment; filename=cbtc-media-day-2025.zip",
-            },
-            "body": b64_content,
-            "isBase64Encoded": True,
+            "headers": {**headers, "Cache-Control": "no-store"},
+            "body": json.dumps(_job_view(s3_client, bucket_name, job)),
         }
 
     except Exception as e:
-        logger.error(f"Error processing request: {str(e)}")
+        logger.exception("Error processing archive job request: %s", e)
         return {
             "statusCode": 500,
             "headers": headers,
             "body": json.dumps({"message": "Internal server error", "success": False, "error": str(e)}),
         }
+
+
+@metered("content-archive-jobs", METRIC_COUNTERS)
+@traced(tracer, "content.archive_job")
+def archive_jobs_handler(event: dict[str, Any], context: Any) -> dict[str, Any]:
+    """
+    Lambda handler consuming the archive jobs queue.
+
+    Runs the job of every SQS record. Jobs record their own failures in their
+    status, so only records whose job could not be read or saved are reported
+    as failed items and delivered again.
+    """
+    start_invocation(logger, context, traceId=current_trace_id())
+    failures = []
+    for record in event.get("Records", []):
+        try:
+            run_archive_job(json.loads(record["body"])["jobId"])
+        except Exception as e:
+            logger.exception("Error running archive job of message %s: %s", record.get("messageId"), e)
+            failures.append({"itemIdentifier": record.get("messageId")})
+    return {"batchItemFailures": failures}
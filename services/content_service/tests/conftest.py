@@ -0,0 +1,39 @@
+"""
+Shared fixtures for the content service tests.
+"""
+
+import pytest
+
+from services.content_service.src import handler
+
+
+@pytest.fixture(autouse=True)
+def photo_cache(tmp_path, monkeypatch):
+    """Give every test an empty photo cache of its own."""
+    cache = handler.PhotoCache(str(tmp_path / "photo-cache"), 1024)
+    monkeypatch.setattr(handler, "_photo_cache", cache)
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    """Create the clients again in every test, so each test sees its own boto3 mocks."""
+    handler._dynamodb_client.cache_clear()
+    handler._user_store.cache_clear()
+    handler._dni_index.cache_clear()
+    handler._s3_client.cache_clear()
+    handler._job_queue.cache_clear()
+    yield
+    handler._dynamodb_client.cache_clear()
+    handler._user_store.cache_clear()
+    handler._dni_index.cache_clear()
+    handler._s3_client.cache_clear()
+    handler._job_queue.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def s3_latency(monkeypatch):
+    """Start every test without GET latencies, so hedging uses its default delay."""
+    tracker = handler.LatencyTracker()
+    monkeypatch.setattr(handler, "_s3_latency", tracker)
+    return tracker
@@ -3,13 +3,30 @@ Unit tests for content service handler.
 """
 
 import base64
+import hashlib
+import io
 import json
+import logging
 import os
+import threading
+import time
+import zipfile
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
+import observability.metrics
 import pytest
+from boto3.dynamodb.types import TypeSerializer
+from observability.structured_logging import StdoutHandler
+from userstore import UserRecord
 
-from services.content_service.src.handler import lambda_handler
+from services.content_service.src import handler
+from services.content_service.src.handler import PhotoCache, _parse_range, lambda_handler, preview_handler
+
+
+def get_item_response(item: dict) -> dict:
+    """GetItem response of the low-level DynamoDB client for the user item."""
+    return {"Item": {name: TypeSerializer().serialize(value) for name, value in item.items()}}
 
 
 @pytest.fixture
@@ -29,9 +46,9 @@ def mock_env_vars():
 class TestContentServiceHandler:
     """Unit tests for the Lambda handler."""
 
-    @patch("boto3.resource")
+    @patch.object(handler, "_dynamodb_client")
     @patch("boto3.client")
-    def test_us004_retrieve_file_success(self, mock_boto_client, mock_boto_resource, mock_env_vars):
+    def test_us004_retrieve_file_success(self, mock_boto_client, mock_dynamodb, mock_env_vars):
         """
         US-004: Retrieve file associated with DNI:Nombre.
         """
@@ -44,15 +61,12 @@ class TestContentServiceHandler:
         context = {}
 
         # Mock DynamoDB response with multiple photos
-        mock_dynamo = MagicMock()
-        mock_boto_resource.return_value = mock_dynamo
-        mock_table = MagicMock()
-        mock_dynamo.Table.return_value = mock_table
+        mock_users = mock_dynamodb.return_value
 
         # Expect the handler to construct key as "DNI:Name"
-        mock_table.get_item.return_value = {
-            "Item": {"photos": ["TestUser/photo1.jpg", "TestUser/photo2.jpg", "TestUser/photo3.jpg"]}
-        }
+        mock_users.get_item.return_value = get_item_response(
+            {"photos": ["TestUser/photo1.jpg", "TestUser/photo2.jpg", "TestUser/photo3.jpg"]}
+        )
 
         # Mock S3 response - return different content for each photo
         mock_s3 = MagicMock()
@@ -99,14 +113,19 @@ class TestContentServiceHandler:
             assert zip_file.read("photo2.jpg") == photo_contents["TestUser/photo2.jpg"]
             assert zip_file.read("photo3.jpg") == photo_contents["TestUser/photo3.jpg"]
 
-        # Verify DynamoDB call with colon separator
-        mock_table.get_item.assert_called_with(Key={"username": f"{name}"})
+        # Verify the DynamoDB call reads only the attributes the handler uses
+        mock_users.get_item.assert_called_with(
+            TableName="test-users",
+            Key={"username": {"S": name}},
+            ProjectionExpression="#a0, #a1, #a2",
+            ExpressionAttributeNames={"#a0": "username", "#a1": "photos", "#a2": "photo_objects"},
+        )
 
         # Verify S3 calls for all photos
         assert mock_s3.get_object.call_count == 3
 
-    @patch("boto3.resource")
-    def test_us004_no_photos_found(self, mock_boto_resource, mock_env_vars):
+    @patch.object(handler, "_dynamodb_client")
+    def test_us004_no_photos_found(self, mock_dynamodb, mock_env_vars):
         """
         US-004: Handle no photos found.
         """
@@ -115,13 +134,10 @@ class TestContentServiceHandler:
         event = {"headers": {"Authorization": f"Basic {encoded_auth}"}}
         context = {}
 
-        mock_dynamo = MagicMock()
-        mock_boto_resource.return_value = mock_dynamo
-        mock_table = MagicMock()
-        mock_dynamo.Table.return_value = mock_table
+        mock_users = mock_dynamodb.return_value
 
         # Scenario 1: No item found
-        mock_table.get_item.return_value = {}
+        mock_users.get_item.return_value = {}
 
         response = lambda_handler(event, context)
 
@@ -129,18 +145,15 @@ class TestContentServiceHandler:
         body = json.loads(response["body"])
         assert body["message"] == "No photos associated to this player"
 
-    @patch("boto3.resource")
-    def test_us004_dynamodb_error(self, mock_boto_resource, mock_env_vars):
+    @patch.object(handler, "_dynamodb_client")
+    def test_us004_dynamodb_error(self, mock_dynamodb, mock_env_vars):
         """US-004: Handle DynamoDB error."""
         credentials = "Error:User"
         encoded_auth = base64.b64encode(credentials.encode()).decode()
         event = {"headers": {"Authorization": f"Basic {encoded_auth}"}}
 
-        mock_dynamo = MagicMock()
-        mock_boto_resource.return_value = mock_dynamo
-        mock_table = MagicMock()
-        mock_dynamo.Table.return_value = mock_table
-        mock_table.get_item.side_effect = Exception("DynamoError")
+        mock_users = mock_dynamodb.return_value
+        mock_users.get_item.side_effect = Exception("DynamoError")
 
         response = lambda_handler(event, {})
 
@@ -148,9 +161,9 @@ class TestContentServiceHandler:
         body = json.loads(response["body"])
         assert "Internal server error" in body["message"]
 
-    @patch("boto3.resource")
+    @patch.object(handler, "_dynamodb_client")
     @patch("boto3.client")
-    def test_us004_partial_success_some_photos_missing(self, mock_boto_client, mock_boto_resource, mock_env_vars):
+    def test_us004_partial_success_some_photos_missing(self, mock_boto_client, mock_dynamodb, mock_env_vars):
         """US-004: Handle partial success when some photos are missing from S3."""
         credentials = "12345678A:TestUser"
         encoded_auth = base64.b64encode(credentials.encode()).decode()
@@ -158,13 +171,10 @@ class TestContentServiceHandler:
         context = {}
 
         # Mock DynamoDB with 3 photos
-        mock_dynamo = MagicMock()
-        mock_boto_resource.return_value = mock_dynamo
-        mock_table = MagicMock()
-        mock_dynamo.Table.return_value = mock_table
-        mock_table.get_item.return_value = {
-            "Item": {"photos": ["TestUser/photo1.jpg", "TestUser/photo2.jpg", "TestUser/photo3.jpg"]}
-        }
+        mock_users = mock_dynamodb.return_value
+        mock_users.get_item.return_value = get_item_response(
+            {"photos": ["TestUser/photo1.jpg", "TestUser/photo2.jpg", "TestUser/photo3.jpg"]}
+        )
 
         # Mock S3 - photo2 is missing
         mock_s3 = MagicMock()
@@ -206,9 +216,9 @@ class TestContentServiceHandler:
             assert zip_file.read("photo1.jpg") == photo_contents["TestUser/photo1.jpg"]
             assert zip_file.read("photo3.jpg") == photo_contents["TestUser/photo3.jpg"]
 
-    @patch("boto3.resource")
+    @patch.object(handler, "_dynamodb_client")
     @patch("boto3.client")
-    def test_us004_all_photos_missing(self, mock_boto_client, mock_boto_resource, mock_env_vars):
+    def test_us004_all_photos_missing(self, mock_boto_client, mock_dynamodb, mock_env_vars):
         """US-004: Return 404 when all photos are missing from S3."""
         credentials = "12345678A:TestUser"
         encoded_auth = base64.b64encode(credentials.encode()).decode()
@@ -216,11 +226,8 @@ class TestContentServiceHandler:
         context = {}
 
         # Mock DynamoDB with photos
-        mock_dynamo = MagicMock()
-        mock_boto_resource.return_value = mock_dynamo
-        mock_table = MagicMock()
-        mock_dynamo.Table.return_value = mock_table
-        mock_table.get_item.return_value = {"Item": {"photos": ["TestUser/photo1.jpg", "TestUser/photo2.jpg"]}}
+        mock_users = mock_dynamodb.return_value
+        mock_users.get_item.return_value = get_item_response({"photos": ["TestUser/photo1.jpg", "TestUser/photo2.jpg"]})
 
         # Mock S3 - all photos are missing
         mock_s3 = MagicMock()
@@ -236,9 +243,9 @@ class TestContentServiceHandler:
         body = json.loads(response["body"])
         assert body["message"] == "No photos associated to this player"
 
-    @patch("boto3.resource")
+    @patch.object(handler, "_dynamodb_client")
     @patch("boto3.client")
-    def test_us004_s3_error_handling(self, mock_boto_client, mock_boto_resource, mock_env_vars):
+    def test_us004_s3_error_handling(self, mock_boto_client, mock_dynamodb, mock_env_vars):
         """US-004: Handle S3 errors gracefully and continue processing."""
         credentials = "12345678A:TestUser"
         encoded_auth = base64.b64encode(credentials.encode()).decode()
@@ -246,13 +253,10 @@ class TestContentServiceHandler:
         context = {}
 
         # Mock DynamoDB with 3 photos
-        mock_dynamo = MagicMock()
-        mock_boto_resource.return_value = mock_dynamo
-        mock_table = MagicMock()
-        mock_dynamo.Table.return_value = mock_table
-        mock_table.get_item.return_value = {
-            "Item": {"photos": ["TestUser/photo1.jpg", "TestUser/photo2.jpg", "TestUser/photo3.jpg"]}
-        }
+        mock_users = mock_dynamodb.return_value
+        mock_users.get_item.return_value = get_item_response(
+            {"photos": ["TestUser/photo1.jpg", "TestUser/photo2.jpg", "TestUser/photo3.jpg"]}
+        )
 
         # Mock S3 - photo2 throws generic error
         mock_s3 = MagicMock()
@@ -289,3 +293,1173 @@ class TestContentServiceHandler:
             assert len(zip_file.namelist()) == 2
             assert "photo1.jpg" in zip_file.namelist()
             assert "photo3.jpg" in zip_file.namelist()
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_serves_prebuilt_archive_when_fingerprint_matches(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        """Serve the archive prebuilt for the current photo ETags without fetching any photo."""
+        credentials = "12345678A:TestUser"
+        encoded_auth = base64.b64encode(credentials.encode()).decode()
+        event = {"headers": {"Authorization": f"Basic {encoded_auth}"}}
+
+        photos = ["TestUser/photo1.jpg", "Teams/TeamA.jpg"]
+        photo_objects = {key: {"size": 10, "etag": f"etag-{key}"} for key in photos}
+
+        mock_users = mock_dynamodb.return_value
+        mock_users.get_item.return_value = get_item_response({"photos": photos, "photo_objects": photo_objects})
+
+        mock_s3 = MagicMock()
+        mock_boto_client.return_value = mock_s3
+        mock_s3.exceptions = MagicMock()
+        mock_s3.exceptions.NoSuchKey = type("NoSuchKey", (Exception,), {})
+
+        fingerprint = hashlib.sha256(
+            b"".join(f"{key}:{photo_objects[key]['etag']}\n".encode() for key in photos)
+        ).hexdigest()
+        archive_key = f"archives/TestUser/{fingerprint}.v2.zip"
+        mock_s3.get_object.return_value = {"Body": MagicMock(read=lambda: b"prebuilt-zip")}
+
+        response = lambda_handler(event, {})
+
+        assert response["statusCode"] == 200
+        assert base64.b64decode(response["body"]) == b"prebuilt-zip"
+        mock_s3.get_object.assert_called_once_with(Bucket="test-bucket", Key=archive_key)
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_builds_archive_when_no_prebuilt_archive(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        """Fall back to live assembly when the prebuilt archive does not exist."""
+        credentials = "12345678A:TestUser"
+        encoded_auth = base64.b64encode(credentials.encode()).decode()
+        event = {"headers": {"Authorization": f"Basic {encoded_auth}"}}
+
+        photos = ["TestUser/photo1.jpg"]
+        mock_users = mock_dynamodb.return_value
+        mock_users.get_item.return_value = get_item_response(
+            {"photos": photos, "photo_objects": {"TestUser/photo1.jpg": {"size": 9, "etag": "abc"}}}
+        )
+
+        mock_s3 = MagicMock()
+        mock_boto_client.return_value = mock_s3
+        mock_s3.exceptions = MagicMock()
+        mock_s3.exceptions.NoSuchKey = type("NoSuchKey", (Exception,), {})
+
+        def get_object_side_effect(Bucket, Key):
+            if Key.startswith("archives/"):
+                raise mock_s3.exceptions.NoSuchKey("The specified key does not exist.")
+            return {"Body": MagicMock(read=lambda: b"content_1")}
+
+        mock_s3.get_object.side_effect = get_object_side_effect
+
+        response = lambda_handler(event, {})
+
+        assert response["statusCode"] == 200
+        with zipfile.ZipFile(io.BytesIO(base64.b64decode(response["body"]))) as zip_file:
+            assert zip_file.read("photo1.jpg") == b"content_1"
+        assert mock_s3.get_object.call_count == 2
+
+
+class TestSelectiveDownload:
+    """Unit tests for downloading a subset of the photos."""
+
+    PHOTOS = ["TestUser/001.png", "TestUser/002.png", "Teams/Infantil A.png"]
+    CONTENTS = {
+        "TestUser/001.png": b"content_1",
+        "TestUser/002.png": b"content_2",
+        "Teams/Infantil A.png": b"team",
+    }
+
+    def _invoke(self, mock_boto_client, mock_dynamodb, selection):
+        encoded_auth = base64.b64encode(b"12345678A:TestUser").decode()
+        event = {
+            "headers": {"Authorization": f"Basic {encoded_auth}"},
+            "queryStringParameters": {"photos": selection},
+        }
+        mock_users = mock_dynamodb.return_value
+        mock_users.get_item.return_value = get_item_response({"photos": self.PHOTOS})
+
+        mock_s3 = mock_boto_client.return_value
+        mock_s3.exceptions.NoSuchKey = type("NoSuchKey", (Exception,), {})
+
+        def get_object_side_effect(Bucket, Key):
+            if Key not in self.CONTENTS:
+                raise mock_s3.exceptions.NoSuchKey("The specified key does not exist.")
+            return {"Body": MagicMock(read=lambda: self.CONTENTS[Key]), "ContentType": "image/png"}
+
+        mock_s3.get_object.side_effect = get_object_side_effect
+        return lambda_handler(event, {}), mock_s3
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_zips_selected_photos_by_index_and_filename(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        response, mock_s3 = self._invoke(mock_boto_client, mock_dynamodb, "1, 001.png")
+
+        assert response["statusCode"] == 200
+        assert response["headers"]["Content-Type"] == "application/zip"
+        with zipfile.ZipFile(io.BytesIO(base64.b64decode(response["body"]))) as zip_file:
+            assert zip_file.namelist() == ["001.png", "002.png"]
+        # The prebuilt archive holds every photo, so it is not used for a subset
+        assert [call.kwargs["Key"] for call in mock_s3.get_object.call_args_list] == self.PHOTOS[:2]
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_returns_single_photo_unzipped(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        response, mock_s3 = self._invoke(mock_boto_client, mock_dynamodb, "Infantil A.png")
+
+        assert response["statusCode"] == 200
+        assert response["isBase64Encoded"] is True
+        assert response["headers"]["Content-Type"] == "image/png"
+        assert response["headers"]["Content-Disposition"] == 'attachment; filename="Infantil A.png"'
+        assert base64.b64decode(response["body"]) == b"team"
+        mock_s3.get_object.assert_called_once_with(Bucket="test-bucket", Key="Teams/Infantil A.png")
+
+    @pytest.mark.parametrize("selection", ["3", "003.png", "TestUser/001.png", ","])
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_rejects_photos_not_in_stored_list(self, mock_boto_client, mock_dynamodb, selection, mock_env_vars):
+        response, mock_s3 = self._invoke(mock_boto_client, mock_dynamodb, selection)
+
+        assert response["statusCode"] == 400
+        assert json.loads(response["body"])["message"].startswith("Invalid photo selection")
+        mock_s3.get_object.assert_not_called()
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_single_missing_photo(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        self.CONTENTS = {}
+
+        response, _ = self._invoke(mock_boto_client, mock_dynamodb, "0")
+
+        assert response["statusCode"] == 404
+
+
+class TestConditionalRequests:
+    """Unit tests for ETag and If-None-Match handling."""
+
+    PHOTOS = ["TestUser/001.png", "Teams/Infantil A.png"]
+
+    def _invoke(self, mock_boto_client, mock_dynamodb, etag_suffix="", headers=None, selection=None):
+        encoded_auth = base64.b64encode(b"12345678A:TestUser").decode()
+        event = {"headers": {"Authorization": f"Basic {encoded_auth}", **(headers or {})}}
+        if selection:
+            event["queryStringParameters"] = {"photos": selection}
+
+        photo_objects = {key: {"size": 4, "etag": f"etag-{key}{etag_suffix}"} for key in self.PHOTOS}
+        mock_users = mock_dynamodb.return_value
+        mock_users.get_item.return_value = get_item_response({"photos": self.PHOTOS, "photo_objects": photo_objects})
+
+        mock_s3 = mock_boto_client.return_value
+        mock_s3.exceptions.NoSuchKey = type("NoSuchKey", (Exception,), {})
+        mock_s3.get_object.return_value = {"Body": MagicMock(read=lambda: b"zip"), "ContentType": "image/png"}
+        return lambda_handler(event, {}), mock_s3
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_sets_etag_and_cache_control(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        response, _ = self._invoke(mock_boto_client, mock_dynamodb)
+
+        assert response["statusCode"] == 200
+        assert response["headers"]["ETag"].startswith('"')
+        assert response["headers"]["Cache-Control"] == "private, max-age=3600"
+        assert response["headers"]["Vary"] == "Authorization"
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_not_modified_without_fetching_photos(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        first, _ = self._invoke(mock_boto_client, mock_dynamodb)
+        mock_boto_client.reset_mock()
+
+        response, mock_s3 = self._invoke(
+            mock_boto_client, mock_dynamodb, headers={"if-none-match": f'"other", W/{first["headers"]["ETag"]}'}
+        )
+
+        assert response["statusCode"] == 304
+        assert response["body"] == ""
+        assert response["headers"]["ETag"] == first["headers"]["ETag"]
+        mock_s3.get_object.assert_not_called()
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_etag_changes_with_photos_and_selection(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        full, _ = self._invoke(mock_boto_client, mock_dynamodb)
+        changed, _ = self._invoke(mock_boto_client, mock_dynamodb, etag_suffix="-v2")
+        single, _ = self._invoke(mock_boto_client, mock_dynamodb, selection="0")
+
+        etags = {full["headers"]["ETag"], changed["headers"]["ETag"], single["headers"]["ETag"]}
+        assert len(etags) == 3
+
+        stale, mock_s3 = self._invoke(
+            mock_boto_client, mock_dynamodb, etag_suffix="-v2", headers={"If-None-Match": full["headers"]["ETag"]}
+        )
+        assert stale["statusCode"] == 200
+        mock_s3.get_object.assert_called()
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_no_etag_when_photo_etags_unknown(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        encoded_auth = base64.b64encode(b"12345678A:TestUser").decode()
+        event = {"headers": {"Authorization": f"Basic {encoded_auth}", "If-None-Match": "*"}}
+        mock_dynamodb.return_value.get_item.return_value = get_item_response({"photos": self.PHOTOS})
+        mock_s3 = mock_boto_client.return_value
+        mock_s3.exceptions.NoSuchKey = type("NoSuchKey", (Exception,), {})
+        mock_s3.get_object.return_value = {"Body": MagicMock(read=lambda: b"photo")}
+
+        response = lambda_handler(event, {})
+
+        assert response["statusCode"] == 200
+        assert "ETag" not in response["headers"]
+
+
+class TestRangeRequests:
+    """Unit tests for resumable downloads with Range and If-Range."""
+
+    PHOTOS = ["TestUser/001.png", "TestUser/002.png"]
+    CONTENTS = {"TestUser/001.png": b"first photo", "TestUser/002.png": b"second photo"}
+
+    def _invoke(self, mock_boto_client, mock_dynamodb, headers=None, prebuilt=None):
+        encoded_auth = base64.b64encode(b"12345678A:TestUser").decode()
+        event = {"headers": {"Authorization": f"Basic {encoded_auth}", **(headers or {})}}
+        photo_objects = {key: {"size": len(self.CONTENTS[key]), "etag": f"etag-{key}"} for key in self.PHOTOS}
+        mock_users = mock_dynamodb.return_value
+        mock_users.get_item.return_value = get_item_response({"photos": self.PHOTOS, "photo_objects": photo_objects})
+
+        mock_s3 = mock_boto_client.return_value
+        mock_s3.exceptions.NoSuchKey = type("NoSuchKey", (Exception,), {})
+
+        def get_object_side_effect(Bucket, Key, Range=None):
+            if Key.startswith("archives/"):
+                if prebuilt is None:
+                    raise mock_s3.exceptions.NoSuchKey("The specified key does not exist.")
+                first, last = (int(position) for position in Range.removeprefix("bytes=").split("-"))
+                return {
+                    "Body": MagicMock(read=lambda: prebuilt[first : last + 1]),
+                    "ContentRange": f"bytes {first}-{last}/{len(prebuilt)}",
+                }
+            return {"Body": MagicMock(read=lambda: self.CONTENTS[Key])}
+
+        mock_s3.get_object.side_effect = get_object_side_effect
+        return lambda_handler(event, {}), mock_s3
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_live_archives_are_reproducible(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        first, _ = self._invoke(mock_boto_client, mock_dynamodb)
+        second, _ = self._invoke(mock_boto_client, mock_dynamodb)
+
+        assert first["body"] == second["body"]
+        assert first["headers"]["Accept-Ranges"] == "bytes"
+        with zipfile.ZipFile(io.BytesIO(base64.b64decode(first["body"]))) as zip_file:
+            assert zip_file.getinfo("001.png").compress_type == zipfile.ZIP_STORED
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_serves_tail_of_live_archive(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        full, _ = self._invoke(mock_boto_client, mock_dynamodb)
+        content = base64.b64decode(full["body"])
+
+        response, _ = self._invoke(
+            mock_boto_client, mock_dynamodb, headers={"range": "bytes=100-", "If-Range": full["headers"]["ETag"]}
+        )
+
+        assert response["statusCode"] == 206
+        assert response["headers"]["Content-Range"] == f"bytes 100-{len(content) - 1}/{len(content)}"
+        assert base64.b64decode(response["body"]) == content[100:]
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_serves_range_of_prebuilt_archive_from_s3(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        prebuilt = bytes(range(200))
+
+        response, mock_s3 = self._invoke(
+            mock_boto_client, mock_dynamodb, headers={"Range": "bytes=10-19"}, prebuilt=prebuilt
+        )
+
+        assert response["statusCode"] == 206
+        assert response["headers"]["Content-Range"] == "bytes 10-19/200"
+        assert base64.b64decode(response["body"]) == prebuilt[10:20]
+        assert mock_s3.get_object.call_args.kwargs["Range"] == "bytes=10-19"
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_ignores_range_when_if_range_does_not_match(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        response, _ = self._invoke(
+            mock_boto_client, mock_dynamodb, headers={"Range": "bytes=0-9", "If-Range": '"stale"'}
+        )
+
+        assert response["statusCode"] == 200
+        assert "Content-Range" not in response["headers"]
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_unsatisfiable_range(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        full, _ = self._invoke(mock_boto_client, mock_dynamodb)
+        size = len(base64.b64decode(full["body"]))
+
+        response, _ = self._invoke(mock_boto_client, mock_dynamodb, headers={"Range": f"bytes={size}-"})
+
+        assert response["statusCode"] == 416
+        assert response["headers"]["Content-Range"] == f"bytes */{size}"
+
+    @pytest.mark.parametrize(
+        "header, expected",
+        [
+            ("bytes=0-99", (0, 99)),
+            ("bytes=100-", (100, None)),
+            ("bytes=-50", (None, 50)),
+            ("bytes=0-1,5-6", None),
+            ("bytes=9-1", None),
+            ("items=0-1", None),
+            (None, None),
+        ],
+    )
+    def test_parse_range(self, header, expected):
+        assert _parse_range(header) == expected
+
+
+class TestPhotoCache:
+    """Unit tests for the container photo cache."""
+
+    def test_hits_after_put_and_counts_bytes_saved(self, photo_cache):
+        photo_cache.put("bucket", "Teams/TeamA.png", "etag-1", b"team")
+
+        assert photo_cache.get("bucket", "Teams/TeamA.png", "etag-1") == b"team"
+        assert photo_cache.get("bucket", "Teams/TeamA.png", "etag-2") is None
+        assert (photo_cache.hits, photo_cache.misses, photo_cache.bytes_saved) == (1, 1, 4)
+
+    def test_evicts_least_recently_used_within_budget(self, tmp_path):
+        cache = PhotoCache(str(tmp_path / "cache"), max_bytes=10)
+        cache.put("bucket", "a", "1", b"aaaa")
+        cache.put("bucket", "b", "1", b"bbbb")
+        cache.get("bucket", "a", "1")
+
+        cache.put("bucket", "c", "1", b"cccc")
+
+        assert cache.get("bucket", "b", "1") is None
+        assert cache.get("bucket", "a", "1") == b"aaaa"
+        assert cache.get("bucket", "c", "1") == b"cccc"
+        assert len(os.listdir(tmp_path / "cache")) == 2
+
+        cache.put("bucket", "huge", "1", b"x" * 11)
+        assert cache.get("bucket", "huge", "1") is None
+
+    def test_reloads_entries_left_by_previous_invocations(self, tmp_path):
+        PhotoCache(str(tmp_path / "cache"), max_bytes=10).put("bucket", "a", "1", b"aaaa")
+
+        assert PhotoCache(str(tmp_path / "cache"), max_bytes=10).get("bucket", "a", "1") == b"aaaa"
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_shared_photos_are_fetched_once_per_container(
+        self, mock_boto_client, mock_dynamodb, mock_env_vars, photo_cache, capsys
+    ):
+        mock_s3 = mock_boto_client.return_value
+        mock_s3.exceptions.NoSuchKey = type("NoSuchKey", (Exception,), {})
+
+        def get_object_side_effect(Bucket, Key):
+            if Key.startswith("archives/"):
+                raise mock_s3.exceptions.NoSuchKey("The specified key does not exist.")
+            return {"Body": MagicMock(read=lambda: Key.encode())}
+
+        mock_s3.get_object.side_effect = get_object_side_effect
+        mock_users = mock_dynamodb.return_value
+
+        for username in ("Juan", "Ana"):
+            photos = [f"{username}/001.png", "Teams/TeamA.png"]
+            mock_users.get_item.return_value = get_item_response(
+                {"photos": photos, "photo_objects": {key: {"size": 1, "etag": "e"} for key in photos}}
+            )
+            encoded_auth = base64.b64encode(f"12345678A:{username}".encode()).decode()
+            response = lambda_handler({"headers": {"Authorization": f"Basic {encoded_auth}"}}, {})
+            assert response["statusCode"] == 200
+
+        fetched = [call.kwargs["Key"] for call in mock_s3.get_object.call_args_list]
+        assert fetched.count("Teams/TeamA.png") == 1
+        assert photo_cache.hits == 1
+
+        records = [json.loads(line) for line in capsys.readouterr().out.splitlines() if '"_aws"' in line]
+        assert [record.get("PhotoCacheMisses") for record in records] == [2, 1]
+        assert [record.get("PhotoCacheHits") for record in records] == [None, 1]
+        assert [record.get("PhotoCacheBytesSaved") for record in records] == [None, len(b"Teams/TeamA.png")]
+
+
+class TestWarmUp:
+    """Unit tests for warm-up invocations."""
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_prefetches_team_photos_without_authorization(
+        self, mock_boto_client, mock_dynamodb, mock_env_vars, photo_cache
+    ):
+        mock_users = mock_dynamodb.return_value
+        mock_users.get_item.return_value = {}
+        mock_s3 = mock_boto_client.return_value
+        mock_s3.get_paginator.return_value.paginate.return_value = [
+            {
+                "Contents": [
+                    {"Key": "Teams/", "Size": 0, "ETag": '"dir"'},
+                    {"Key": "Teams/TeamA.png", "Size": 4, "ETag": '"etag-a"'},
+                    {"Key": "Teams/TeamB.png", "Size": 4, "ETag": '"etag-b"'},
+                ]
+            }
+        ]
+        mock_s3.get_object.side_effect = lambda Bucket, Key: {"Body": MagicMock(read=lambda: b"team")}
+
+        response = lambda_handler({"warmup": True}, {})
+
+        assert response == {"warmup": True, "prefetched": 2}
+        assert mock_users.get_item.call_args.kwargs["Key"] == {"username": {"S": "__warmup__"}}
+        mock_s3.get_paginator.return_value.paginate.assert_called_once_with(Bucket="test-bucket", Prefix="Teams/")
+        assert photo_cache.get("test-bucket", "Teams/TeamA.png", "etag-a") == b"team"
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_clients_are_reused_across_invocations(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        mock_dynamodb.return_value.get_item.return_value = {}
+        mock_s3 = mock_boto_client.return_value
+        mock_s3.get_paginator.return_value.paginate.return_value = []
+
+        lambda_handler({"source": "aws.events"}, {})
+        preview_handler({"source": "aws.events"}, {})
+
+        assert mock_boto_client.call_count == 1
+        assert mock_boto_client.call_args.args == ("s3",)
+        mock_dynamodb.assert_called_once_with()
+        mock_s3.head_bucket.assert_called_once_with(Bucket="test-bucket")
+
+
+class TestDeadlineAwareReads:
+    """Unit tests for hedged S3 reads and the request deadline."""
+
+    PHOTOS = ["TestUser/001.png", "TestUser/002.png"]
+
+    @staticmethod
+    def _context(remaining_ms: int) -> MagicMock:
+        context = MagicMock()
+        context.get_remaining_time_in_millis.return_value = remaining_ms
+        return context
+
+    def _invoke(self, mock_boto_client, mock_dynamodb, get_object, context):
+        encoded_auth = base64.b64encode(b"12345678A:TestUser").decode()
+        mock_dynamodb.return_value.get_item.return_value = get_item_response({"photos": self.PHOTOS})
+        mock_s3 = mock_boto_client.return_value
+        mock_s3.exceptions.NoSuchKey = type("NoSuchKey", (Exception,), {})
+        mock_s3.get_object.side_effect = get_object
+        return lambda_handler({"headers": {"Authorization": f"Basic {encoded_auth}"}}, context), mock_s3
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_hedges_slow_gets(self, mock_boto_client, mock_dynamodb, mock_env_vars, monkeypatch):
+        monkeypatch.setattr(handler, "HEDGE_DEFAULT_DELAY_SECONDS", 0.05)
+        release = threading.Event()
+        calls = []
+
+        def get_object(Bucket, Key):
+            calls.append(Key)
+            if Key == "TestUser/002.png" and calls.count(Key) == 1:
+                release.wait(5)
+            return {"Body": MagicMock(read=lambda: Key.encode())}
+
+        try:
+            response, _ = self._invoke(mock_boto_client, mock_dynamodb, get_object, self._context(30000))
+        finally:
+            release.set()
+
+        assert response["statusCode"] == 200
+        assert calls == ["TestUser/001.png", "TestUser/002.png", "TestUser/002.png"]
+        with zipfile.ZipFile(io.BytesIO(base64.b64decode(response["body"]))) as zip_file:
+            assert zip_file.read("002.png") == b"TestUser/002.png"
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_drops_stragglers_at_the_deadline(self, mock_boto_client, mock_dynamodb, mock_env_vars, caplog):
+        release = threading.Event()
+
+        def get_object(Bucket, Key):
+            if Key == "TestUser/002.png":
+                release.wait(5)
+            return {"Body": MagicMock(read=lambda: Key.encode())}
+
+        # 2.3s remaining leave 0.3s to read the photos before the response margin
+        try:
+            response, _ = self._invoke(mock_boto_client, mock_dynamodb, get_object, self._context(2300))
+        finally:
+            release.set()
+
+        assert response["statusCode"] == 200
+        assert "ETag" not in response["headers"]
+        with zipfile.ZipFile(io.BytesIO(base64.b64decode(response["body"]))) as zip_file:
+            assert zip_file.namelist() == ["001.png"]
+        assert "omitting 1 photos" in caplog.text
+
+    @pytest.fixture
+    def get_pool(self, monkeypatch):
+        """A pool of two S3 GET threads, one of them held by another request until released."""
+        monkeypatch.setattr(handler, "HEDGE_DEFAULT_DELAY_SECONDS", 0.05)
+        pool = handler.GetPool(2)
+        monkeypatch.setattr(handler, "_s3_pool", pool)
+        release = threading.Event()
+        pool.submit(release.wait, 5)
+        yield SimpleNamespace(pool=pool, release=release)
+        release.set()
+        pool._executor.shutdown(wait=True)
+
+    @staticmethod
+    def _s3(get_object) -> MagicMock:
+        s3 = MagicMock()
+        s3.get_object.side_effect = get_object
+        return s3
+
+    def test_hedge_delay_excludes_the_wait_for_a_thread(self, get_pool):
+        # Both threads busy: the GET waits in the queue longer than the hedge delay
+        get_pool.pool.submit(time.sleep, 0.3)
+        s3 = self._s3(lambda Bucket, Key: {"Body": MagicMock(read=lambda: b"photo")})
+
+        assert handler._hedged_get(s3, "bucket", "a.png", time.monotonic() + 5) == b"photo"
+
+        get_pool.release.set()
+        get_pool.pool._executor.shutdown(wait=True)
+        assert s3.get_object.call_count == 1
+
+    def test_does_not_hedge_when_every_thread_is_busy(self, get_pool):
+        slow = threading.Event()
+
+        def get_object(Bucket, Key):
+            slow.wait(0.3)
+            return {"Body": MagicMock(read=lambda: b"photo")}
+
+        s3 = self._s3(get_object)
+
+        assert handler._hedged_get(s3, "bucket", "a.png", time.monotonic() + 5) == b"photo"
+
+        get_pool.release.set()
+        get_pool.pool._executor.shutdown(wait=True)
+        assert s3.get_object.call_count == 1
+        assert get_pool.pool.has_free_thread()
+
+    def test_gives_up_on_gets_still_queued_at_the_deadline(self, get_pool):
+        get_pool.pool.submit(get_pool.release.wait, 5)
+        s3 = self._s3(lambda Bucket, Key: {"Body": MagicMock(read=lambda: b"photo")})
+
+        with pytest.raises(handler.DeadlineExceededError):
+            handler._hedged_get(s3, "bucket", "a.png", time.monotonic() + 0.1)
+
+        get_pool.release.set()
+        get_pool.pool._executor.shutdown(wait=True)
+        s3.get_object.assert_not_called()
+
+    def test_hedge_delay_follows_recent_latencies(self, s3_latency):
+        assert s3_latency.hedge_delay() == handler.HEDGE_DEFAULT_DELAY_SECONDS
+
+        for latency in range(1, 101):
+            s3_latency.record(latency / 100)
+
+        assert s3_latency.hedge_delay() == 0.96
+
+
+class TestPreviewHandler:
+    """Unit tests for the preview handler."""
+
+    @staticmethod
+    def _event(credentials: str = "12345678A:TestUser") -> dict:
+        encoded_auth = base64.b64encode(credentials.encode()).decode()
+        return {"headers": {"Authorization": f"Basic {encoded_auth}"}}
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_lists_photos_with_presigned_thumbnails(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        """Return photo sizes and presigned thumbnail URLs without fetching any object."""
+        photos = ["TestUser/001.png", "Teams/TeamA.png"]
+        mock_users = mock_dynamodb.return_value
+        mock_users.get_item.return_value = get_item_response(
+            {
+                "photos": photos,
+                "photo_objects": {key: {"size": 2048, "etag": f"etag-{key}"} for key in photos},
+                "derivatives": {
+                    "TestUser/001.png": {
+                        "source_etag": "etag-TestUser/001.png",
+                        "thumbnail": {"key": "thumbnails/TestUser/001.webp", "size": 120, "width": 320, "height": 240},
+                    },
+                },
+            }
+        )
+
+        mock_s3 = mock_boto_client.return_value
+        mock_s3.generate_presigned_url.return_value = "https://signed/thumbnails/TestUser/001.webp"
+
+        response = preview_handler(self._event(), {})
+
+        assert response["statusCode"] == 200
+        assert response["headers"]["Content-Type"] == "application/json"
+        body = json.loads(response["body"])
+        assert body["success"] is True
+        assert body["photos"] == [
+            {
+                "name": "001.png",
+                "size": 2048,
+                "thumbnail": {
+                    "url": "https://signed/thumbnails/TestUser/001.webp",
+                    "size": 120,
+                    "width": 320,
+                    "height": 240,
+                },
+            },
+            {"name": "TeamA.png", "size": 2048, "thumbnail": None},
+        ]
+        mock_s3.generate_presigned_url.assert_called_once_with(
+            "get_object",
+            Params={"Bucket": "test-bucket", "Key": "thumbnails/TestUser/001.webp"},
+            ExpiresIn=body["expiresIn"],
+        )
+        mock_s3.get_object.assert_not_called()
+        mock_s3.head_object.assert_not_called()
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_omits_stale_thumbnails(self, mock_boto_client, mock_dynamodb, mock_env_vars):
+        """Do not presign a thumbnail generated from a previous version of the photo."""
+        mock_users = mock_dynamodb.return_value
+        mock_users.get_item.return_value = get_item_response(
+            {
+                "photos": ["TestUser/001.png"],
+                "photo_objects": {"TestUser/001.png": {"size": 10, "etag": "new"}},
+                "derivatives": {
+                    "TestUser/001.png": {"source_etag": "old", "thumbnail": {"key": "thumbnails/TestUser/001.webp"}}
+                },
+            }
+        )
+
+        response = preview_handler(self._event(), {})
+
+        assert json.loads(response["body"])["photos"] == [{"name": "001.png", "size": 10, "thumbnail": None}]
+        mock_boto_client.return_value.generate_presigned_url.assert_not_called()
+
+    @patch.object(handler, "_dynamodb_client")
+    def test_no_photos_found(self, mock_dynamodb, mock_env_vars):
+        mock_dynamodb.return_value.get_item.return_value = {}
+
+        response = preview_handler(self._event(), {})
+
+        assert response["statusCode"] == 404
+        assert json.loads(response["body"])["message"] == "No photos associated to this player"
+
+    def test_missing_or_invalid_authorization(self, mock_env_vars):
+        assert preview_handler({"headers": {}}, {})["statusCode"] == 401
+        assert preview_handler({"headers": {"Authorization": "Basic not-base64"}}, {})["statusCode"] == 400
+
+
+class TestFamilyDownload:
+    """Unit tests for the archive of every child of a tutor."""
+
+    CONTENTS = {
+        "Ana/001.png": b"ana photo",
+        "Teams/Infantil A.png": b"team photo",
+        "Luis/001.png": b"luis photo",
+    }
+
+    @staticmethod
+    def _event(query=None, credentials="99999999T:Luis") -> dict:
+        encoded_auth = base64.b64encode(credentials.encode()).decode()
+        return {"headers": {"Authorization": f"Basic {encoded_auth}"}, "queryStringParameters": query}
+
+    @pytest.fixture
+    def family(self, mock_env_vars, monkeypatch):
+        monkeypatch.setenv("DNI_INDEX_TABLE_NAME", "test-dni-index")
+        with patch.object(handler, "_dynamodb_client") as mock_dynamodb, patch("boto3.client") as mock_boto_client:
+            dynamodb = mock_dynamodb.return_value
+            dynamodb.query.return_value = {
+                "Items": [{"username": {"S": username}} for username in ("Luis", "Ana", "Moved")]
+            }
+            dynamodb.batch_get_item.return_value = {
+                "Responses": {
+                    "test-users": [
+                        get_item_response(
+                            {"username": "Luis", "dnis": ["2A", "99999999T"], "photos": ["Luis/001.png"]}
+                        )["Item"],
+                        get_item_response(
+                            {
+                                "username": "Ana",
+                                "dnis": ["99999999T"],
+                                "photos": ["Ana/001.png", "Teams/Infantil A.png"],
+                            }
+                        )["Item"],
+                        # Stale index entry, the DNI was removed from this player
+                        get_item_response({"username": "Moved", "dnis": ["3A"], "photos": ["Moved/001.png"]})["Item"],
+                    ]
+                }
+            }
+            mock_s3 = mock_boto_client.return_value
+            mock_s3.exceptions.NoSuchKey = type("NoSuchKey", (Exception,), {})
+            mock_s3.get_object.side_effect = lambda Bucket, Key: {"Body": MagicMock(read=lambda: self.CONTENTS[Key])}
+            yield SimpleNamespace(dynamodb=dynamodb, s3=mock_s3)
+
+    def test_archives_every_child_in_a_folder(self, family):
+        response = lambda_handler(self._event({"family": "true"}), {})
+
+        assert response["statusCode"] == 200
+        with zipfile.ZipFile(io.BytesIO(base64.b64decode(response["body"]))) as archive:
+            assert {name: archive.read(name) for name in archive.namelist()} == {
+                "Ana/001.png": b"ana photo",
+                "Ana/Infantil A.png": b"team photo",
+                "Luis/001.png": b"luis photo",
+            }
+        # One Query and one BatchGetItem, no GetItem per child
+        query = family.dynamodb.query.call_args.kwargs
+        assert query["TableName"] == "test-dni-index"
+        assert query["ExpressionAttributeValues"] == {":dni": {"S": "99999999T"}}
+        family.dynamodb.batch_get_item.assert_called_once_with(
+            RequestItems={
+                "test-users": {
+                    "Keys": [{"username": {"S": username}} for username in ("Luis", "Ana", "Moved")],
+                    "ProjectionExpression": "#a0, #a1, #a2, #a3",
+                    "ExpressionAttributeNames": {
+                        "#a0": "username",
+                        "#a1": "dnis",
+                        "#a2": "photos",
+                        "#a3": "photo_objects",
+                    },
+                }
+            }
+        )
+        family.dynamodb.get_item.assert_not_called()
+
+    @patch.object(handler.time, "sleep")
+    def test_retries_unprocessed_keys(self, mock_sleep, family):
+        users = family.dynamodb.batch_get_item.return_value["Responses"]["test-users"]
+        family.dynamodb.batch_get_item.side_effect = [
+            {
+                "Responses": {"test-users": users[:1]},
+                "UnprocessedKeys": {"test-users": {"Keys": [{"username": {"S": "Ana"}}]}},
+            },
+            {"Responses": {"test-users": users[1:2]}},
+        ]
+
+        assert [record.username for record in handler._get_family_items("99999999T")] == ["Ana", "Luis"]
+        assert family.dynamodb.batch_get_item.call_count == 2
+        (delay,), _ = mock_sleep.call_args
+        assert 0 <= delay <= handler.BATCH_GET_BASE_DELAY_SECONDS * 2
+
+    @patch.object(handler.time, "sleep")
+    def test_reads_big_families_without_counting_chunks_as_retries(self, mock_sleep, family):
+        usernames = [
+            f"Player{index}" for index in range(handler.BATCH_GET_MAX_KEYS * (handler.BATCH_GET_MAX_RETRIES + 2))
+        ]
+        family.dynamodb.query.return_value = {"Items": [{"username": {"S": username}} for username in usernames]}
+
+        def batch_get_item(RequestItems):
+            keys = RequestItems["test-users"]["Keys"]
+            items = [
+                get_item_response({"username": key["username"]["S"], "dnis": ["99999999T"]})["Item"] for key in keys
+            ]
+            return {"Responses": {"test-users": items}}
+
+        family.dynamodb.batch_get_item.side_effect = batch_get_item
+
+        assert len(handler._get_family_items("99999999T")) == len(usernames)
+        assert family.dynamodb.batch_get_item.call_count == handler.BATCH_GET_MAX_RETRIES + 2
+        mock_sleep.assert_not_called()
+
+    @patch.object(handler.time, "sleep")
+    def test_backs_off_then_gives_up_on_unprocessed_keys(self, mock_sleep, family):
+        family.dynamodb.batch_get_item.return_value = {
+            "UnprocessedKeys": {"test-users": {"Keys": [{"username": {"S": "Ana"}}]}},
+        }
+
+        with pytest.raises(RuntimeError, match="Could not read 1 users"):
+            handler._get_family_items("99999999T")
+
+        assert family.dynamodb.batch_get_item.call_count == handler.BATCH_GET_MAX_RETRIES + 1
+        delays = [call.args[0] for call in mock_sleep.call_args_list]
+        assert len(delays) == handler.BATCH_GET_MAX_RETRIES
+        assert all(
+            0 <= delay <= min(handler.BATCH_GET_MAX_DELAY_SECONDS, handler.BATCH_GET_BASE_DELAY_SECONDS * 2**retry)
+            for retry, delay in enumerate(delays, start=1)
+        )
+
+    def test_family_archives_have_an_etag_of_their_own(self, family):
+        item, arcnames = handler._family_item(
+            [UserRecord("Ana", photos=["Ana/001.png"], photo_objects={"Ana/001.png": {"etag": "e"}})]
+        )
+
+        assert arcnames == ["Ana/001.png"]
+        assert handler._content_etag(item["photos"], item, False, arcnames) != handler._content_etag(
+            item["photos"], item, False
+        )
+
+    def test_rejects_photo_selection(self, family):
+        response = lambda_handler(self._event({"family": "true", "photos": "0"}), {})
+
+        assert response["statusCode"] == 400
+        family.dynamodb.batch_get_item.assert_not_called()
+
+    def test_no_children_with_photos(self, family):
+        family.dynamodb.query.return_value = {"Items": []}
+        family.dynamodb.batch_get_item.return_value = {}
+
+        response = lambda_handler(self._event({"family": "true"}), {})
+
+        assert response["statusCode"] == 404
+
+
+class TestArchiveJobs:
+    """Unit tests for the asynchronous archive jobs."""
+
+    PHOTOS = ["TestUser/001.png", "TestUser/002.png", "TestUser/missing.png"]
+    CONTENTS = {"TestUser/001.png": b"first photo", "TestUser/002.png": b"second photo"}
+
+    @staticmethod
+    def _event(method="POST", job_id=None, credentials="12345678A:TestUser") -> dict:
+        encoded_auth = base64.b64encode(credentials.encode()).decode()
+        return {
+            "httpMethod": method,
+            "headers": {"Authorization": f"Basic {encoded_auth}"},
+            "pathParameters": {"id": job_id} if job_id else None,
+        }
+
+    @pytest.fixture
+    def s3(self, mock_env_vars):
+        """A bucket in memory behind the mocked S3 client, with multipart uploads."""
+        objects = dict(self.CONTENTS)
+        uploads = {}
+        with patch.object(handler, "_dynamodb_client") as mock_dynamodb, patch("boto3.client") as mock_boto_client:
+            mock_users = mock_dynamodb.return_value
+            mock_users.get_item.return_value = get_item_response({"photos": self.PHOTOS})
+            mock_s3 = mock_boto_client.return_value
+            mock_s3.exceptions.NoSuchKey = type("NoSuchKey", (Exception,), {})
+
+            def get_object(Bucket, Key):
+                if Key not in objects:
+                    raise mock_s3.exceptions.NoSuchKey(Key)
+                return {"Body": MagicMock(read=lambda: objects[Key])}
+
+            def put_object(Bucket, Key, Body, **kwargs):
+                objects[Key] = Body
+
+            def create_multipart_upload(Bucket, Key, **kwargs):
+                uploads[Key] = {}
+                return {"UploadId": Key}
+
+            def upload_part(Bucket, Key, UploadId, PartNumber, Body):
+                uploads[UploadId][PartNumber] = Body
+                return {"ETag": f"part-{PartNumber}"}
+
+            def complete_multipart_upload(Bucket, Key, UploadId, MultipartUpload):
+                parts = uploads.pop(UploadId)
+                objects[Key] = b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"])
+
+            mock_s3.get_object.side_effect = get_object
+            mock_s3.put_object.side_effect = put_object
+            mock_s3.create_multipart_upload.side_effect = create_multipart_upload
+            mock_s3.upload_part.side_effect = upload_part
+            mock_s3.complete_multipart_upload.side_effect = complete_multipart_upload
+            mock_s3.generate_presigned_url.side_effect = (
+                lambda method, Params, ExpiresIn: f"https://signed/{Params['Key']}"
+            )
+            yield SimpleNamespace(client=mock_s3, dynamodb=mock_users, objects=objects, uploads=uploads)
+
+    def test_builds_the_archive_in_the_background(self, s3):
+        response = handler.jobs_handler(self._event(), {})
+
+        assert response["statusCode"] == 202
+        job_id = json.loads(response["body"])["jobId"]
+        assert response["headers"]["Location"] == f"/content/jobs/{job_id}"
+        handler._job_queue().join()
+
+        status = handler.jobs_handler(self._event("GET", job_id), {})
+
+        assert status["statusCode"] == 200
+        body = json.loads(status["body"])
+        archive_key = f"jobs/{job_id}/cbtc-media-day-2025.zip"
+        assert body["status"] == "succeeded"
+        assert (body["photos"], body["photosDone"], body["photosIncluded"], body["progress"]) == (3, 3, 2, 1.0)
+        assert body["downloadUrl"] == f"https://signed/{archive_key}"
+        with zipfile.ZipFile(io.BytesIO(s3.objects[archive_key])) as archive:
+            assert {name: archive.read(name) for name in archive.namelist()} == {
+                "001.png": b"first photo",
+                "002.png": b"second photo",
+            }
+        assert body["archiveBytes"] == len(s3.objects[archive_key])
+
+    def test_streams_the_archive_in_parts(self, s3):
+        upload = handler.MultipartUpload(s3.client, "test-bucket", "jobs/abc/archive.zip", part_bytes=8)
+        upload.write(b"0123456789")
+        upload.write(b"abcdefgh")
+
+        assert [call.kwargs["Body"] for call in s3.client.upload_part.call_args_list] == [b"01234567", b"89abcdef"]
+        assert upload.complete() == 18
+        assert s3.objects["jobs/abc/archive.zip"] == b"0123456789abcdefgh"
+
+    def test_saves_progress_while_running(self, s3, monkeypatch):
+        monkeypatch.setattr(handler, "JOB_PROGRESS_INTERVAL", 1)
+        job_id = json.loads(handler.jobs_handler(self._event(), {})["body"])["jobId"]
+        handler._job_queue().join()
+
+        saved = [
+            json.loads(call.kwargs["Body"])
+            for call in s3.client.put_object.call_args_list
+            if call.kwargs["Key"] == f"jobs/{job_id}/status.json"
+        ]
+        assert [(job["status"], job["photosDone"]) for job in saved] == [
+            ("queued", 0),
+            ("running", 0),
+            ("running", 1),
+            ("running", 2),
+            ("succeeded", 3),
+        ]
+
+    def test_failed_jobs_report_their_error(self, s3):
+        for key in self.CONTENTS:
+            del s3.objects[key]
+        job_id = json.loads(handler.jobs_handler(self._event(), {})["body"])["jobId"]
+        handler._job_queue().join()
+
+        body = json.loads(handler.jobs_handler(self._event("GET", job_id), {})["body"])
+
+        assert body["status"] == "failed"
+        assert body["error"] == "No photos could be retrieved"
+        assert "downloadUrl" not in body
+        s3.client.abort_multipart_upload.assert_called_once()
+
+    def test_jobs_of_other_users_are_not_found(self, s3):
+        job_id = json.loads(handler.jobs_handler(self._event(), {})["body"])["jobId"]
+        handler._job_queue().join()
+
+        other = handler.jobs_handler(self._event("GET", job_id, credentials="87654321B:OtherUser"), {})
+        unknown = handler.jobs_handler(self._event("GET", "0" * 32), {})
+        traversal = handler.jobs_handler(self._event("GET", "../archives"), {})
+
+        assert [response["statusCode"] for response in (other, unknown, traversal)] == [404, 404, 404]
+
+    def test_no_photos_found(self, s3):
+        s3.dynamodb.get_item.return_value = {}
+
+        response = handler.jobs_handler(self._event(), {})
+
+        assert response["statusCode"] == 404
+        s3.client.put_object.assert_not_called()
+
+    def test_sends_jobs_to_sqs_when_configured(self, s3, monkeypatch):
+        monkeypatch.setenv("ARCHIVE_JOBS_QUEUE_URL", "https://sqs/archive-jobs")
+
+        response = handler.jobs_handler(self._event(), {})
+
+        job_id = json.loads(response["body"])["jobId"]
+        s3.client.send_message.assert_called_once_with(
+            QueueUrl="https://sqs/archive-jobs", MessageBody=json.dumps({"jobId": job_id})
+        )
+        assert json.loads(s3.objects[f"jobs/{job_id}/status.json"])["status"] == "queued"
+
+    def test_worker_runs_queued_jobs_once(self, s3, monkeypatch):
+        monkeypatch.setenv("ARCHIVE_JOBS_QUEUE_URL", "https://sqs/archive-jobs")
+        job_id = json.loads(handler.jobs_handler(self._event(), {})["body"])["jobId"]
+        records = [{"messageId": "1", "body": json.dumps({"jobId": job_id})}]
+
+        assert handler.archive_jobs_handler({"Records": records}, {}) == {"batchItemFailures": []}
+        # Redelivered messages leave the built archive as is
+        assert handler.archive_jobs_handler({"Records": records}, {}) == {"batchItemFailures": []}
+
+        assert s3.client.create_multipart_upload.call_count == 1
+        assert json.loads(s3.objects[f"jobs/{job_id}/status.json"])["status"] == "succeeded"
+
+
+class TestMetrics:
+    """Unit tests for the EMF metrics of every invocation."""
+
+    PHOTOS = ["TestUser/001.png", "TestUser/002.png", "TestUser/missing.png"]
+    CONTENTS = {"TestUser/001.png": b"content_1", "TestUser/002.png": b"content_22"}
+
+    @staticmethod
+    def _records(capsys) -> list[dict]:
+        return [json.loads(line) for line in capsys.readouterr().out.splitlines() if '"_aws"' in line]
+
+    def _invoke(self, mock_boto_client, mock_dynamodb):
+        encoded_auth = base64.b64encode(b"12345678A:TestUser").decode()
+        mock_dynamodb.return_value.get_item.return_value = get_item_response({"photos": self.PHOTOS})
+        mock_s3 = mock_boto_client.return_value
+        mock_s3.exceptions.NoSuchKey = type("NoSuchKey", (Exception,), {})
+
+        def get_object_side_effect(Bucket, Key):
+            if Key not in self.CONTENTS:
+                raise mock_s3.exceptions.NoSuchKey("The specified key does not exist.")
+            return {"Body": MagicMock(read=lambda: self.CONTENTS[Key])}
+
+        mock_s3.get_object.side_effect = get_object_side_effect
+        return lambda_handler({"headers": {"Authorization": f"Basic {encoded_auth}"}}, {})
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_emits_phases_and_counters(self, mock_boto_client, mock_dynamodb, mock_env_vars, capsys):
+        response = self._invoke(mock_boto_client, mock_dynamodb)
+
+        records = self._records(capsys)
+        assert len(records) == 1
+        record = records[0]
+        assert record["Service"] == "content"
+        assert record["StatusCode"] == 200
+        assert record["DynamoDBCalls"] == 1
+        assert record["S3Gets"] == 3
+        assert record["S3BytesFetched"] == len(b"content_1content_22")
+        assert record["PhotosSkipped"] == 1
+        assert record["ArchiveBytes"] == len(base64.b64decode(response["body"]))
+        assert {"AuthTime", "DynamoDBTime", "S3Time", "ZipTime", "EncodeTime", "TotalTime"} <= set(record)
+
+        declared = {metric["Name"] for metric in record["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+        assert declared == {name for name, value in record.items() if isinstance(value, int | float)} - {"StatusCode"}
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_cold_start_dimension(self, mock_boto_client, mock_dynamodb, mock_env_vars, capsys, monkeypatch):
+        monkeypatch.setattr(observability.metrics, "_cold_start", True)
+
+        self._invoke(mock_boto_client, mock_dynamodb)
+        self._invoke(mock_boto_client, mock_dynamodb)
+
+        assert [record["ColdStart"] for record in self._records(capsys)] == ["cold", "warm"]
+        assert self._records(capsys) == []
+
+
+class TestLogging:
+    """Unit tests for the structured logs of every invocation."""
+
+    AUTHORIZATION = "Basic " + base64.b64encode(b"12345678A:TestUser").decode()
+
+    @pytest.fixture
+    def debug_sample_rate(self, monkeypatch):
+        """Set the share of invocations logging their debug lines, none by default."""
+        (log_handler,) = [h for h in handler.logger.handlers if isinstance(h, StdoutHandler)]
+        (log_filter,) = log_handler.filters
+
+        def set_rate(rate: float):
+            monkeypatch.setattr(log_filter, "sample_rates", {logging.DEBUG: rate})
+
+        set_rate(0.0)
+        return set_rate
+
+    @staticmethod
+    def _log_lines(capsys) -> list[str]:
+        return [line for line in capsys.readouterr().out.splitlines() if '"_aws"' not in line]
+
+    def _invoke(self, mock_boto_client, mock_dynamodb, photo_count: int):
+        photos = [f"TestUser/{index:03d}.png" for index in range(photo_count)]
+        mock_dynamodb.return_value.get_item.return_value = get_item_response({"photos": photos})
+        mock_s3 = mock_boto_client.return_value
+        mock_s3.get_object.side_effect = lambda Bucket, Key: {"Body": MagicMock(read=lambda: Key.encode())}
+        event = {
+            "headers": {"Authorization": self.AUTHORIZATION, "User-Agent": "Mozilla/5.0 " * 20},
+            "requestContext": {"requestId": "request-1", "authorizer": {"dni": "12345678A"}},
+        }
+        return lambda_handler(event, {})
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_log_volume_is_bounded(self, mock_boto_client, mock_dynamodb, mock_env_vars, debug_sample_rate, capsys):
+        self._invoke(mock_boto_client, mock_dynamodb, 2)
+        few_photos = self._log_lines(capsys)
+        self._invoke(mock_boto_client, mock_dynamodb, 20)
+        many_photos = self._log_lines(capsys)
+
+        assert len(many_photos) == len(few_photos) <= 2
+        assert sum(len(line) for line in many_photos) < 512
+        for line in many_photos:
+            assert json.loads(line)["level"] in ("INFO", "WARNING", "ERROR")
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_sampled_invocations_log_every_photo(
+        self, mock_boto_client, mock_dynamodb, mock_env_vars, debug_sample_rate, capsys
+    ):
+        debug_sample_rate(1.0)
+
+        self._invoke(mock_boto_client, mock_dynamodb, 3)
+
+        messages = [json.loads(line)["message"] for line in self._log_lines(capsys)]
+        assert [message for message in messages if message.startswith("Retrieving photo:")] == [
+            "Retrieving photo: TestUser/000.png",
+            "Retrieving photo: TestUser/001.png",
+            "Retrieving photo: TestUser/002.png",
+        ]
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_never_logs_credentials(self, mock_boto_client, mock_dynamodb, mock_env_vars, debug_sample_rate, capsys):
+        debug_sample_rate(1.0)
+        mock_dynamodb.return_value.get_item.side_effect = Exception(f"Failed with {self.AUTHORIZATION} for 12345678A")
+
+        response = self._invoke(mock_boto_client, mock_dynamodb, 1)
+
+        assert response["statusCode"] == 500
+        output = "\n".join(self._log_lines(capsys))
+        assert "Error processing request" in output
+        assert self.AUTHORIZATION.split(" ")[1] not in output
+        assert "12345678A" not in output
+
+
+class TestTracing:
+    """Unit tests for the spans of every invocation."""
+
+    @pytest.fixture
+    def spans(self, monkeypatch):
+        """Collect the spans the handlers export."""
+        spans = []
+        monkeypatch.setattr(handler.tracer, "exporters", [SimpleNamespace(export=spans.append)])
+        return spans
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_traces_every_dynamodb_and_s3_call(self, mock_boto_client, mock_dynamodb, mock_env_vars, spans):
+        photos = ["TestUser/001.png", "TestUser/002.png"]
+        mock_dynamodb.return_value.get_item.return_value = get_item_response({"photos": photos})
+        mock_boto_client.return_value.get_object.side_effect = lambda Bucket, Key: {
+            "Body": MagicMock(read=lambda: Key.encode())
+        }
+        encoded_auth = base64.b64encode(b"12345678A:TestUser").decode()
+        event = {
+            "headers": {"Authorization": f"Basic {encoded_auth}"},
+            "requestContext": {"requestId": "request-1", "authorizer": {"traceId": "request-0"}},
+        }
+
+        response = lambda_handler(event, self._context())
+
+        assert response["statusCode"] == 200
+        root = spans[-1]
+        assert root.name == "content.request"
+        assert root.attributes == {"authorizerTraceId": "request-0", "statusCode": 200}
+        assert {span.trace_id for span in spans} == {"request-1"}
+        assert [span.name for span in spans if span.parent_id == root.span_id] == ["dynamodb.GetItem"] + [
+            "s3.GetObject",
+            "s3.GetObject.Body",
+        ] * 2
+        assert [span.attributes["key"] for span in spans if span.name == "s3.GetObject"] == photos
+
+    @staticmethod
+    def _context():
+        return SimpleNamespace(aws_request_id="lambda-1", get_remaining_time_in_millis=lambda: 30000)
+
+    @patch.object(handler, "_dynamodb_client")
+    @patch("boto3.client")
+    def test_hedged_gets_join_the_trace(self, mock_boto_client, mock_dynamodb, mock_env_vars, spans):
+        photos = ["TestUser/001.png"]
+        mock_dynamodb.return_value.get_item.return_value = get_item_response(
+            {"photos": photos, "photo_objects": {photos[0]: {"size": 3, "etag": "etag-1"}}}
+        )
+        mock_s3 = mock_boto_client.return_value
+        mock_s3.exceptions.NoSuchKey = type("NoSuchKey", (Exception,), {})
+
+        def get_object(Bucket, Key):
+            if Key.startswith("archives/"):
+                raise mock_s3.exceptions.NoSuchKey(Key)
+            return {"Body": MagicMock(read=lambda: b"one")}
+
+        mock_s3.get_object.side_effect = get_object
+        encoded_auth = base64.b64encode(b"12345678A:TestUser").decode()
+
+        lambda_handler(
+            {"headers": {"Authorization": f"Basic {encoded_auth}"}, "requestContext": {"requestId": "request-1"}},
+            self._context(),
+        )
+
+        root = spans[-1]
+        photo_get = next(span for span in spans if span.attributes.get("key") == photos[0])
+        assert photo_get.trace_id == "request-1"
+        assert photo_get.parent_id == root.span_id
+        archive_get = next(span for span in spans if span.attributes.get("key", "").startswith("archives/"))
+        assert archive_get.status == "error"
@@ -0,0 +1,23 @@
+"""
+Gunicorn settings of the self-hosted server, each worker an asyncio event loop run by uvicorn.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("SERVER_BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Archives are zipped on the CPU, so one worker per core, each running the handlers in SERVER_THREADS threads
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+
+# Archive builds are bounded by the handlers' request deadline, the worker gets a margin on top
+timeout = int(float(os.environ.get("REQUEST_TIMEOUT_SECONDS", 30))) + 10
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle the workers now and then, to return the memory of the large archives built
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = "-"
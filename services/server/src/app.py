@@ -0,0 +1,447 @@
+"""
+ASGI server running the content and authorizer handlers outside Lambda.
+
+Clubs hosting media day on their own machine, with MinIO and a local
+DynamoDB, serve the API from a long lived process instead of API Gateway and
+Lambda. Requests are translated into the API Gateway proxy events the
+handlers expect and their responses back into HTTP. Like API Gateway, the
+authorizer runs first, as middleware, and its decisions are cached per
+Authorization header. Identical archive requests in flight are coalesced, so
+a burst of retries builds the archive once.
+
+Every worker keeps the handlers' clients, and their connection pools, for its
+lifetime. The handlers run in a thread pool, so the event loop keeps serving
+while archives are built. Run it from the repository root:
+
+    PYTHONPATH=libs uvicorn services.server.src.app:app --workers 4
+    PYTHONPATH=libs gunicorn -c services/server/gunicorn.conf.py services.server.src.app:app
+
+The endpoints of MinIO and DynamoDB Local are set with AWS_ENDPOINT_URL_S3 and
+AWS_ENDPOINT_URL_DYNAMODB, read by boto3.
+"""
+
+import asyncio
+import base64
+import contextvars
+import fnmatch
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from urllib.parse import parse_qsl
+
+from observability import get_logger
+
+logger = get_logger("server")
+
+# Threads running the handlers of each worker
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", 32))
+
+# API Gateway caches authorizer decisions for 300 seconds unless configured otherwise
+AUTHORIZER_CACHE_TTL = float(os.environ.get("AUTHORIZER_CACHE_TTL", 300))
+AUTHORIZER_CACHE_MAX_ENTRIES = 10000
+
+# Time the handlers are told they have left, as the Lambda timeout does
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("REQUEST_TIMEOUT_SECONDS", 30))
+
+# Stage of the method ARNs given to the authorizer
+STAGE = "server"
+
+# Request headers telling identical archive requests apart, besides the path, the query string and the user. The
+# credentials are among them, as their DNI selects the players of a family download, not only the username.
+COALESCED_REQUEST_HEADERS = ("authorization", "range", "if-range", "if-none-match")
+
+HEALTH_PATH = "/health"
+
+Handler = Callable[[dict[str, Any], Any], dict[str, Any]]
+
+
+class InvocationContext:
+    """
+    The parts of the Lambda context the handlers read.
+    """
+
+    def __init__(self, request_id: str, function_name: str, timeout: float = REQUEST_TIMEOUT_SECONDS):
+        self.aws_request_id = request_id
+        self.function_name = function_name
+        self._deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def _header_name(name: str) -> str:
+    """Canonical case of a header name, as sent by browsers and expected by the handlers, e.g. If-None-Match."""
+    return "-".join(part.capitalize() for part in name.split("-"))
+
+
+def _request_headers(scope: dict[str, Any]) -> dict[str, str]:
+    headers = {}
+    for name, value in scope.get("headers", []):
+        headers[_header_name(name.decode("latin-1"))] = value.decode("latin-1")
+    return headers
+
+
+def _query_parameters(scope: dict[str, Any]) -> dict[str, str] | None:
+    parameters = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True))
+    return parameters or None
+
+
+def method_arn(method: str, path: str) -> str:
+    return f"arn:aws:execute-api:local:000000000000:media-day/{STAGE}/{method}{path}"
+
+
+def proxy_event(
+    scope: dict[str, Any],
+    request_id: str,
+    authorizer: dict[str, Any] | None = None,
+    resource: str | None = None,
+    path_parameters: dict[str, str] | None = None,
+) -> dict[str, Any]:
+    """
+    API Gateway proxy event of an HTTP request, to the route resource, e.g. /content/jobs/{id}.
+    """
+    request_context: dict[str, Any] = {
+        "requestId": request_id,
+        "stage": STAGE,
+        "httpMethod": scope["method"],
+        "path": scope["path"],
+        "identity": {"sourceIp": (scope.get("client") or ("", 0))[0]},
+    }
+    if authorizer is not None:
+        request_context["authorizer"] = authorizer
+    return {
+        "resource": resource or scope["path"],
+        "path": scope["path"],
+        "httpMethod": scope["method"],
+        "headers": _request_headers(scope),
+        "queryStringParameters": _query_parameters(scope),
+        "pathParameters": path_parameters,
+        "requestContext": request_context,
+        "body": None,
+        "isBase64Encoded": False,
+    }
+
+
+async def send_response(send: Callable[[dict], Awaitable[None]], response: dict[str, Any], request_id: str) -> None:
+    """
+    Send the proxy response of a handler as the HTTP response.
+    """
+    body = response.get("body") or ""
+    content = base64.b64decode(body) if response.get("isBase64Encoded") else body.encode("utf-8")
+
+    headers = [
+        (name.lower().encode("latin-1"), str(value).encode("latin-1"))
+        for name, value in (response.get("headers") or {}).items()
+    ]
+    for name, values in (response.get("multiValueHeaders") or {}).items():
+        headers += [(name.lower().encode("latin-1"), str(value).encode("latin-1")) for value in values]
+    headers = [(name, value) for name, value in headers if name != b"content-length"]
+    headers += [(b"content-length", str(len(content)).encode()), (b"x-request-id", request_id.encode())]
+
+    await send({"type": "http.response.start", "status": response["statusCode"], "headers": headers})
+    await send({"type": "http.response.body", "body": content})
+
+
+def json_response(status: int, body: dict[str, Any]) -> dict[str, Any]:
+    return {"statusCode": status, "headers": {"Content-Type": "application/json"}, "body": json.dumps(body)}
+
+
+class DecisionCache:
+    """
+    Authorizer policies by Authorization header, kept for ttl seconds like API Gateway's authorizer cache.
+
+    Allow and Deny decisions are both cached. The least recently used entries
+    are dropped beyond max_entries.
+    """
+
+    def __init__(
+        self,
+        ttl: float = AUTHORIZER_CACHE_TTL,
+        max_entries: int = AUTHORIZER_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: OrderedDict[str, tuple[float, dict[str, Any]]] = OrderedDict()
+
+    def get(self, authorization: str) -> dict[str, Any] | None:
+        entry = self._entries.get(authorization)
+        if entry is None:
+            return None
+        if self.clock() - entry[0] >= self.ttl:
+            del self._entries[authorization]
+            return None
+        self._entries.move_to_end(authorization)
+        return entry[1]
+
+    def put(self, authorization: str, policy: dict[str, Any]) -> None:
+        if self.ttl <= 0:
+            return
+        self._entries[authorization] = (self.clock(), policy)
+        self._entries.move_to_end(authorization)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def allows(policy: dict[str, Any], arn: str) -> bool:
+    """Whether the policy allows invoking the method ARN: an Allow statement matches it and no Deny does."""
+    statements = policy.get("policyDocument", {}).get("Statement", [])
+    matching = [
+        statement
+        for statement in statements
+        if any(fnmatch.fnmatchcase(arn, resource) for resource in _as_list(statement.get("Resource")))
+    ]
+    return any(s.get("Effect") == "Allow" for s in matching) and not any(s.get("Effect") == "Deny" for s in matching)
+
+
+def _as_list(value: Any) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time, the callers of a key in flight sharing its result.
+    """
+
+    def __init__(self):
+        self.coalesced = 0
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        # A caller going away does not cancel the call the others wait for
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Future) -> None:
+        self._calls.pop(key, None)
+        if not task.cancelled():
+            # Retrieved here in case every caller went away
+            task.exception()
+
+
+class ContentApp:
+    """
+    ASGI application routing requests to the Lambda handlers.
+
+    Routes are keyed by their resource, whose last segment may be a path
+    parameter, e.g. /content/jobs/{id}, and serve GET unless they list their
+    methods. Archive requests of the same credentials, path, query string and
+    conditional headers in flight at the same time are answered by a single invocation.
+    """
+
+    def __init__(
+        self,
+        routes: dict[str, tuple[str, Handler] | tuple[str, Handler, tuple[str, ...]]],
+        executor: ThreadPoolExecutor,
+        coalesced_paths: tuple[str, ...] = ("/content",),
+        warmup: dict[str, Handler] | None = None,
+    ):
+        self.routes = routes
+        self.executor = executor
+        self.coalesced_paths = coalesced_paths
+        self.warmup = warmup or {}
+        self.single_flight = SingleFlight()
+
+    def match(self, path: str) -> tuple[str, dict[str, str] | None] | None:
+        """
+        Resource of the route serving the path and its path parameters, None when no route does.
+        """
+        if path in self.routes:
+            return path, None
+        parent, _, value = path.rpartition("/")
+        for resource in self.routes:
+            resource_parent, _, segment = resource.rpartition("/")
+            if value and resource_parent == parent and segment.startswith("{") and segment.endswith("}"):
+                return resource, {segment[1:-1]: value}
+        return None
+
+    def methods(self, resource: str) -> tuple[str, ...]:
+        route = self.routes[resource]
+        return route[2] if len(route) > 2 else ("GET",)
+
+    async def invoke(self, name: str, handler: Handler, event: dict[str, Any], request_id: str) -> dict[str, Any]:
+        context = InvocationContext(request_id, name)
+        # Each invocation runs in a context of its own, so the metrics, log fields and spans the handlers keep in
+        # context variables never mix with those of the invocations running on the other threads
+        invocation = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, invocation.run, handler, event, context)
+
+    def _coalescing_key(self, scope: dict[str, Any], authorizer: dict[str, Any]) -> Hashable:
+        headers = dict(scope.get("headers", []))
+        return (
+            scope["path"],
+            authorizer.get("principalId"),
+            scope.get("query_string", b""),
+            tuple(headers.get(name.encode()) for name in COALESCED_REQUEST_HEADERS),
+        )
+
+    async def __call__(self, scope: dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        request_id = scope.get("request_id") or str(uuid.uuid4())
+        if scope["path"] == HEALTH_PATH:
+            await send_response(send, json_response(200, {"status": "ok"}), request_id)
+            return
+        matched = self.match(scope["path"])
+        if matched is None:
+            await send_response(send, json_response(404, {"message": "Not Found"}), request_id)
+            return
+        resource, path_parameters = matched
+        if scope["method"] not in self.methods(resource):
+            await send_response(send, json_response(405, {"message": "Method Not Allowed"}), request_id)
+            return
+
+        name, handler = self.routes[resource][:2]
+        authorizer = scope.get("authorizer")
+        event = proxy_event(scope, request_id, authorizer, resource, path_parameters)
+
+        try:
+            if scope["path"] in self.coalesced_paths and authorizer is not None:
+                key = self._coalescing_key(scope, authorizer)
+                response = await self.single_flight.run(key, lambda: self.invoke(name, handler, event, request_id))
+            else:
+                response = await self.invoke(name, handler, event, request_id)
+        except Exception:
+            logger.exception("Handler %s failed", name)
+            response = json_response(502, {"message": "Internal server error"})
+        await send_response(send, response, request_id)
+
+    async def _lifespan(self, receive: Callable, send: Callable) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                if self.warmup:
+                    await self._warm_up()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _warm_up(self) -> None:
+        """Build the clients and open their connections before the first request, as the warm-up schedule does."""
+        for name, handler in self.warmup.items():
+            try:
+                await self.invoke(name, handler, {"warmup": True}, f"warmup-{name}")
+            except Exception:
+                logger.exception("Warm-up of %s failed", name)
+
+
+class AuthorizerMiddleware:
+    """
+    Runs the authorizer before the application, as API Gateway does for CUSTOM authorization.
+
+    Requests without an Authorization header are answered 401, denied ones
+    403 and the authorizer failing 500. Requests arriving with the same
+    header while the authorizer runs share its decision. Allowed requests reach the application
+    with the authorizer context, and the principal ID, in scope["authorizer"].
+    """
+
+    def __init__(
+        self,
+        app: ContentApp,
+        authorizer: Handler,
+        cache: DecisionCache | None = None,
+        public_paths: tuple[str, ...] = (HEALTH_PATH,),
+    ):
+        self.app = app
+        self.authorizer = authorizer
+        self.cache = cache if cache is not None else DecisionCache()
+        self.public_paths = public_paths
+        self.authorizer_calls = 0
+        self._decisions = SingleFlight()
+
+    async def _authorize(self, authorization: str, event: dict[str, Any]) -> dict[str, Any]:
+        self.authorizer_calls += 1
+        request_id = event["requestContext"]["requestId"]
+        policy = await self.app.invoke("authorizer", self.authorizer, event, request_id)
+        self.cache.put(authorization, policy)
+        return policy
+
+    async def __call__(self, scope: dict[str, Any], receive: Callable, send: Callable) -> None:
+        # Only the routes served are authorized, the application answers the other requests
+        matched = self.app.match(scope["path"]) if scope["type"] == "http" else None
+        if matched is None or scope["path"] in self.public_paths or scope["method"] not in self.app.methods(matched[0]):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = str(uuid.uuid4())
+        authorization = _request_headers(scope).get("Authorization")
+        if not authorization:
+            await send_response(send, json_response(401, {"message": "Unauthorized"}), request_id)
+            return
+
+        arn = method_arn(scope["method"], scope["path"])
+        policy = self.cache.get(authorization)
+        if policy is None:
+            event = {**proxy_event(scope, request_id), "type": "REQUEST", "methodArn": arn}
+            try:
+                # Requests of the same header arriving before the decision wait for it
+                policy = await self._decisions.run(authorization, lambda: self._authorize(authorization, event))
+            except Exception:
+                logger.exception("Authorizer failed")
+                await send_response(send, json_response(500, {"message": None}), request_id)
+                return
+
+        if not allows(policy, arn):
+            message = {"Message": "User is not authorized to access this resource"}
+            await send_response(send, json_response(403, message), request_id)
+            return
+
+        authorizer = {**(policy.get("context") or {}), "principalId": policy.get("principalId")}
+        await self.app({**scope, "authorizer": authorizer, "request_id": request_id}, receive, send)
+
+
+def create_app(
+    content_handler: Handler | None = None,
+    preview_handler: Handler | None = None,
+    authorizer_handler: Handler | None = None,
+    jobs_handler: Handler | None = None,
+    threads: int = SERVER_THREADS,
+    cache: DecisionCache | None = None,
+    warmup: bool = True,
+) -> AuthorizerMiddleware:
+    """
+    Build the ASGI application, running the given handlers, the Lambda ones by default.
+    """
+    if content_handler is None or preview_handler is None or authorizer_handler is None or jobs_handler is None:
+        from services.authorizer.src import handler as authorizer
+        from services.content_service.src import handler as content
+
+        content_handler = content_handler or content.lambda_handler
+        preview_handler = preview_handler or content.preview_handler
+        authorizer_handler = authorizer_handler or authorizer.lambda_handler
+        jobs_handler = jobs_handler or content.jobs_handler
+
+    # Without ARCHIVE_JOBS_QUEUE_URL archive jobs run on a thread of the worker that received them
+    routes = {
+        "/content": ("content", content_handler),
+        "/content/preview": ("content-preview", preview_handler),
+        "/content/jobs": ("content-jobs", jobs_handler, ("POST",)),
+        "/content/jobs/{id}": ("content-jobs", jobs_handler),
+    }
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="handler")
+    # The preview shares the content handler's clients
+    warmers = {"content": content_handler, "authorizer": authorizer_handler} if warmup else None
+    return AuthorizerMiddleware(ContentApp(routes, executor, warmup=warmers), authorizer_handler, cache)
+
+
+app = create_app(warmup=os.environ.get("SERVER_WARMUP", "true").lower() == "true")
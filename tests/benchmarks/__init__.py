@@ -0,0 +1 @@
+"""Benchmarks and load tests of the Lambda handlers, against stubbed AWS backends or a deployment."""
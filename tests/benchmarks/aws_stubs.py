@@ -0,0 +1,241 @@
+"""
+Stubbed AWS backends for running the Lambda handlers in-process.
+
+The handlers get real botocore clients whose requests are answered by
+botocore's Stubber, so parameter validation, response parsing and the
+decoding of user items run as they do in Lambda, without any network call.
+"""
+
+import base64
+import contextlib
+import copy
+import io
+import os
+import threading
+from collections.abc import Iterator
+from dataclasses import dataclass
+from types import SimpleNamespace
+from unittest import mock
+
+import boto3
+from botocore.awsrequest import AWSResponse
+from botocore.response import StreamingBody
+from botocore.stub import Stubber
+from userstore import UserStore
+
+REGION = "eu-west-1"
+BUCKET = "bench-content"
+TABLE = "bench-users"
+APP_URL = "https://bench.cbtc.app"
+
+HANDLER_ENVIRONMENT = {
+    "USERS_TABLE_NAME": TABLE,
+    "CONTENT_BUCKET_NAME": BUCKET,
+    "CBTC_APP_URL": APP_URL,
+    "AWS_DEFAULT_REGION": REGION,
+}
+
+
+@dataclass
+class Player:
+    """A player item with photos of the same size, all sharing the same bytes."""
+
+    username: str
+    dni: str
+    photo_count: int
+    photo_size: int
+
+    @property
+    def photo_keys(self) -> list[str]:
+        return [f"{self.username}/{index:03d}.jpg" for index in range(self.photo_count)]
+
+    def make_photo(self) -> bytes:
+        """Random bytes, which like JPEG data do not compress."""
+        return os.urandom(self.photo_size)
+
+    def item(self, attributes: tuple[str, ...] | None = None) -> dict:
+        """
+        User item in the low-level DynamoDB format, with only the username and attributes
+        when given, as GetItem answers a ProjectionExpression.
+        """
+        item = {
+            "username": {"S": self.username},
+            "dnis": {"L": [{"S": self.dni}]},
+            "photos": {"L": [{"S": key} for key in self.photo_keys]},
+            "photo_objects": {
+                "M": {
+                    key: {"M": {"size": {"N": str(self.photo_size)}, "etag": {"S": f"etag-{index}"}}}
+                    for index, key in enumerate(self.photo_keys)
+                }
+            },
+        }
+        return project(item, attributes)
+
+    def authorization(self, dni: str | None = None, username: str | None = None) -> str:
+        credentials = f"{dni or self.dni}:{username or self.username}"
+        return "Basic " + base64.b64encode(credentials.encode()).decode()
+
+
+def project(item: dict, attributes: tuple[str, ...] | None) -> dict:
+    """The username and the attributes of an item, or the whole item when attributes is None."""
+    if attributes is None:
+        return item
+    return {name: value for name, value in item.items() if name == "username" or name in attributes}
+
+
+def lambda_context(request_id: str = "bench", remaining_ms: int = 30000) -> SimpleNamespace:
+    return SimpleNamespace(aws_request_id=request_id, get_remaining_time_in_millis=lambda: remaining_ms)
+
+
+class StubbedBackends:
+    """
+    S3 and DynamoDB clients with stubbed responses, queued in call order before each invocation.
+    """
+
+    def __init__(self):
+        session = boto3.session.Session(aws_access_key_id="bench", aws_secret_access_key="bench", region_name=REGION)
+        self.s3 = session.client("s3")
+        self.dynamodb = session.client("dynamodb")
+        self.s3_stubber = Stubber(self.s3)
+        self.dynamodb_stubber = Stubber(self.dynamodb)
+        self.s3_stubber.activate()
+        self.dynamodb_stubber.activate()
+
+    def expect_get_item(self, item: dict | None) -> None:
+        self.dynamodb_stubber.add_response("get_item", {"Item": item} if item is not None else {})
+
+    def expect_get_object(self, content: bytes, content_type: str = "image/jpeg") -> None:
+        self.s3_stubber.add_response(
+            "get_object",
+            {
+                "Body": StreamingBody(io.BytesIO(content), len(content)),
+                "ContentLength": len(content),
+                "ContentType": content_type,
+            },
+        )
+
+    def expect_missing_object(self) -> None:
+        self.s3_stubber.add_client_error("get_object", service_error_code="NoSuchKey", http_status_code=404)
+
+    def expect_content_request(self, player: Player, content: bytes, cached: bool = False) -> None:
+        """Queue the calls of a full archive request: the user item, the prebuilt archive lookup and the photos."""
+        from services.content_service.src.handler import CONTENT_ATTRIBUTES
+
+        self.expect_get_item(player.item(CONTENT_ATTRIBUTES))
+        self.expect_missing_object()
+        if not cached:
+            for _ in range(player.photo_count):
+                self.expect_get_object(content)
+
+    def assert_consumed(self) -> None:
+        self.s3_stubber.assert_no_pending_responses()
+        self.dynamodb_stubber.assert_no_pending_responses()
+
+    @contextlib.contextmanager
+    def installed(self) -> Iterator[None]:
+        """Make both handlers use the stubbed clients."""
+        with install_clients(self.s3, self.dynamodb):
+            yield
+
+
+class InMemoryBackends:
+    """
+    S3 and DynamoDB clients answering from in-memory objects and user items.
+
+    Unlike the Stubber, requests are answered in any order and from any
+    thread, as needed by concurrent load. Like it, the answers are handed to
+    botocore before the request is sent, so the rest of the client runs as in
+    Lambda. Only the operations the handlers use are supported.
+    """
+
+    def __init__(self):
+        session = boto3.session.Session(aws_access_key_id="bench", aws_secret_access_key="bench", region_name=REGION)
+        self.s3 = session.client("s3")
+        self.dynamodb = session.client("dynamodb")
+        self.objects: dict[str, bytes] = {}
+        self.items: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.answer(self.s3)
+        self.answer(self.dynamodb)
+
+    def answer(self, client) -> None:
+        """Answer the requests of another S3 or DynamoDB client from the same objects and items."""
+        answer = self._answer_s3 if client.meta.service_model.service_name == "s3" else self._answer_dynamodb
+        client.meta.events.register_last("before-parameter-build", self._keep_params)
+        client.meta.events.register_first("before-call", answer)
+
+    def add_player(self, player: Player, content: bytes) -> None:
+        """Store the player's item and photos, all with the given content."""
+        with self._lock:
+            self.items[player.username] = player.item()
+            for key in player.photo_keys:
+                self.objects[key] = content
+
+    @staticmethod
+    def _keep_params(params, context, **kwargs):
+        # before-call only gets the serialized request, so the API parameters are passed on in its context
+        context["api_params"] = params
+
+    @staticmethod
+    def _response(status: int, parsed: dict) -> tuple[AWSResponse, dict]:
+        parsed.setdefault("ResponseMetadata", {})["HTTPStatusCode"] = status
+        return AWSResponse(None, status, {}, None), parsed
+
+    def _error(self, status: int, code: str) -> tuple[AWSResponse, dict]:
+        return self._response(status, {"Error": {"Code": code, "Message": code}})
+
+    def _answer_s3(self, model, context, **kwargs):
+        params = context["api_params"]
+        if model.name == "HeadBucket":
+            return self._response(200, {})
+        if model.name == "ListObjectsV2":
+            with self._lock:
+                contents = [{"Key": key, "Size": len(content)} for key, content in self.objects.items()]
+            return self._response(200, {"Contents": contents, "KeyCount": len(contents), "IsTruncated": False})
+        if model.name not in ("GetObject", "HeadObject") or "Range" in params:
+            raise NotImplementedError(f"S3 {model.name} with {sorted(params)} is not supported")
+
+        with self._lock:
+            content = self.objects.get(params["Key"])
+        if content is None:
+            return self._error(404, "NoSuchKey" if model.name == "GetObject" else "404")
+        parsed = {"ContentLength": len(content), "ContentType": "image/jpeg"}
+        if model.name == "GetObject":
+            parsed["Body"] = StreamingBody(io.BytesIO(content), len(content))
+        return self._response(200, parsed)
+
+    def _answer_dynamodb(self, model, context, **kwargs):
+        params = context["api_params"]
+        if model.name != "GetItem":
+            raise NotImplementedError(f"DynamoDB {model.name} is not supported")
+        with self._lock:
+            item = self.items.get(params["Key"]["username"]["S"])
+        if item is None:
+            return self._response(200, {})
+        names = params.get("ExpressionAttributeNames", {})
+        projection = params.get("ProjectionExpression")
+        attributes = tuple(names.get(name, name) for name in projection.split(", ")) if projection else None
+        # Handlers may keep the decoded values, so they never share the stored ones
+        return self._response(200, {"Item": copy.deepcopy(project(item, attributes))})
+
+    @contextlib.contextmanager
+    def installed(self) -> Iterator[None]:
+        """Make both handlers use the in-memory clients."""
+        with install_clients(self.s3, self.dynamodb):
+            yield
+
+
+@contextlib.contextmanager
+def install_clients(s3_client, dynamodb_client) -> Iterator[None]:
+    """Make both handlers use the given S3 and DynamoDB clients, in the handler environment."""
+    from services.authorizer.src import handler as authorizer
+    from services.content_service.src import handler as content
+
+    store = UserStore(dynamodb_client, TABLE)
+    with (
+        mock.patch.dict(os.environ, HANDLER_ENVIRONMENT),
+        mock.patch.object(content, "_user_store", lambda: store),
+        mock.patch.object(content, "_s3_client", lambda: s3_client),
+        mock.patch.object(authorizer, "get_user_store", lambda: store),
+    ):
+        yield
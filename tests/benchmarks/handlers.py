@@ -0,0 +1,392 @@
+"""
+Micro-benchmarks of the content and authorizer Lambda handlers.
+
+Both handlers run in-process against stubbed S3 and DynamoDB (see aws_stubs),
+so the numbers cover the handler code, botocore and the zip/base64 work, not
+the network. Content scenarios sweep the photo count, the photo size and the
+state of the container's photo cache. Results are compared with the
+baselines stored next to this file, and slower or bigger results are flagged.
+
+Latencies are compared by their trimmed mean, the mean of the middle half of
+the samples, which timer noise and the odd slow invocation barely move. They
+are only flagged past an absolute floor as well as the relative threshold, as
+scenarios of under a millisecond would otherwise be flagged by noise alone.
+Latencies also depend on how fast the host runs at the time, so a fixed
+calibration workload is timed around every scenario and the baseline latency
+is scaled up by how much slower it ran than when the baseline was stored. It
+is never scaled down, as the calibration drifts apart from the scenario too.
+A flagged scenario is run again, and is only reported when it is flagged on
+every run. Baselines stored on another host (system, architecture or Python
+version) only warn: --check does not fail on them.
+
+    PYTHONPATH=libs:. python -m tests.benchmarks.handlers [--matrix full] [--check]
+    PYTHONPATH=libs:. python -m tests.benchmarks.handlers --update-baselines
+"""
+
+import argparse
+import base64
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from unittest import mock
+
+from .aws_stubs import APP_URL, Player, StubbedBackends, lambda_context
+
+BASELINES_PATH = Path(__file__).with_name("baselines.json")
+
+KIB = 1024
+MIB = 1024 * KIB
+
+PHOTO_SIZES = {"100KB": 100 * KIB, "1MB": MIB, "10MB": 10 * MIB}
+
+MATRICES = {
+    "quick": {"counts": (1, 10, 50), "sizes": ("100KB", "1MB"), "caches": ("cold", "warm")},
+    "full": {"counts": (1, 10, 50, 100, 200), "sizes": ("100KB", "1MB", "10MB"), "caches": ("cold", "warm")},
+}
+
+# Scenarios whose archive would be bigger are skipped, as they cannot fit in memory
+MAX_ARCHIVE_BYTES = 512 * MIB
+
+DEFAULT_ITERATIONS = 60
+DEFAULT_MAX_SECONDS = 10.0
+DEFAULT_THRESHOLD = 0.25
+
+# Compared with the baseline: a value higher by more than the threshold and by this floor is a regression
+REGRESSION_FLOORS = {"trimmed_ms": 0.2, "peak_mib": 0.1}
+# Baseline metrics scaled by the calibration of the host
+LATENCY_METRICS = ("trimmed_ms",)
+
+CALIBRATION_ROUNDS = 5
+
+# Extra runs of a flagged scenario, which must be flagged on all of them to be reported
+CONFIRM_RUNS = 2
+
+
+@dataclass
+class Scenario:
+    handler: str
+    photo_count: int = 0
+    photo_size: str = ""
+    cache: str = ""
+
+    @property
+    def id(self) -> str:
+        if self.handler == "authorizer":
+            return "authorizer"
+        return f"content photos={self.photo_count} size={self.photo_size} cache={self.cache}"
+
+    @property
+    def archive_bytes(self) -> int:
+        return self.photo_count * PHOTO_SIZES.get(self.photo_size, 0)
+
+
+@dataclass
+class Result:
+    scenario: str
+    iterations: int
+    ops_per_sec: float
+    p50_ms: float
+    p99_ms: float
+    trimmed_ms: float
+    peak_mib: float
+    calibration_ms: float = 0.0
+
+
+def scenarios(matrix: str) -> list[Scenario]:
+    spec = MATRICES[matrix]
+    content = [
+        Scenario("content", count, size, cache)
+        for count in spec["counts"]
+        for size in spec["sizes"]
+        for cache in spec["caches"]
+    ]
+    return [Scenario("authorizer")] + [s for s in content if s.archive_bytes <= MAX_ARCHIVE_BYTES]
+
+
+@dataclass
+class Baselines:
+    machine: str = ""
+    results: dict[str, dict] = field(default_factory=dict)
+
+    def reference(self, result: Result, metric: str) -> float | None:
+        """
+        Baseline value of the metric for the result's scenario, None without one. Latencies
+        are scaled up by the calibrations timed around the scenario now and when it was
+        stored, never down: the calibration is timed on its own and drifts as well.
+        """
+        baseline = self.results.get(result.scenario, {})
+        value = baseline.get(metric)
+        if value is None:
+            return None
+        stored_calibration = baseline.get("calibration_ms", 0.0)
+        if metric in LATENCY_METRICS and stored_calibration > 0 and result.calibration_ms > 0:
+            value *= max(result.calibration_ms / stored_calibration, 1.0)
+        return round(value, 3)
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def trimmed_mean(samples: list[float]) -> float:
+    """Mean of the middle half of the samples, or of all of them when there are fewer than 4."""
+    ordered = sorted(samples)
+    quarter = len(ordered) // 4
+    middle = ordered[quarter : len(ordered) - quarter]
+    return sum(middle) / len(middle)
+
+
+def machine() -> str:
+    """Fingerprint of the host, stored with the baselines."""
+    return f"{platform.system()} {platform.machine()} Python {platform.python_version()}"
+
+
+def calibrate(rounds: int = CALIBRATION_ROUNDS) -> float:
+    """Fastest milliseconds of a fixed mix of the byte and interpreter work the handlers do."""
+    payload = bytes(range(256)) * (MIB // 256)
+    document = {f"Player{index}/{index:03d}.png": {"size": index, "etag": f"{index:032x}"} for index in range(2000)}
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        zlib.crc32(base64.b64encode(payload))
+        json.loads(json.dumps(document))
+        samples.append(time.perf_counter() - started)
+    return round(min(samples) * 1000, 3)
+
+
+@contextlib.contextmanager
+def quiet_stdout():
+    """Drop the logs, metrics and spans the handlers write, which would flood the report."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+class ScenarioRunner:
+    """Runs one scenario's invocations, queueing the stubbed responses of each one before timing it."""
+
+    def __init__(self, scenario: Scenario, backends: StubbedBackends, cache_dir: str):
+        from services.authorizer.src import handler as authorizer
+        from services.content_service.src import handler as content
+
+        self.scenario = scenario
+        self.backends = backends
+        self.cache_dir = cache_dir
+        self.content = content
+        self.authorizer = authorizer
+        self.player = Player("BenchPlayer", "12345678Z", scenario.photo_count, PHOTO_SIZES.get(scenario.photo_size, 0))
+        self.photo = self.player.make_photo() if scenario.handler == "content" else b""
+        self._cache = None
+        self._generation = 0
+
+    def _fresh_cache(self):
+        self._generation += 1
+        directory = os.path.join(self.cache_dir, f"photo-cache-{self._generation}")
+        return self.content.PhotoCache(directory, self.scenario.archive_bytes + MIB)
+
+    def prepare(self) -> None:
+        """Queue the responses of the next invocation and set the photo cache up."""
+        if self.scenario.handler == "authorizer":
+            self.backends.expect_get_item(self.player.item(self.authorizer.USER_ATTRIBUTES))
+            return
+
+        if self.scenario.cache == "warm" and self._cache is None:
+            # Fill the cache with an untimed invocation
+            self._cache = self._fresh_cache()
+            self.backends.expect_content_request(self.player, self.photo)
+            self.invoke()
+        elif self.scenario.cache == "cold":
+            self._cache = self._fresh_cache()
+        self.backends.expect_content_request(self.player, self.photo, cached=self.scenario.cache == "warm")
+
+    def invoke(self) -> dict:
+        if self.scenario.handler == "authorizer":
+            event = {
+                "type": "REQUEST",
+                "methodArn": "arn:aws:execute-api:eu-west-1:123456789012:bench/v1/GET/content",
+                "headers": {"Authorization": self.player.authorization()},
+                "requestContext": {"requestId": "bench"},
+            }
+            return self.authorizer.lambda_handler(event, lambda_context())
+
+        event = {
+            "headers": {"Authorization": self.player.authorization(), "Origin": APP_URL},
+            "requestContext": {"requestId": "bench"},
+        }
+        with mock.patch.object(self.content, "_photo_cache", self._cache):
+            return self.content.lambda_handler(event, lambda_context())
+
+    def check(self, response: dict) -> None:
+        if self.scenario.handler == "authorizer":
+            effect = response["policyDocument"]["Statement"][0]["Effect"]
+            if effect != "Allow":
+                raise RuntimeError(f"{self.scenario.id}: authorizer denied the request")
+        elif response["statusCode"] != 200:
+            raise RuntimeError(f"{self.scenario.id}: status {response['statusCode']}: {response.get('body')}")
+        self.backends.assert_consumed()
+
+
+def run_scenario(scenario: Scenario, iterations: int, max_seconds: float) -> Result:
+    """
+    Time the scenario's invocations, stopping early once max_seconds are spent, then
+    measure the peak memory of one more invocation under tracemalloc.
+
+    The calibration is timed before and after the invocations, keeping the fastest.
+    """
+    backends = StubbedBackends()
+    samples = []
+    calibration_ms = calibrate()
+    with tempfile.TemporaryDirectory() as cache_dir, backends.installed(), quiet_stdout():
+        runner = ScenarioRunner(scenario, backends, cache_dir)
+        while len(samples) < iterations and (len(samples) < 3 or sum(samples) < max_seconds):
+            runner.prepare()
+            started = time.perf_counter()
+            response = runner.invoke()
+            samples.append(time.perf_counter() - started)
+            runner.check(response)
+
+        runner.prepare()
+        tracemalloc.start()
+        try:
+            runner.check(runner.invoke())
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    calibration_ms = min(calibration_ms, calibrate())
+
+    return Result(
+        scenario=scenario.id,
+        iterations=len(samples),
+        ops_per_sec=round(len(samples) / sum(samples), 2),
+        p50_ms=round(percentile(samples, 0.5) * 1000, 3),
+        p99_ms=round(percentile(samples, 0.99) * 1000, 3),
+        trimmed_ms=round(trimmed_mean(samples) * 1000, 3),
+        peak_mib=round(peak / MIB, 3),
+        calibration_ms=calibration_ms,
+    )
+
+
+def load_baselines(path: Path = BASELINES_PATH) -> Baselines:
+    if not path.exists():
+        return Baselines()
+    stored = json.loads(path.read_text())
+    return Baselines(stored.get("machine", ""), stored["results"])
+
+
+def save_baselines(results: list[Result], path: Path = BASELINES_PATH) -> None:
+    baselines = {
+        "machine": machine(),
+        "results": {result.scenario: asdict(result) for result in results},
+    }
+    path.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+
+
+def regressions(results: list[Result], baselines: Baselines, threshold: float) -> list[str]:
+    """
+    Describe every metric above its baseline by more than both the relative threshold and
+    the absolute floor of the metric.
+    """
+    found = []
+    for result in results:
+        for metric, floor in REGRESSION_FLOORS.items():
+            reference = baselines.reference(result, metric)
+            current = getattr(result, metric)
+            if reference and current - reference > max(reference * threshold, floor):
+                found.append(f"{result.scenario}: {metric} {current} vs {reference} (+{current / reference - 1:.0%})")
+    return found
+
+
+def report(results: list[Result], baselines: Baselines) -> str:
+    header = (
+        f"{'scenario':<48} {'runs':>5} {'ops/s':>9} {'p50 ms':>10} {'p99 ms':>10} {'trim ms':>10} {'peak MiB':>9} "
+        f"{'trim vs base':>13}"
+    )
+    lines = [header, "-" * len(header)]
+    for result in results:
+        reference = baselines.reference(result, "trimmed_ms")
+        delta = f"{result.trimmed_ms / reference - 1:+.0%}" if reference else "-"
+        lines.append(
+            f"{result.scenario:<48} {result.iterations:>5} {result.ops_per_sec:>9.1f} {result.p50_ms:>10.2f} "
+            f"{result.p99_ms:>10.2f} {result.trimmed_ms:>10.2f} {result.peak_mib:>9.2f} {delta:>13}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the Lambda handlers against stubbed AWS backends")
+    parser.add_argument("--matrix", choices=sorted(MATRICES), default="quick", help="Scenarios to run")
+    parser.add_argument("--filter", default="", help="Only run the scenarios whose name contains this text")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="Timed invocations per scenario")
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=DEFAULT_MAX_SECONDS,
+        help="Stop timing a scenario after this many seconds, once it ran 3 invocations",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative increase of trimmed mean latency or peak memory over the baseline flagged as a regression",
+    )
+    parser.add_argument("--check", action="store_true", help="Exit with an error when a regression is flagged")
+    parser.add_argument("--update-baselines", action="store_true", help=f"Store the results in {BASELINES_PATH.name}")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    baselines = load_baselines(BASELINES_PATH)
+
+    def run(scenario: Scenario) -> Result:
+        result = run_scenario(scenario, args.iterations, args.max_seconds)
+        print(f"  {scenario.id}: {result.trimmed_ms} ms, calibration {result.calibration_ms} ms", file=sys.stderr)
+        return result
+
+    selected = {scenario.id: scenario for scenario in scenarios(args.matrix) if args.filter in scenario.id}
+    results = {scenario_id: run(scenario) for scenario_id, scenario in selected.items()}
+    if not args.update_baselines:
+        # A regression must show on every run: flagged scenarios keep their run closest to the baseline
+        for _ in range(CONFIRM_RUNS):
+            flagged = {
+                result.scenario for result in results.values() if regressions([result], baselines, args.threshold)
+            }
+            for scenario_id in flagged:
+                rerun = run(selected[scenario_id])
+                results[scenario_id] = min(
+                    results[scenario_id],
+                    rerun,
+                    key=lambda result: result.trimmed_ms / baselines.reference(result, "trimmed_ms"),
+                )
+    results = list(results.values())
+
+    print(report(results, baselines))
+    if args.output:
+        Path(args.output).write_text(json.dumps([asdict(result) for result in results], indent=2) + "\n")
+
+    if args.update_baselines:
+        save_baselines(results, BASELINES_PATH)
+        print(f"Baselines of {len(results)} scenarios saved to {BASELINES_PATH}")
+        return 0
+
+    found = regressions(results, baselines, args.threshold)
+    same_machine = baselines.machine == machine()
+    if found and not same_machine:
+        print(f"Baselines stored on {baselines.machine or 'an unknown host'}, this is {machine()}: only warning")
+    for regression in found:
+        print(f"{'REGRESSION' if same_machine else 'WARNING'} {regression}")
+    return 1 if found and same_machine and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
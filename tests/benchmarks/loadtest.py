@@ -0,0 +1,313 @@
+"""
+Media day load test: replays synthetic family traffic against the content API.
+
+Requests follow an arrival curve, e.g. the burst right after the club
+announces the photos are ready, with a mix of valid requests, wrong DNIs,
+unknown names, retries and large archives (see traffic). They are sent on
+schedule whatever the responses take (open loop), and latencies are measured
+from the scheduled time, so requests queued behind slow ones count as slow.
+
+The target is either the handlers behind an in-process API Gateway, against
+in-memory S3 and DynamoDB, or a deployment such as LocalStack given its
+content URL. In-process, every request runs in a thread of this process, so
+the run measures the handlers under concurrency, not Lambda scaling.
+
+    PYTHONPATH=libs:. python -m tests.benchmarks.loadtest --curve announcement:50:5:20 --duration 60
+    PYTHONPATH=libs:. python -m tests.benchmarks.loadtest --url "$API_GATEWAY_URL" --populate --bucket <bucket>
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .aws_stubs import APP_URL, InMemoryBackends, Player, lambda_context
+from .handlers import KIB, percentile, quiet_stdout
+from .traffic import DEFAULT_MIX, EXPECTED_STATUS, PlannedRequest, families, parse_curve, parse_mix, plan
+
+# API Gateway caches authorizer decisions for 300 seconds unless configured otherwise
+AUTHORIZER_CACHE_TTL = 300
+
+METHOD_ARN = "arn:aws:execute-api:eu-west-1:123456789012:local/v1/GET/content"
+
+
+@dataclass
+class Response:
+    status: int
+    body_bytes: int
+
+
+@dataclass
+class Outcome:
+    at: float
+    kind: str
+    status: int | None
+    latency: float
+    body_bytes: int = 0
+    error: str | None = None
+
+    @property
+    def failed(self) -> bool:
+        return self.status != EXPECTED_STATUS[self.kind]
+
+
+class LocalGateway:
+    """
+    API Gateway in front of the handlers, in-process.
+
+    Like API Gateway, it answers 401 without an Authorization header, runs the
+    REQUEST authorizer once per header value within the cache TTL, answers 403
+    on Deny and passes the authorizer context on to the content handler.
+    """
+
+    def __init__(self, cache_ttl: float = AUTHORIZER_CACHE_TTL):
+        from services.authorizer.src import handler as authorizer
+        from services.content_service.src import handler as content
+
+        self.authorizer = authorizer
+        self.content = content
+        self.cache_ttl = cache_ttl
+        self.authorizer_calls = 0
+        self._decisions: dict[str, tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+
+    def _authorize(self, authorization: str, request_id: str) -> dict:
+        with self._lock:
+            cached = self._decisions.get(authorization)
+        if cached and time.monotonic() - cached[0] < self.cache_ttl:
+            return cached[1]
+
+        event = {
+            "type": "REQUEST",
+            "methodArn": METHOD_ARN,
+            "headers": {"Authorization": authorization},
+            "requestContext": {"requestId": request_id},
+        }
+        policy = self.authorizer.lambda_handler(event, lambda_context(request_id))
+        with self._lock:
+            self.authorizer_calls += 1
+            self._decisions[authorization] = (time.monotonic(), policy)
+        return policy
+
+    def get(self, path: str, headers: dict[str, str]) -> Response:
+        handler = {"/content": self.content.lambda_handler, "/content/preview": self.content.preview_handler}.get(path)
+        if handler is None:
+            return Response(404, 0)
+        if not headers.get("Authorization"):
+            return Response(401, 0)
+
+        request_id = str(uuid.uuid4())
+        policy = self._authorize(headers["Authorization"], request_id)
+        if policy["policyDocument"]["Statement"][0]["Effect"] != "Allow":
+            return Response(403, 0)
+
+        event = {
+            "resource": path,
+            "path": path,
+            "httpMethod": "GET",
+            "headers": headers,
+            "queryStringParameters": None,
+            "requestContext": {
+                "requestId": request_id,
+                "authorizer": {**policy.get("context", {}), "principalId": policy["principalId"]},
+            },
+        }
+        response = handler(event, lambda_context(request_id))
+        body = response.get("body") or ""
+        # Decoding large archives would slow the handlers down, base64 takes 4 characters per 3 bytes
+        return Response(response["statusCode"], len(body) * 3 // 4 if response.get("isBase64Encoded") else len(body))
+
+
+class HttpTarget:
+    """The content API of a deployment, such as LocalStack."""
+
+    def __init__(self, url: str, concurrency: int, timeout: float = 60.0):
+        import requests
+
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, path: str, headers: dict[str, str]) -> Response:
+        response = self.session.get(self.url, headers=headers, timeout=self.timeout)
+        return Response(response.status_code, len(response.content))
+
+
+def populate_deployment(players: list[Player], photo: bytes, table_name: str, bucket: str) -> None:
+    """Write the players and their photos to the users table and content bucket of a deployment."""
+    import boto3
+
+    s3 = boto3.client("s3")
+    table = boto3.resource("dynamodb").Table(table_name)
+    with table.batch_writer() as batch:
+        for player in players:
+            photo_objects = {}
+            for key in player.photo_keys:
+                etag = s3.put_object(Bucket=bucket, Key=key, Body=photo, ContentType="image/jpeg")["ETag"].strip('"')
+                photo_objects[key] = {"size": len(photo), "etag": etag}
+            batch.put_item(
+                Item={
+                    "username": player.username,
+                    "dnis": [player.dni],
+                    "photos": player.photo_keys,
+                    "photo_objects": photo_objects,
+                }
+            )
+
+
+def run(requests: list[PlannedRequest], send: Callable[[PlannedRequest], Response], concurrency: int) -> list[Outcome]:
+    """
+    Send the requests on schedule from a pool of concurrency workers.
+
+    Latencies are measured from the scheduled time, so they include the time
+    spent waiting for a free worker when the target falls behind.
+    """
+    outcomes = []
+    start = time.perf_counter()
+
+    def send_at(request: PlannedRequest) -> None:
+        scheduled = start + request.at
+        try:
+            response = send(request)
+            outcome = Outcome(request.at, request.kind, response.status, 0.0, response.body_bytes)
+        except Exception as e:
+            outcome = Outcome(request.at, request.kind, None, 0.0, error=type(e).__name__)
+        outcome.latency = time.perf_counter() - scheduled
+        outcomes.append(outcome)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for request in requests:
+            delay = start + request.at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send_at, request)
+
+    return sorted(outcomes, key=lambda outcome: outcome.at)
+
+
+def summarize(outcomes: list[Outcome]) -> dict:
+    latencies = [outcome.latency * 1000 for outcome in outcomes]
+    return {
+        "requests": len(outcomes),
+        "errors": sum(outcome.failed for outcome in outcomes),
+        "server_errors": sum(outcome.status is None or outcome.status >= 500 for outcome in outcomes),
+        "p50_ms": round(percentile(latencies, 0.50), 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 1) if latencies else None,
+        "mib": round(sum(outcome.body_bytes for outcome in outcomes) / KIB / KIB, 1),
+    }
+
+
+def windows(outcomes: list[Outcome], window: float) -> list[dict]:
+    """Summaries of the requests sent in each window of the run."""
+    grouped = defaultdict(list)
+    for outcome in outcomes:
+        grouped[int(outcome.at // window)].append(outcome)
+    return [
+        {"start": index * window, "rate": round(len(grouped[index]) / window, 1), **summarize(grouped[index])}
+        for index in range(max(grouped) + 1 if grouped else 0)
+    ]
+
+
+def by_kind(outcomes: list[Outcome]) -> dict[str, dict]:
+    grouped = defaultdict(list)
+    for outcome in outcomes:
+        grouped[outcome.kind].append(outcome)
+    return {kind: summarize(grouped[kind]) for kind in sorted(grouped)}
+
+
+def report(outcomes: list[Outcome], window: float, elapsed: float) -> str:
+    def row(label: str, summary: dict, rate: float) -> str:
+        error_rate = summary["errors"] / summary["requests"] if summary["requests"] else 0
+        return (
+            f"{label:<14} {summary['requests']:>8} {rate:>8.1f} {error_rate:>8.1%} {summary['server_errors']:>6} "
+            f"{summary['p50_ms'] or 0:>9.1f} {summary['p95_ms'] or 0:>9.1f} {summary['p99_ms'] or 0:>9.1f}"
+        )
+
+    header = f"{'':<14} {'requests':>8} {'req/s':>8} {'errors':>8} {'5xx':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    lines = ["Over time (by send time)", header]
+    lines += [row(f"{entry['start']:>6.0f}s", entry, entry["rate"]) for entry in windows(outcomes, window)]
+    lines += ["", "By kind", header]
+    lines += [row(kind, summary, summary["requests"] / elapsed) for kind, summary in by_kind(outcomes).items()]
+    lines += ["", "Total", header, row("all", summarize(outcomes), len(outcomes) / elapsed)]
+    return "\n".join(lines)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay media day traffic against the content API")
+    parser.add_argument(
+        "--curve",
+        default="announcement:50:5:20",
+        help="Arrival curve in requests per second: constant:RATE, ramp:START:END:SECONDS or "
+        "announcement:PEAK:BASELINE:HALF_LIFE",
+    )
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of traffic")
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help="Request mix as kind=weight,... of valid, wrong_dni, unknown_name, retry and large_archive",
+    )
+    parser.add_argument("--families", type=int, default=300, help="Players of the club")
+    parser.add_argument("--large-share", type=float, default=0.05, help="Share of the players with large archives")
+    parser.add_argument("--photo-size", type=int, default=100 * KIB, help="Bytes per photo")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requests in flight at most")
+    parser.add_argument("--window", type=float, default=5.0, help="Seconds per line of the report over time")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated traffic")
+    parser.add_argument("--url", help="Content URL of a deployment, instead of the in-process handlers")
+    parser.add_argument("--populate", action="store_true", help="Write the players and photos to the deployment")
+    parser.add_argument("--table", default="users", help="Users table of the deployment")
+    parser.add_argument("--bucket", help="Content bucket of the deployment")
+    parser.add_argument("--output", help="Also write every outcome as JSON to this file")
+    args = parser.parse_args(argv)
+    if args.populate and not (args.url and args.bucket):
+        parser.error("--populate needs --url and --bucket")
+    return args
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    players = families(args.families, args.large_share, args.photo_size, rng)
+    photo = players[0].make_photo()
+    requests = plan(players, parse_curve(args.curve), args.duration, args.mix, args.seed)
+    print(f"Replaying {len(requests)} requests of {len(players)} families over {args.duration:.0f}s", file=sys.stderr)
+
+    def send(request: PlannedRequest) -> Response:
+        return target.get("/content", {"Authorization": request.authorization, "Origin": APP_URL})
+
+    if args.url:
+        if args.populate:
+            populate_deployment(players, photo, args.table, args.bucket)
+        target = HttpTarget(args.url, args.concurrency)
+        started = time.perf_counter()
+        outcomes = run(requests, send, args.concurrency)
+    else:
+        backends = InMemoryBackends()
+        for player in players:
+            backends.add_player(player, photo)
+        with backends.installed(), quiet_stdout():
+            target = LocalGateway()
+            started = time.perf_counter()
+            outcomes = run(requests, send, args.concurrency)
+    elapsed = time.perf_counter() - started
+
+    print(report(outcomes, args.window, elapsed))
+    if args.output:
+        Path(args.output).write_text(json.dumps([asdict(outcome) for outcome in outcomes]) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,284 @@
+"""
+Memory sizing of the content Lambda.
+
+Runs lambda_handler once per scenario of a matrix of photo counts and sizes,
+each in a fresh process against stubbed S3 and DynamoDB, measuring its peak
+RSS, its tracemalloc peak and its CPU time. From these it estimates, for every
+Lambda memory tier, the largest archive served safely and the latency of each
+scenario, and recommends the smallest setting serving every archive that fits
+in a Lambda response within a target latency.
+
+On Lambda the memory setting also sets the CPU share: a full vCPU at 1769 MB,
+proportionally less below. Building the archive is single threaded, so the
+CPU time measured here is scaled by 1769 / memory below it and kept as is
+above. S3 downloads are not measured, as the stubs answer at once, so their
+time is estimated from an assumed S3 throughput.
+
+    PYTHONPATH=libs:. python -m tests.benchmarks.sizing [--matrix quick] [--output sizing.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from unittest import mock
+
+from .aws_stubs import APP_URL, Player, StubbedBackends, lambda_context
+from .handlers import KIB, MIB, PHOTO_SIZES, quiet_stdout
+
+MEMORY_TIERS = (128, 256, 512, 1024, 1769, 3008, 10240)
+
+# Memory at which Lambda allocates a full vCPU
+FULL_VCPU_MB = 1769
+
+# Share of the memory setting kept free for the runtime and fragmentation
+MEMORY_HEADROOM = 0.2
+
+# API Gateway gives up on the integration after 29 seconds
+LATENCY_BUDGET_SECONDS = 29.0
+
+# Synchronous Lambda responses, headers and base64 body included, are limited to 6 MB
+MAX_RESPONSE_BYTES = 6 * 1000 * 1000
+
+DEFAULT_S3_MIB_PER_SEC = 80.0
+
+# Estimated latency the recommended memory setting keeps every returnable archive within
+DEFAULT_TARGET_SECONDS = 1.0
+
+MATRICES = {
+    "quick": {"counts": (1, 10, 50), "sizes": ("100KB", "1MB")},
+    "full": {"counts": (1, 10, 50, 100, 200), "sizes": ("100KB", "1MB", "10MB")},
+}
+
+DEFAULT_MAX_ARCHIVE_MIB = 256
+
+
+@dataclass
+class Measurement:
+    photo_count: int
+    photo_size: int
+    archive_bytes: int
+    response_bytes: int
+    status: int
+    baseline_rss_mib: float
+    peak_rss_mib: float
+    tracemalloc_peak_mib: float
+    cpu_seconds: float
+    wall_seconds: float
+
+    @property
+    def label(self) -> str:
+        return f"{self.photo_count} x {self.photo_size // KIB}KB"
+
+    @property
+    def memory_mib(self) -> float:
+        """Peak RSS of the invocation as on Lambda, without the photo held by the stubs."""
+        return self.peak_rss_mib - self.photo_size / MIB
+
+    @property
+    def fits_response(self) -> bool:
+        return self.response_bytes <= MAX_RESPONSE_BYTES
+
+
+def _max_rss_mib() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / KIB
+
+
+def measure(photo_count: int, photo_size: int) -> Measurement:
+    """
+    Run one content request, meant to run in a process of its own so its peak RSS is the request's.
+    """
+    from services.content_service.src import handler as content
+
+    player = Player("SizingPlayer", "12345678Z", photo_count, photo_size)
+    backends = StubbedBackends()
+    backends.expect_content_request(player, player.make_photo())
+    event = {"headers": {"Authorization": player.authorization(), "Origin": APP_URL}}
+
+    with tempfile.TemporaryDirectory() as cache_dir, backends.installed(), quiet_stdout():
+        cache = content.PhotoCache(cache_dir, content.PHOTO_CACHE_MAX_BYTES)
+        with mock.patch.object(content, "_photo_cache", cache):
+            baseline_rss = _max_rss_mib()
+            tracemalloc.start()
+            cpu_started, wall_started = time.process_time(), time.perf_counter()
+            try:
+                response = content.lambda_handler(event, lambda_context())
+                cpu_seconds, wall_seconds = time.process_time() - cpu_started, time.perf_counter() - wall_started
+                _, traced_peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            peak_rss = _max_rss_mib()
+
+    return Measurement(
+        photo_count=photo_count,
+        photo_size=photo_size,
+        archive_bytes=photo_count * photo_size,
+        response_bytes=len(json.dumps(response)),
+        status=response["statusCode"],
+        baseline_rss_mib=round(baseline_rss, 1),
+        peak_rss_mib=round(peak_rss, 1),
+        tracemalloc_peak_mib=round(traced_peak / MIB, 1),
+        cpu_seconds=round(cpu_seconds, 3),
+        wall_seconds=round(wall_seconds, 3),
+    )
+
+
+def measure_isolated(photo_count: int, photo_size: int) -> Measurement:
+    """Measure a scenario in a fresh process."""
+    with multiprocessing.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(measure, (photo_count, photo_size))
+
+
+def estimated_latency(measurement: Measurement, memory_mb: int, s3_mib_per_sec: float) -> float:
+    cpu_share = min(memory_mb / FULL_VCPU_MB, 1.0)
+    return measurement.cpu_seconds / cpu_share + measurement.archive_bytes / MIB / s3_mib_per_sec
+
+
+def is_safe(measurement: Measurement, memory_mb: int, s3_mib_per_sec: float) -> bool:
+    """Whether the tier serves the scenario within its memory, with headroom, and the latency budget."""
+    return (
+        measurement.status == 200
+        and measurement.memory_mib <= memory_mb * (1 - MEMORY_HEADROOM)
+        and estimated_latency(measurement, memory_mb, s3_mib_per_sec) <= LATENCY_BUDGET_SECONDS
+    )
+
+
+def sizing(
+    measurements: list[Measurement],
+    s3_mib_per_sec: float = DEFAULT_S3_MIB_PER_SEC,
+    target_seconds: float = DEFAULT_TARGET_SECONDS,
+) -> dict:
+    """
+    Per memory tier, the largest archive served safely and the estimated latencies,
+    and the recommended tier.
+
+    The recommendation is the smallest tier serving every archive small enough to
+    be returned in a Lambda response safely and within target_seconds. None when
+    no tier does.
+    """
+    returnable = [m for m in measurements if m.fits_response]
+    tiers = []
+    for memory_mb in MEMORY_TIERS:
+        safe = [m for m in measurements if is_safe(m, memory_mb, s3_mib_per_sec)]
+        largest = max(safe, key=lambda m: m.archive_bytes, default=None)
+        tiers.append(
+            {
+                "memory_mb": memory_mb,
+                "max_safe_archive_mib": round(largest.archive_bytes / MIB, 1) if largest else 0,
+                "serves_all": len(safe) == len(measurements),
+                "safe": [m.label for m in safe],
+                "latency_seconds": {
+                    m.label: round(estimated_latency(m, memory_mb, s3_mib_per_sec), 2) for m in measurements
+                },
+            }
+        )
+
+    recommended = next(
+        (
+            tier["memory_mb"]
+            for tier in tiers
+            if all(m.label in tier["safe"] and tier["latency_seconds"][m.label] <= target_seconds for m in returnable)
+        ),
+        None,
+    )
+
+    return {
+        "tiers": tiers,
+        "recommended_memory_mb": recommended,
+        "target_seconds": target_seconds,
+        "max_returnable_archive_mib": round(max((m.archive_bytes for m in returnable), default=0) / MIB, 1),
+    }
+
+
+def report(measurements: list[Measurement], result: dict) -> str:
+    lines = [
+        f"{'scenario':<14} {'archive MiB':>11} {'response MB':>11} {'RSS MiB':>8} {'traced MiB':>10} {'CPU s':>7}",
+    ]
+    for m in measurements:
+        note = "" if m.fits_response else "  exceeds the 6 MB Lambda response limit"
+        lines.append(
+            f"{m.label:<14} {m.archive_bytes / MIB:>11.1f} {m.response_bytes / 1e6:>11.1f} {m.memory_mib:>8.1f} "
+            f"{m.tracemalloc_peak_mib:>10.1f} {m.cpu_seconds:>7.3f}{note}"
+        )
+
+    tiers = result["tiers"]
+    lines += ["", "Estimated latency in seconds per memory tier, * when not served safely"]
+    lines.append(f"{'memory MB':<14} " + " ".join(f"{tier['memory_mb']:>8}" for tier in tiers))
+    lines.append(f"{'max safe MiB':<14} " + " ".join(f"{tier['max_safe_archive_mib']:>8.1f}" for tier in tiers))
+    for m in measurements:
+        cells = []
+        for tier in tiers:
+            mark = "" if m.label in tier["safe"] else "*"
+            cells.append(f"{tier['latency_seconds'][m.label]:.2f}{mark}".rjust(8))
+        lines.append(f"{m.label:<14} " + " ".join(cells))
+    lines.append("")
+    if result["recommended_memory_mb"]:
+        lines.append(
+            f"Recommended memory_size: {result['recommended_memory_mb']} MB, serving every archive up to "
+            f"{result['max_returnable_archive_mib']} MiB, the largest that fits in a Lambda response, "
+            f"within {result['target_seconds']}s"
+        )
+    else:
+        lines.append(
+            f"No memory tier serves every archive that fits in a Lambda response within {result['target_seconds']}s"
+        )
+    serving_all = next((tier["memory_mb"] for tier in tiers if tier["serves_all"]), None)
+    if serving_all and serving_all != result["recommended_memory_mb"]:
+        lines.append(f"Building every archive measured, whatever its response size, needs {serving_all} MB")
+    return "\n".join(lines)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Size the memory of the content Lambda")
+    parser.add_argument("--matrix", choices=sorted(MATRICES), default="full", help="Scenarios to run")
+    parser.add_argument(
+        "--max-archive-mib",
+        type=float,
+        default=DEFAULT_MAX_ARCHIVE_MIB,
+        help="Skip the scenarios with bigger archives, which need that much memory several times over",
+    )
+    parser.add_argument(
+        "--s3-mib-per-sec",
+        type=float,
+        default=DEFAULT_S3_MIB_PER_SEC,
+        help="Assumed S3 download throughput of the Lambda, for the latency estimates",
+    )
+    parser.add_argument(
+        "--target-seconds",
+        type=float,
+        default=DEFAULT_TARGET_SECONDS,
+        help="Estimated latency the recommended setting keeps every returnable archive within",
+    )
+    parser.add_argument("--output", help="Also write the measurements and sizing as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    spec = MATRICES[args.matrix]
+
+    measurements = []
+    for count in spec["counts"]:
+        for size in spec["sizes"]:
+            if count * PHOTO_SIZES[size] > args.max_archive_mib * MIB:
+                continue
+            measurements.append(measure_isolated(count, PHOTO_SIZES[size]))
+            print(f"  {measurements[-1].label}: {measurements[-1].memory_mib:.1f} MiB", file=sys.stderr)
+
+    result = sizing(measurements, args.s3_mib_per_sec, args.target_seconds)
+    print(report(measurements, result))
+    if args.output:
+        output = {"measurements": [asdict(m) for m in measurements], **result}
+        Path(args.output).write_text(json.dumps(output, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
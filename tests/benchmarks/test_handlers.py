@@ -0,0 +1,141 @@
+"""
+Unit tests for the handler benchmarks.
+"""
+
+import json
+
+import pytest
+
+from . import handlers
+from .handlers import Baselines, Result, Scenario
+
+
+def result(scenario="authorizer", trimmed_ms=10.0, peak_mib=1.0, calibration_ms=0.0):
+    return Result(
+        scenario=scenario,
+        iterations=5,
+        ops_per_sec=100.0,
+        p50_ms=trimmed_ms,
+        p99_ms=20.0,
+        trimmed_ms=trimmed_ms,
+        peak_mib=peak_mib,
+        calibration_ms=calibration_ms,
+    )
+
+
+class TestScenarios:
+    def test_skips_archives_too_big_for_memory(self, monkeypatch):
+        monkeypatch.setitem(handlers.MATRICES, "test", {"counts": (1, 100), "sizes": ("10MB",), "caches": ("cold",)})
+
+        ids = [scenario.id for scenario in handlers.scenarios("test")]
+
+        assert ids == ["authorizer", "content photos=1 size=10MB cache=cold"]
+
+    @pytest.mark.parametrize(
+        "scenario",
+        [
+            Scenario("authorizer"),
+            Scenario("content", 3, "100KB", "cold"),
+            Scenario("content", 3, "100KB", "warm"),
+        ],
+        ids=lambda scenario: scenario.id,
+    )
+    def test_runs_against_the_stubbed_backends(self, scenario):
+        measured = handlers.run_scenario(scenario, iterations=3, max_seconds=5)
+
+        assert measured.scenario == scenario.id
+        assert measured.iterations == 3
+        assert 0 < measured.p50_ms <= measured.p99_ms
+        assert 0 < measured.trimmed_ms <= measured.p99_ms
+        assert measured.peak_mib > 0
+        assert measured.calibration_ms > 0
+
+
+class TestBaselines:
+    BASELINES = Baselines(
+        "Linux x86_64 Python 3.12.1", {"authorizer": {"trimmed_ms": 10.0, "peak_mib": 1.0, "calibration_ms": 5.0}}
+    )
+
+    def test_flags_slower_and_bigger_results(self):
+        baselines = self.BASELINES
+
+        assert handlers.regressions([result(trimmed_ms=12.0, peak_mib=1.2)], baselines, 0.25) == []
+        assert handlers.regressions([result(trimmed_ms=20.0, peak_mib=1.0)], baselines, 0.25) == [
+            "authorizer: trimmed_ms 20.0 vs 10.0 (+100%)"
+        ]
+        assert len(handlers.regressions([result(trimmed_ms=20.0, peak_mib=2.0)], baselines, 0.25)) == 2
+
+    def test_scales_latencies_up_on_a_slower_host(self):
+        slower_host = handlers.regressions(
+            [result(trimmed_ms=20.0, peak_mib=2.0, calibration_ms=10.0)], self.BASELINES, 0.25
+        )
+        faster_host = handlers.regressions([result(trimmed_ms=12.0, calibration_ms=2.5)], self.BASELINES, 0.25)
+
+        assert slower_host == ["authorizer: peak_mib 2.0 vs 1.0 (+100%)"]
+        assert faster_host == []
+        assert handlers.regressions([result(trimmed_ms=13.0, calibration_ms=2.5)], self.BASELINES, 0.25) == [
+            "authorizer: trimmed_ms 13.0 vs 10.0 (+30%)"
+        ]
+        assert self.BASELINES.reference(result(calibration_ms=0.0), "trimmed_ms") == 10.0
+
+    def test_ignores_differences_below_the_floor(self):
+        baselines = Baselines("", {"authorizer": {"trimmed_ms": 0.3, "peak_mib": 0.01}})
+
+        assert handlers.regressions([result(trimmed_ms=0.45, peak_mib=0.05)], baselines, 0.25) == []
+        assert handlers.regressions([result(trimmed_ms=0.55, peak_mib=0.01)], baselines, 0.25) == [
+            "authorizer: trimmed_ms 0.55 vs 0.3 (+83%)"
+        ]
+
+    def test_trimmed_mean_drops_the_outliers(self):
+        assert handlers.trimmed_mean([1.0, 2.0, 2.0, 2.0, 2.0, 2.0, 2.0, 50.0]) == 2.0
+        assert handlers.trimmed_mean([1.0, 3.0]) == 2.0
+
+    def test_ignores_scenarios_without_baseline(self):
+        scenario = "content photos=1 size=1MB cache=cold"
+        assert handlers.regressions([result(scenario, trimmed_ms=1e6)], Baselines(), 0.25) == []
+
+    @pytest.fixture
+    def stored(self, monkeypatch, tmp_path):
+        """Baselines of an authorizer scenario 0.5 ms fast, stored on this host."""
+        path = tmp_path / "baselines.json"
+        handlers.save_baselines([result(trimmed_ms=0.5)], path)
+        monkeypatch.setattr(handlers, "BASELINES_PATH", path)
+        return path
+
+    def test_only_fails_on_regressions_of_every_run(self, monkeypatch, stored, capsys):
+        runs = iter([result(trimmed_ms=2.0), result(trimmed_ms=0.6)])
+        monkeypatch.setattr(handlers, "run_scenario", lambda scenario, iterations, max_seconds: next(runs))
+
+        assert handlers.main(["--filter", "authorizer", "--check"]) == 0
+        assert "REGRESSION" not in capsys.readouterr().out
+
+        monkeypatch.setattr(handlers, "run_scenario", lambda scenario, iterations, max_seconds: result(trimmed_ms=2.0))
+        assert handlers.main(["--filter", "authorizer", "--check"]) == 1
+        assert "REGRESSION authorizer: trimmed_ms" in capsys.readouterr().out
+
+    def test_only_warns_on_baselines_of_another_host(self, monkeypatch, stored, capsys):
+        monkeypatch.setattr(handlers, "run_scenario", lambda scenario, iterations, max_seconds: result())
+        monkeypatch.setattr(handlers, "machine", lambda: "Darwin arm64 Python 3.13.0")
+
+        assert handlers.main(["--filter", "authorizer", "--check"]) == 0
+        assert "WARNING authorizer: trimmed_ms" in capsys.readouterr().out
+
+    def test_calibration_times_the_fixed_workload(self):
+        assert handlers.calibrate(rounds=3) > 0
+
+    def test_round_trip(self, tmp_path):
+        path = tmp_path / "baselines.json"
+
+        handlers.save_baselines([result(calibration_ms=5.0)], path)
+
+        baselines = handlers.load_baselines(path)
+        assert baselines.results["authorizer"]["trimmed_ms"] == 10.0
+        assert baselines.results["authorizer"]["calibration_ms"] == 5.0
+        assert baselines.machine == handlers.machine()
+        assert "machine" in json.loads(path.read_text())
+
+    def test_committed_baselines_cover_the_quick_matrix(self):
+        baselines = handlers.load_baselines()
+
+        assert {scenario.id for scenario in handlers.scenarios("quick")} <= set(baselines.results)
+        assert all(baseline["calibration_ms"] > 0 for baseline in baselines.results.values())
@@ -0,0 +1,111 @@
+"""
+Unit tests for the load test traffic and local API Gateway.
+"""
+
+import random
+
+import pytest
+
+from . import loadtest, traffic
+from .aws_stubs import APP_URL, InMemoryBackends
+
+
+@pytest.fixture
+def players():
+    return traffic.families(20, 0.1, 1024, random.Random(0))
+
+
+@pytest.fixture
+def gateway(players):
+    backends = InMemoryBackends()
+    for player in players:
+        backends.add_player(player, player.make_photo())
+    with backends.installed(), loadtest.quiet_stdout():
+        yield loadtest.LocalGateway()
+
+
+class TestTraffic:
+    def test_curves(self):
+        assert traffic.parse_curve("constant:20")(30) == 20
+        assert traffic.parse_curve("ramp:10:50:40")(20) == 30
+        burst = traffic.parse_curve("announcement:100:10:5")
+        assert burst(0) == 100
+        assert burst(5) == 55
+
+        with pytest.raises(ValueError):
+            traffic.parse_curve("sine:1")
+        with pytest.raises(ValueError):
+            traffic.parse_curve("ramp:1")
+
+    def test_parse_mix(self):
+        assert traffic.parse_mix("valid=0.9, wrong_dni=0.1") == {"valid": 0.9, "wrong_dni": 0.1}
+        with pytest.raises(ValueError):
+            traffic.parse_mix("valid=0.9,forged=0.1")
+
+    def test_arrivals_follow_the_curve(self):
+        times = traffic.arrivals(traffic.announcement(100, 0, 5), 60, random.Random(1))
+
+        assert 600 < len(times) < 850  # 100 * 5 / ln(2) expected
+        assert sum(t < 5 for t in times) > 2 * sum(10 <= t < 15 for t in times)
+
+    def test_plan_is_reproducible(self, players):
+        curve = traffic.constant(20)
+
+        requests = traffic.plan(players, curve, 30, seed=7)
+
+        assert requests == traffic.plan(players, curve, 30, seed=7)
+        assert [request.at for request in requests] == sorted(request.at for request in requests)
+        assert {request.kind for request in requests} == set(traffic.EXPECTED_STATUS)
+
+    def test_retries_follow_a_valid_request_of_the_same_family(self, players):
+        requests = traffic.plan(players, traffic.constant(5), 60, mix={"retry": 1}, seed=3)
+
+        for retry in (request for request in requests if request.kind == "retry"):
+            assert any(
+                request.kind == "valid" and request.authorization == retry.authorization and request.at < retry.at
+                for request in requests
+            )
+
+    def test_large_archives_come_from_large_families(self, players):
+        requests = traffic.plan(players, traffic.constant(5), 10, mix={"large_archive": 1}, seed=3)
+        large = {player.username for player in players if player.photo_count >= traffic.LARGE_PHOTOS[0]}
+
+        assert requests and {request.username for request in requests} <= large
+
+
+class TestLocalGateway:
+    def test_answers_like_api_gateway(self, gateway, players):
+        player = players[-1]
+
+        assert gateway.get("/content", {"Authorization": player.authorization(), "Origin": APP_URL}).status == 200
+        assert gateway.get("/content", {"Authorization": player.authorization(dni="00000000T")}).status == 403
+        assert gateway.get("/content", {"Authorization": player.authorization(username="Nobody")}).status == 403
+        assert gateway.get("/content", {}).status == 401
+        assert gateway.get("/photos", {}).status == 404
+
+    def test_caches_authorizer_decisions(self, gateway, players):
+        headers = {"Authorization": players[-1].authorization(), "Origin": APP_URL}
+
+        responses = [gateway.get("/content", headers) for _ in range(3)]
+
+        assert [response.status for response in responses] == [200, 200, 200]
+        assert responses[0].body_bytes > players[-1].photo_count * 1024
+        assert gateway.authorizer_calls == 1
+
+    def test_replays_a_run_without_errors(self, gateway, players):
+        requests = traffic.plan(players, traffic.constant(40), 1, seed=1)
+
+        outcomes = loadtest.run(
+            requests, lambda request: gateway.get("/content", {"Authorization": request.authorization}), 8
+        )
+
+        assert len(outcomes) == len(requests)
+        assert not [outcome for outcome in outcomes if outcome.failed]
+        assert loadtest.summarize(outcomes)["errors"] == 0
+        assert "Over time" in loadtest.report(outcomes, 0.5, 1.0)
+
+
+def test_outcome_failures():
+    assert loadtest.Outcome(0, "wrong_dni", 403, 0.1).failed is False
+    assert loadtest.Outcome(0, "valid", 403, 0.1).failed is True
+    assert loadtest.Outcome(0, "valid", None, 0.1, error="ConnectionError").failed is True
@@ -0,0 +1,67 @@
+"""
+Unit tests for the memory sizing of the content Lambda.
+"""
+
+import pytest
+
+from . import sizing
+from .handlers import KIB, MIB
+from .sizing import Measurement
+
+
+def measurement(photo_count, photo_size, memory_mib, cpu_seconds, response_bytes=None):
+    archive_bytes = photo_count * photo_size
+    return Measurement(
+        photo_count=photo_count,
+        photo_size=photo_size,
+        archive_bytes=archive_bytes,
+        response_bytes=response_bytes if response_bytes is not None else archive_bytes * 4 // 3,
+        status=200,
+        baseline_rss_mib=50.0,
+        peak_rss_mib=memory_mib + photo_size / MIB,
+        tracemalloc_peak_mib=memory_mib - 50.0,
+        cpu_seconds=cpu_seconds,
+        wall_seconds=cpu_seconds,
+    )
+
+
+class TestSizing:
+    def test_scales_cpu_time_with_the_memory_setting(self):
+        m = measurement(10, 100 * KIB, 60, 0.1)
+
+        assert sizing.estimated_latency(m, sizing.FULL_VCPU_MB, s3_mib_per_sec=1e9) == pytest.approx(0.1)
+        assert sizing.estimated_latency(m, 3008, s3_mib_per_sec=1e9) == pytest.approx(0.1)
+        assert sizing.estimated_latency(m, 128, s3_mib_per_sec=1e9) == pytest.approx(0.1 * 1769 / 128)
+        assert sizing.estimated_latency(m, 3008, s3_mib_per_sec=1) == pytest.approx(0.1 + m.archive_bytes / MIB)
+
+    def test_tiers_and_recommendation(self):
+        small = measurement(1, 100 * KIB, 60, 0.005)
+        medium = measurement(10, 100 * KIB, 110, 0.02)
+        large = measurement(50, 1024 * KIB, 300, 0.4)
+
+        result = sizing.sizing([small, medium, large], s3_mib_per_sec=1e9, target_seconds=0.1)
+        tiers = {tier["memory_mb"]: tier for tier in result["tiers"]}
+
+        # 110 MiB exceeds 128 MB less the headroom
+        assert tiers[128]["safe"] == [small.label]
+        assert tiers[256]["safe"] == [small.label, medium.label]
+        assert tiers[512]["max_safe_archive_mib"] == 50.0
+        assert not tiers[256]["serves_all"] and tiers[512]["serves_all"]
+        # The large archive does not fit in a response, the medium one takes 0.02 * 1769 / 256 s at 256 MB
+        assert result["max_returnable_archive_mib"] == round(medium.archive_bytes / MIB, 1)
+        assert result["recommended_memory_mb"] == 512
+
+    def test_no_recommendation_when_nothing_is_served(self):
+        huge = measurement(1, 100 * KIB, 20000, 0.005)
+
+        assert sizing.sizing([huge])["recommended_memory_mb"] is None
+        assert "No memory tier" in sizing.report([huge], sizing.sizing([huge]))
+
+    def test_measures_a_request_in_a_fresh_process(self):
+        m = sizing.measure_isolated(2, 100 * KIB)
+
+        assert m.status == 200
+        assert m.response_bytes > m.archive_bytes
+        assert m.peak_rss_mib >= m.baseline_rss_mib > 0
+        assert m.tracemalloc_peak_mib > 0.2
+        assert m.cpu_seconds > 0
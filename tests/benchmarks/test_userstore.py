@@ -0,0 +1,53 @@
+"""
+Unit tests for the users table read benchmark.
+"""
+
+from decimal import Decimal
+
+from . import userstore
+from .aws_stubs import Player
+
+
+def plain(value):
+    """A value of the resource layer with its Decimals as the numbers UserStore decodes."""
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, list):
+        return [plain(element) for element in value]
+    if isinstance(value, dict):
+        return {name: plain(element) for name, element in value.items()}
+    return value
+
+
+class TestUserStoreBenchmark:
+    def test_readers_return_the_same_user(self):
+        player = Player("Juan", "12345678Z", 3, 100)
+        _, table, store = userstore.backends_with_clients([player])
+        reads = {reader: read("Juan") for reader, (_, read) in userstore.readers(table, store).items()}
+
+        resource = plain(reads["resource"])
+        record = reads["store"]
+        assert {name: record[name] for name in resource} == resource
+        assert reads["store authorizer"].dnis == ["12345678Z"] and "photos" not in reads["store authorizer"]
+        assert reads["store content"].photo_objects == resource["photo_objects"]
+        assert "dnis" not in reads["store content"]
+
+    def test_reports_sizes_and_read_units(self):
+        results = userstore.run(counts=(1, 200), iterations=5)
+
+        assert [(result.photo_count, result.reader) for result in results] == [
+            (count, reader)
+            for count in (1, 200)
+            for reader in ("resource", "store", "store authorizer", "store content")
+        ]
+        by_reader = {(result.photo_count, result.reader): result for result in results}
+        assert by_reader[(1, "resource")].speedup == 1.0
+        # Projecting the DNIs keeps the read of a big item to half a unit
+        assert by_reader[(200, "resource")].read_units > 0.5
+        assert by_reader[(200, "store authorizer")].read_units == 0.5
+        assert by_reader[(200, "store authorizer")].item_bytes < 50
+        assert "vs resource" in userstore.report(results)
+
+    def test_item_size(self):
+        assert userstore.item_size({"username": {"S": "Ana"}}) == 11
+        assert userstore.item_size({"n": {"N": "12345"}, "l": {"L": [{"S": "ab"}]}}) == 1 + 4 + 1 + 3 + 1 + 2
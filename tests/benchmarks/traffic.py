@@ -0,0 +1,162 @@
+"""
+Synthetic media day traffic: the families, the request mix and the arrival curve.
+
+A plan is the list of requests of a run, each with the time it is sent at,
+drawn from a seeded random generator so a run can be replayed exactly.
+"""
+
+import math
+import random
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from .aws_stubs import Player
+
+# Request kinds, with the status API Gateway answers them with
+EXPECTED_STATUS = {
+    "valid": 200,
+    "wrong_dni": 403,
+    "unknown_name": 403,
+    "retry": 200,
+    "large_archive": 200,
+}
+
+DEFAULT_MIX = {
+    "valid": 0.70,
+    "wrong_dni": 0.08,
+    "unknown_name": 0.05,
+    "retry": 0.12,
+    "large_archive": 0.05,
+}
+
+# Photos of a regular player, and of the players with large archives
+REGULAR_PHOTOS = (3, 30)
+LARGE_PHOTOS = (150, 200)
+
+# Retried requests are re-sent up to this many times, this many seconds apart
+MAX_RETRIES = 3
+RETRY_DELAY = (1.0, 5.0)
+
+# Arrival rate in requests per second at a number of seconds into the run
+ArrivalCurve = Callable[[float], float]
+
+
+@dataclass(frozen=True)
+class PlannedRequest:
+    at: float
+    kind: str
+    username: str
+    authorization: str
+
+    @property
+    def expected_status(self) -> int:
+        return EXPECTED_STATUS[self.kind]
+
+
+def constant(rate: float) -> ArrivalCurve:
+    return lambda t: rate
+
+
+def ramp(start: float, end: float, duration: float) -> ArrivalCurve:
+    """Rate growing linearly from start to end over duration seconds, then staying at end."""
+    return lambda t: start + (end - start) * min(t / duration, 1.0)
+
+
+def announcement(peak: float, baseline: float, half_life: float) -> ArrivalCurve:
+    """
+    The burst after the club announces the photos are ready: the peak rate at
+    once, decaying exponentially towards the baseline.
+    """
+    return lambda t: baseline + (peak - baseline) * math.pow(0.5, t / half_life)
+
+
+CURVES = {"constant": constant, "ramp": ramp, "announcement": announcement}
+
+
+def parse_curve(spec: str) -> ArrivalCurve:
+    """
+    Parse an arrival curve given as name:arg:..., e.g. "constant:20", "ramp:1:50:60" or "announcement:100:5:20".
+    """
+    name, *args = spec.split(":")
+    if name not in CURVES:
+        raise ValueError(f"Unknown arrival curve {name!r}, expected one of {', '.join(CURVES)}")
+    try:
+        return CURVES[name](*(float(arg) for arg in args))
+    except TypeError as e:
+        raise ValueError(f"Invalid arguments for the {name} curve: {spec!r}") from e
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    """Parse a request mix given as kind=weight,..., e.g. "valid=0.8,wrong_dni=0.2"."""
+    mix = {}
+    for part in spec.split(","):
+        kind, _, weight = part.partition("=")
+        if kind.strip() not in EXPECTED_STATUS:
+            raise ValueError(f"Unknown request kind {kind.strip()!r}, expected one of {', '.join(EXPECTED_STATUS)}")
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+def arrivals(curve: ArrivalCurve, duration: float, rng: random.Random) -> list[float]:
+    """
+    Arrival times of a Poisson process whose rate follows the curve, by thinning.
+    """
+    max_rate = max(curve(duration * step / 1000) for step in range(1001))
+    if max_rate <= 0:
+        return []
+    times = []
+    t = rng.expovariate(max_rate)
+    while t < duration:
+        if rng.random() * max_rate < curve(t):
+            times.append(t)
+        t += rng.expovariate(max_rate)
+    return times
+
+
+def families(count: int, large_share: float, photo_size: int, rng: random.Random) -> list[Player]:
+    """Players of the club, with a few large archives among them."""
+    players = []
+    for index in range(count):
+        low, high = LARGE_PHOTOS if index < max(1, round(count * large_share)) else REGULAR_PHOTOS
+        players.append(Player(f"Player{index:04d}", f"{10000000 + index}A", rng.randint(low, high), photo_size))
+    return players
+
+
+def plan(
+    players: list[Player],
+    curve: ArrivalCurve,
+    duration: float,
+    mix: dict[str, float] = DEFAULT_MIX,
+    seed: int = 0,
+) -> list[PlannedRequest]:
+    """
+    Requests of a run, ordered by the time they are sent at.
+
+    Retries re-send a valid request of the same family a few seconds later,
+    as impatient clients do, so they arrive on top of the curve.
+    """
+    rng = random.Random(seed)
+    large = [player for player in players if player.photo_count >= LARGE_PHOTOS[0]]
+    regular = [player for player in players if player.photo_count < LARGE_PHOTOS[0]] or players
+    kinds, weights = list(mix), list(mix.values())
+
+    requests = []
+    for at in arrivals(curve, duration, rng):
+        kind = rng.choices(kinds, weights)[0]
+        player = rng.choice(large if kind == "large_archive" and large else regular)
+        if kind == "wrong_dni":
+            authorization = player.authorization(dni="00000000T")
+        elif kind == "unknown_name":
+            authorization = player.authorization(username=f"Unknown{rng.randrange(10**6)}")
+        else:
+            authorization = player.authorization()
+
+        if kind == "retry":
+            requests.append(PlannedRequest(at, "valid", player.username, authorization))
+            for _ in range(rng.randint(1, MAX_RETRIES)):
+                at += rng.uniform(*RETRY_DELAY)
+                requests.append(PlannedRequest(at, "retry", player.username, authorization))
+        else:
+            requests.append(PlannedRequest(at, kind, player.username, authorization))
+
+    return sorted((request for request in requests if request.at < duration), key=lambda request: request.at)
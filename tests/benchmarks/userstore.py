@@ -0,0 +1,185 @@
+"""
+Benchmark of the users table reads: the DynamoDB resource layer against UserStore.
+
+Reads a player item of every photo count, answered in memory (see aws_stubs),
+through each reader:
+
+- resource: Table.get_item of boto3.resource("dynamodb"), reading the whole
+  item through the TypeDeserializer, as both handlers did before UserStore
+- store: UserStore.get on the low-level client, reading the whole item
+- store authorizer, store content: UserStore.get projecting the attributes
+  each handler reads
+
+and reports the time per read with the size of the item returned and the read
+capacity units it consumes, eventually consistent as the handlers read.
+
+    PYTHONPATH=libs:. python -m tests.benchmarks.userstore [--counts 1,10,50,200] [--iterations 2000]
+"""
+
+import argparse
+import gc
+import json
+import math
+import sys
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import boto3
+from userstore import UserStore
+
+from .aws_stubs import REGION, TABLE, InMemoryBackends, Player, project
+from .handlers import percentile
+
+DEFAULT_COUNTS = (1, 10, 50, 200)
+DEFAULT_ITERATIONS = 2000
+WARMUP_READS = 20
+
+# An eventually consistent read of up to 4 KB consumes half a read capacity unit
+READ_UNIT_BYTES = 4 * 1024
+
+
+@dataclass
+class Result:
+    photo_count: int
+    reader: str
+    item_bytes: int
+    read_units: float
+    p50_us: float
+    speedup: float
+
+
+def readers(table, store: UserStore) -> dict[str, tuple[tuple[str, ...] | None, Callable[[str], object]]]:
+    """The attributes each reader returns, None for all, and the read itself."""
+    from services.authorizer.src.handler import USER_ATTRIBUTES
+    from services.content_service.src.handler import CONTENT_ATTRIBUTES
+
+    return {
+        "resource": (None, lambda username: table.get_item(Key={"username": username}).get("Item")),
+        "store": (None, lambda username: store.get(username)),
+        "store authorizer": (USER_ATTRIBUTES, lambda username: store.get(username, USER_ATTRIBUTES)),
+        "store content": (CONTENT_ATTRIBUTES, lambda username: store.get(username, CONTENT_ATTRIBUTES)),
+    }
+
+
+def item_size(item: dict) -> int:
+    """Size of an item of the wire format as DynamoDB counts it for read capacity."""
+    return sum(len(name.encode()) + _value_size(value) for name, value in item.items())
+
+
+def _value_size(value: dict) -> int:
+    ((tag, raw),) = value.items()
+    if tag == "S":
+        return len(raw.encode())
+    if tag == "N":
+        return (len(raw.lstrip("-").replace(".", "").strip("0")) + 1) // 2 + 1
+    if tag == "L":
+        return 3 + sum(1 + _value_size(element) for element in raw)
+    if tag == "M":
+        return 3 + sum(1 + len(name.encode()) + _value_size(element) for name, element in raw.items())
+    return 1
+
+
+def read_units(size: int) -> float:
+    return math.ceil(max(size, 1) / READ_UNIT_BYTES) * 0.5
+
+
+def backends_with_clients(players: list[Player]) -> tuple[InMemoryBackends, object, UserStore]:
+    """In-memory items of the players, with a resource table and a UserStore reading them."""
+    backends = InMemoryBackends()
+    for player in players:
+        backends.add_player(player, b"")
+    session = boto3.session.Session(aws_access_key_id="bench", aws_secret_access_key="bench", region_name=REGION)
+    table = session.resource("dynamodb").Table(TABLE)
+    backends.answer(table.meta.client)
+    return backends, table, UserStore(backends.dynamodb, TABLE)
+
+
+def time_reads(reads: dict[str, Callable[[str], object]], username: str, iterations: int) -> dict[str, float]:
+    """
+    Median seconds per read of every reader.
+
+    Readers take turns read by read, so drifts in the speed of the host weigh
+    on all of them alike. The garbage collector is paused while timing, as
+    timeit does: the decoded items are garbage right away, and collections
+    they trigger would land on whichever reader runs at the time.
+    """
+    for read in reads.values():
+        for _ in range(WARMUP_READS):
+            read(username)
+    samples: dict[str, list[float]] = {reader: [] for reader in reads}
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            for reader, read in reads.items():
+                started = time.perf_counter()
+                read(username)
+                samples[reader].append(time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return {reader: percentile(reader_samples, 0.5) for reader, reader_samples in samples.items()}
+
+
+def run(counts: tuple[int, ...] = DEFAULT_COUNTS, iterations: int = DEFAULT_ITERATIONS) -> list[Result]:
+    players = [Player(f"Player{count}", "12345678Z", count, 0) for count in counts]
+    _, table, store = backends_with_clients(players)
+
+    results = []
+    for player in players:
+        baseline = None
+        timed = readers(table, store)
+        medians = time_reads({reader: read for reader, (_, read) in timed.items()}, player.username, iterations)
+        for reader, (attributes, _) in timed.items():
+            seconds = medians[reader]
+            baseline = baseline or seconds
+            size = item_size(project(player.item(), attributes))
+            results.append(
+                Result(
+                    photo_count=player.photo_count,
+                    reader=reader,
+                    item_bytes=size,
+                    read_units=read_units(size),
+                    p50_us=round(seconds * 1e6, 1),
+                    speedup=round(baseline / seconds, 2),
+                )
+            )
+    return results
+
+
+def report(results: list[Result]) -> str:
+    header = f"{'photos':>6}  {'reader':<18} {'item KB':>8} {'RCU':>5} {'p50 us':>9} {'vs resource':>12}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        lines.append(
+            f"{result.photo_count:>6}  {result.reader:<18} {result.item_bytes / 1024:>8.1f} {result.read_units:>5.1f} "
+            f"{result.p50_us:>9.1f} {result.speedup:>11.2f}x"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the users table reads of the resource layer and UserStore")
+    parser.add_argument(
+        "--counts",
+        type=lambda value: tuple(int(count) for count in value.split(",")),
+        default=DEFAULT_COUNTS,
+        help="Photo counts of the player items read, comma separated",
+    )
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="Timed reads per reader and item")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    results = run(args.counts, args.iterations)
+    print(report(results))
+    if args.output:
+        Path(args.output).write_text(json.dumps([asdict(result) for result in results], indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Functional test for the content preview endpoint.
+
+This test makes actual HTTP requests to the deployed API Gateway endpoint.
+"""
+
+import base64
+import os
+import uuid
+
+import boto3
+import pytest
+import requests
+
+
+def create_auth_header(dni: str, name: str) -> dict:
+    credentials = f"{dni}:{name}"
+    encoded = base64.b64encode(credentials.encode()).decode()
+    return {"Authorization": f"Basic {encoded}"}
+
+
+@pytest.fixture(scope="module")
+def s3_client():
+    """Boto3 S3 client."""
+    endpoint = os.getenv("AWS_ENDPOINT_URL")
+    return boto3.client("s3", endpoint_url=endpoint, region_name="eu-west-1")
+
+
+@pytest.fixture(scope="module")
+def preview_url(api_gateway_url):
+    return f"{api_gateway_url}/preview"
+
+
+@pytest.fixture(scope="module")
+def setup_data(s3_client):
+    """
+    Sets up a photo with its thumbnail in S3 and the user item referencing both.
+    """
+    user_dni = "12345678A"
+    user_name = f"PreviewUser{uuid.uuid4().hex[:8]}"
+    photo_key = f"{user_name}/001.png"
+    thumbnail_key = f"thumbnails/{user_name}/001.webp"
+    photo_content = b"This is a test image content."
+    thumbnail_content = b"This is a test thumbnail."
+
+    bucket_name = "cbtc-media-day-local-content"
+    table_name = "users"
+
+    s3_client.put_object(Bucket=bucket_name, Key=photo_key, Body=photo_content)
+    s3_client.put_object(Bucket=bucket_name, Key=thumbnail_key, Body=thumbnail_content)
+
+    endpoint = os.getenv("AWS_ENDPOINT_URL")
+    dynamodb_resource = boto3.resource("dynamodb", endpoint_url=endpoint, region_name="eu-west-1")
+    table = dynamodb_resource.Table(table_name)
+    table.put_item(
+        Item={
+            "username": user_name,
+            "dnis": [user_dni],
+            "photos": [photo_key],
+            "photo_objects": {photo_key: {"size": len(photo_content), "etag": "etag-1"}},
+            "derivatives": {
+                photo_key: {
+                    "source_etag": "etag-1",
+                    "thumbnail": {"key": thumbnail_key, "size": len(thumbnail_content), "width": 320, "height": 240},
+                }
+            },
+        }
+    )
+
+    yield {
+        "dni": user_dni,
+        "name": user_name,
+        "photo_size": len(photo_content),
+        "thumbnail_content": thumbnail_content,
+    }
+
+    try:
+        s3_client.delete_object(Bucket=bucket_name, Key=photo_key)
+        s3_client.delete_object(Bucket=bucket_name, Key=thumbnail_key)
+        table.delete_item(Key={"username": user_name})
+    except Exception:
+        pass
+
+
+class TestContentPreview:
+    """
+    Functional test for GET /content/preview.
+    """
+
+    def test_user_previews_photos(self, preview_url, setup_data):
+        """
+        Scenario: User lists their photos with thumbnails
+        """
+        headers = create_auth_header(setup_data["dni"], setup_data["name"])
+
+        response = requests.get(preview_url, headers=headers)
+
+        assert response.status_code == 200
+        body = response.json()
+        assert body["success"] is True
+        assert len(body["photos"]) == 1
+
+        photo = body["photos"][0]
+        assert photo["name"] == "001.png"
+        assert photo["size"] == setup_data["photo_size"]
+
+        thumbnail = requests.get(photo["thumbnail"]["url"])
+        assert thumbnail.status_code == 200
+        assert thumbnail.content == setup_data["thumbnail_content"]
+
+    def test_unauthorized_preview(self, preview_url):
+        """
+        Scenario: Unknown credentials cannot preview photos
+        """
+        headers = create_auth_header("00000000X", "UnknownUser")
+
+        response = requests.get(preview_url, headers=headers)
+
+        assert response.status_code == 403